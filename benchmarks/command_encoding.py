@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""Microbenchmark of encoding commands into the bytes sent to MPD.
+
+Compares mpd.base.encode_command with the str.format/escape/join approach the
+clients used before (followed by encoding the line, as the text mode socket
+file did), on a mix of typical commands.
+
+    python benchmarks/command_encoding.py
+"""
+
+import timeit
+
+from mpd.base import encode_command, encode_command_into, escape
+
+COMMANDS = [
+    ("status", []),
+    ("currentsong", []),
+    ("setvol", [42]),
+    ("seekcur", [12.5]),
+    ("playlistinfo", [(0, 100)]),
+    ("addid", ["Artist/Album/01 - Some Title.flac", 3]),
+    ("find", ['(artist == "Some \\"quoted\\" Artist")', "window", (0, 500)]),
+    ("sticker set", ["song", "Artist/Album/02 - Other.flac", "rating", "5"]),
+]
+
+
+def encode_command_before(command, args):
+    parts = [command]
+    for arg in args:
+        if type(arg) is tuple:
+            if len(arg) == 0:
+                parts.append('":"')
+            elif len(arg) == 1:
+                parts.append('"{}:"'.format(int(arg[0])))
+            else:
+                parts.append('"{}:{}"'.format(int(arg[0]), int(arg[1])))
+        else:
+            parts.append('"{}"'.format(escape(str(arg))))
+    return "{}\n".format(" ".join(parts)).encode("utf-8")
+
+
+def run_before():
+    for command, args in COMMANDS:
+        encode_command_before(command, args)
+
+
+def run_after():
+    for command, args in COMMANDS:
+        encode_command(command, args)
+
+
+def run_batched():
+    buffer = bytearray()
+    for command, args in COMMANDS:
+        encode_command_into(buffer, command, args)
+
+
+def main():
+    for command, args in COMMANDS:
+        assert encode_command(command, args) == encode_command_before(command, args)
+
+    number = 20000
+    results = {}
+    for name, func in [
+        ("before", run_before),
+        ("encode_command", run_after),
+        ("encode_command_into", run_batched),
+    ]:
+        best = min(timeit.repeat(func, number=number, repeat=5))
+        results[name] = best
+        print(
+            "{:20} {:8.2f} us per {} commands".format(
+                name, best / number * 1e6, len(COMMANDS)
+            )
+        )
+    print(
+        "speedup: {:.2f}x (batched: {:.2f}x)".format(
+            results["before"] / results["encode_command"],
+            results["before"] / results["encode_command_into"],
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
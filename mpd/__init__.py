@@ -27,6 +27,15 @@ from mpd.base import MPDError as MPDError
 from mpd.base import PendingCommandError as PendingCommandError
 from mpd.base import ProtocolError as ProtocolError
 from mpd.base import VERSION as VERSION
+from mpd.cache import AlbumArtCache as AlbumArtCache
+from mpd.library import LibraryMirror as LibraryMirror
+from mpd.mirror import QueueMirror as QueueMirror
+from mpd.pool import MPDClientPool as MPDClientPool
+from mpd.results import InternPool as InternPool
+from mpd.results import LazySong as LazySong
+from mpd.results import SongColumns as SongColumns
+from mpd.results import SongRecord as SongRecord
+from mpd.tagindex import TagIndex as TagIndex
 
 try:
     from mpd.twisted import MPDProtocol
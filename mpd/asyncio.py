@@ -19,12 +19,18 @@ This module requires Python 3.5.2 or later to run.
 """
 
 import asyncio
+import copy
 import warnings
+from collections import deque
+from contextvars import ContextVar
+from enum import IntEnum
 from functools import partial
 from typing import (
     Any,
     AsyncIterator,
     Callable,
+    Deque,
+    FrozenSet,
     Iterable,
     List,
     Optional,
@@ -42,15 +48,50 @@ from mpd.base import (
     CommandListError,
     ConnectionError,
     CallableWithCommands,
+    encode_command,
+    log_command,
 )
 from mpd.base import MPDClient as SyncMPDClient
 from mpd.base import MPDClientBase, ProtocolError, mpd_command_provider
+from mpd.results import LazySong, SongColumns
+
+#: Deadline (in loop time) of the binary command being executed in the
+# current task, applied to each of its chunk requests
+_binary_deadline: ContextVar[Optional[float]] = ContextVar(
+    "_binary_deadline", default=None
+)
+
+
+class Priority(IntEnum):
+    """Lanes of the command queue, in the order in which they are served.
+
+    INTERACTIVE commands are sent right away; NORMAL ones as long as not too
+    many commands are waiting for their responses already (see LANE_DEPTHS);
+    BULK ones only once the connection is (nearly) idle otherwise, so that
+    commands issued meanwhile can overtake them."""
+
+    INTERACTIVE = 0
+    NORMAL = 1
+    BULK = 2
+
+
+#: Priority of the binary command being executed in the current task, applied
+# to each of its chunk requests
+_binary_priority: ContextVar[Priority] = ContextVar(
+    "_binary_priority", default=Priority.BULK
+)
 
 
 class BaseCommandResult(asyncio.Future):
     """A future that carries its command/args/callback with it for the
     convenience of passing it around to the command queue."""
 
+    #: Timer that fails the result once its deadline has passed
+    _deadline_timer: Optional[asyncio.TimerHandle] = None
+    #: Set when the result failed because of its deadline; the response is
+    # still read (and discarded) when it arrives
+    _timed_out = False
+
     def __init__(self, command: str, args: List[str], callback: Callable) -> None:
         super().__init__()
         self._command = command
@@ -79,10 +120,10 @@ class CommandResult(BaseCommandResult):
     def _feed_line(self, line: Optional[str]) -> None:  # FIXME just inline?
         """Put the given line into the callback machinery, and set the result on a None line."""
         if line is None:
-            if self.cancelled():
+            if self.done():
                 # Data was still pulled out of the connection, but the original
-                # requester has cancelled the request -- no need to filter the
-                # data through the preprocessing callback
+                # requester has cancelled the request (or it timed out) -- no
+                # need to filter the data through the preprocessing callback
                 pass
             else:
                 self.set_result(self._callback(self.__spooled_lines))
@@ -92,6 +133,9 @@ class CommandResult(BaseCommandResult):
     def _feed_error(self, error: Exception) -> None:
         if not self.done():
             self.set_exception(error)
+        elif self._timed_out:
+            # The requester already got the timeout
+            pass
         else:
             # These do occur (especially during the test suite run) when a
             # disconnect was already initialized, but the run task being
@@ -108,13 +152,22 @@ class CommandResult(BaseCommandResult):
 
 
 class BinaryCommandResult(asyncio.Future):
+    _deadline_timer: Optional[asyncio.TimerHandle] = None
+    _timed_out = False
+
+    def __init__(self, command: str, args: List[Any]) -> None:
+        super().__init__()
+        self._command = command
+        # copied, as the caller goes on to change the offset
+        self._args = list(args)
+
     # Unlike the regular commands that defer to any callback that may be
     # defined for them, this uses the predefined _read_binary mechanism of the
     # mpdclient
     async def _feed_from(self, mpdclient: "MPDClient") -> None:
         # Data must be pulled out no matter whether will later be ignored or not
         binary = await mpdclient._read_binary()
-        if self.cancelled():
+        if self.done():
             pass
         else:
             self.set_result(binary)
@@ -123,6 +176,19 @@ class BinaryCommandResult(asyncio.Future):
         return CommandResult._feed_error(cast(CommandResult, self), error)
 
 
+class CachedCommandResult(asyncio.Future):
+    """Result of a command that goes through the response cache. It results
+    in the complete list even for commands that otherwise produce a
+    CommandResultIterable, but can still be used with `async for`."""
+
+    async def __iterate(self) -> AsyncIterator[Any]:
+        for item in await self:
+            yield item
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self.__iterate()
+
+
 class CommandResultIterable(BaseCommandResult):
     """Variant of CommandResult where the underlying callback is an
     asynchronous` generator, and can thus interpret lines as they come along.
@@ -155,20 +221,29 @@ class CommandResultIterable(BaseCommandResult):
     __iter__ = __await__  # for 'yield from' style invocation
 
     async def __feed_future(self) -> None:
-        result = []
         try:
-            async for r in self:
-                result.append(r)
+            parsed = self._callback(self.__spooled_lines)
+            if asyncio.iscoroutine(parsed):
+                # The callback assembles the complete result by itself (eg.
+                # columnar parsing)
+                result = await parsed
+            else:
+                result = [r async for r in parsed]
         except Exception as e:
-            self.set_exception(e)
+            if not self.done():
+                self.set_exception(e)
         else:
-            if not self.cancelled():
+            if not self.done():
                 self.set_result(result)
 
     def __aiter__(self) -> "Any":
         if self.done():
             raise RuntimeError("Command result is already being consumed")
-        return self._callback(self.__spooled_lines).__aiter__()
+        parsed = self._callback(self.__spooled_lines)
+        if asyncio.iscoroutine(parsed):
+            parsed.close()
+            raise TypeError("Command result can only be awaited, not iterated")
+        return parsed.__aiter__()
 
 
 @mpd_command_provider
@@ -191,30 +266,166 @@ class MPDClient(MPDClientBase):
     # IMMEDIATE_COMMAND_TIMEOUT passes.
     __idle_failed = False
 
-    #: Seconds after a command's completion to send idle. Setting this too high
-    # causes "blind spots" in the client's view of the server, setting it too
-    # low sends needless idle/noidle after commands in quick succession.
+    #: Longest time in seconds after a command's completion to send idle.
+    # Setting this too high causes "blind spots" in the client's view of the
+    # server, setting it too low sends needless idle/noidle after commands in
+    # quick succession.
+    #
+    # The actual hold-off (see idle_holdoff) starts out at this value, and is
+    # adapted to how soon further commands followed earlier ones.
     IMMEDIATE_COMMAND_TIMEOUT = 0.1
 
+    #: Shortest time in seconds after a command's completion to send idle
+    MIN_IDLE_HOLDOFF = 0.005
+
+    #: Weight of the latest observation in the moving average of the time
+    # until the next command that the hold-off is based on
+    IDLE_HOLDOFF_WEIGHT = 0.25
+
     #: FIFO list of processors that may consume the read stream one after the
-    # other
+    # other, in the order in which their commands were sent
     #
     # As we don't have any other form of backpressure in the sending side
-    # (which is not expected to be limited), its limit of COMMAND_QUEUE_LENGTH
-    # serves as a limit against commands queuing up indefinitely. (It's not
-    # *directly* throttling output, but as the convention is to put the
-    # processor on the queue and then send the command, and commands are of
-    # limited size, this is practically creating backpressure.)
+    # (which is not expected to be limited), the limit of COMMAND_QUEUE_LENGTH
+    # on it and the commands held in the lanes together serves as a limit
+    # against commands queuing up indefinitely. (It's not *directly*
+    # throttling output, but as commands are of limited size, this is
+    # practically creating backpressure.)
     __command_queue: Optional[
         "asyncio.Queue[Union[BaseCommandResult, BinaryCommandResult]]"
     ] = None
 
-    #: Construction size of __command_queue. The default limit is high enough
-    # that a client can easily send off all existing commands simultaneously
-    # without needlessly blocking the TCP flow, but small enough that
-    # freespinning tasks create warnings.
+    #: Number of commands that may be sent or held at a time. The default
+    # limit is high enough that a client can easily send off all existing
+    # commands simultaneously without needlessly blocking the TCP flow, but
+    # small enough that freespinning tasks create warnings.
     COMMAND_QUEUE_LENGTH = 128
 
+    #: Number of commands that may be waiting for their responses for a
+    # command of the lane to be sent; None for no limit. Commands beyond that
+    # are held back (highest priority first) until responses came in. The
+    # limit of the BULK lane is binary_pipeline_depth.
+    #
+    # As MPD responds to commands in the order they were sent, a command can
+    # only overtake commands that are held back, never one that was sent.
+    LANE_DEPTHS: Dict[Priority, Optional[int]] = {
+        Priority.INTERACTIVE: None,
+        Priority.NORMAL: 16,
+    }
+
+    #: Number of NORMAL commands that may be sent ahead of a held BULK
+    # command; it is then sent in the place of the next one, so that a steady
+    # stream of NORMAL commands cannot hold BULK ones back forever.
+    BULK_SHARE = 8
+
+    #: Commands that are sent as Priority.INTERACTIVE unless a priority is
+    # given; other commands are NORMAL, except for the ones that can be
+    # iterated over (like ``listallinfo``) and binary ones, which are BULK.
+    INTERACTIVE_COMMANDS = frozenset(
+        [
+            "currentsong",
+            "next",
+            "outputs",
+            "pause",
+            "ping",
+            "play",
+            "playid",
+            "previous",
+            "seekcur",
+            "setvol",
+            "status",
+            "stop",
+            "volume",
+        ]
+    )
+
+    #: Number of chunk requests of a binary command (albumart, readpicture)
+    # that are kept in flight once the first chunk has revealed the total
+    # size. 1 fetches the chunks in lockstep, which costs a round trip per
+    # chunk; larger values keep the connection busy, at the cost of delaying
+    # other commands by up to that many chunks.
+    binary_pipeline_depth = 1
+
+    #: Bytes of binary data that ongoing transfers are still expecting
+    __binary_pending = 0
+
+    #: Set to cache the results of the commands in RESPONSE_CACHE_SUBSYSTEMS.
+    # A cached result is only returned while the client is idling on the
+    # subsystems it depends on, so that the server reports any change to it;
+    # it is dropped when that happens, or when any other command is sent.
+    # Values that change without an idle event (like the elapsed time in
+    # ``status``) are returned as they were when the result was cached.
+    response_cache = False
+
+    #: Commands whose results the response cache applies to, along with the
+    # idle subsystems whose changes invalidate them
+    RESPONSE_CACHE_SUBSYSTEMS: Dict[str, FrozenSet[str]] = {
+        "status": frozenset(
+            ["player", "mixer", "options", "playlist", "update", "partition"]
+        ),
+        "currentsong": frozenset(["player", "playlist"]),
+        "playlistinfo": frozenset(["playlist"]),
+        "outputs": frozenset(["output"]),
+        "listplaylists": frozenset(["stored_playlist"]),
+        "stats": frozenset(["database"]),
+        "replay_gain_status": frozenset(["options"]),
+        "listpartitions": frozenset(["partition"]),
+        "listmounts": frozenset(["mount"]),
+        "listneighbors": frozenset(["neighbor"]),
+        "channels": frozenset(["subscription"]),
+    }
+
+    #: Default time in seconds that a command may take, counted from when it
+    # is issued (so including the time it waits for the commands before it),
+    # or None to wait as long as it takes. Can be overridden per call with the
+    # ``timeout`` keyword argument of the commands. A command that times out
+    # fails with an ``asyncio.TimeoutError``; if its response had started to
+    # arrive already, the connection is closed, as the rest of the response
+    # would hold up all later commands.
+    timeout: Optional[float] = None
+
+    #: Set to have a command in COALESCED_COMMANDS that is called while the
+    # same command with the same arguments is already waiting for its
+    # response share that response rather than being sent again. Each caller
+    # gets a copy of the result. Commands are only shared as long as no other
+    # command was sent after them, so that every caller sees the effects of
+    # the commands it sent before, and only between calls with the same
+    # ``timeout`` and ``priority`` arguments.
+    coalesce_commands = False
+
+    #: Read-only commands that coalesce_commands applies to
+    COALESCED_COMMANDS = frozenset(
+        [
+            "commands",
+            "config",
+            "count",
+            "currentsong",
+            "decoders",
+            "getvol",
+            "notcommands",
+            "readcomments",
+            "replay_gain_status",
+            "stats",
+            "status",
+            "tagtypes",
+            "urlhandlers",
+        ]
+    )
+
+    #: The idle command currently sent (or last sent) by the main task
+    __idle_command: Optional[BaseCommandResult] = None
+
+    #: Subsystems that __idle_command waits for; empty for all of them
+    __idle_subsystems: Set[str] = set()
+
+    #: Incremented whenever the response cache is cleared, so that results
+    # of commands that were sent before are not stored any more
+    __response_cache_generation = 0
+
+    #: Amount of pending binary data that counts as much as a queued command
+    # in ``load``
+    BINARY_LOAD_BYTES = 64 * 1024
+
     #: Callbacks registered by any current callers of `idle()`.
     #
     # The first argument lists the changes that the caller is interested in
@@ -234,6 +445,53 @@ class MPDClient(MPDClientBase):
         super().__init__(*args, **kwargs)
         self.__rfile: Optional[asyncio.StreamReader] = None
         self.__wfile: Optional[asyncio.StreamWriter] = None
+        #: Commands that were issued but not sent yet, by Priority, along
+        # with the tasks that issued them
+        self.__lanes: List[
+            Deque[
+                Tuple[
+                    Optional["asyncio.Task[Any]"],
+                    Union[BaseCommandResult, BinaryCommandResult],
+                ]
+            ]
+        ] = [deque() for _ in Priority]
+        #: NORMAL commands that were sent since a BULK one was held back
+        self.__bulk_overtaken = 0
+        #: Result whose response the main task is currently reading
+        self.__current_result: Optional[
+            Union[BaseCommandResult, BinaryCommandResult]
+        ] = None
+        #: Future the main task waits on while the command queue is empty,
+        # completed when a command is queued or the hold-off has passed
+        self.__command_waiter: Optional["asyncio.Future[None]"] = None
+        #: Time at which the command queue last ran empty, until the next
+        # command is queued
+        self.__drained_at: Optional[float] = None
+        #: Moving average of the time from the queue running empty to the next
+        # command, where a command that came only after the longest hold-off
+        # counts as 0 (as waiting for it would not have helped)
+        self.__next_command_estimate = self.IMMEDIATE_COMMAND_TIMEOUT / 2
+        self.__response_cache: Dict[Tuple[str, Tuple[Any, ...]], Any] = {}
+        #: Results of the commands that calls can currently be coalesced
+        # with, along with the futures handed out to the callers
+        self.__in_flight: Dict[Tuple[Any, ...], List["asyncio.Future[Any]"]] = {}
+        #: State shared by the watch() subscribers: the number of them per
+        # command, the latest result of each command with the number of
+        # times it was fetched, and the commands that need to be fetched
+        self.__watch_counts: Dict[str, int] = {}
+        self.__watch_results: Dict[str, Any] = {}
+        self.__watch_versions: Dict[str, int] = {}
+        self.__watch_stale: Set[str] = set()
+        #: Set when there are stale commands
+        self.__watch_wakeup: Optional[asyncio.Event] = None
+        #: Completed (and replaced) whenever results were fetched, or with
+        # the error that ended the watching
+        self.__watch_updated: Optional["asyncio.Future[None]"] = None
+        self.__watch_error: Optional[Exception] = None
+        self.__watch_task: Optional["asyncio.Task[None]"] = None
+        self.__watch_entry: Optional[
+            Tuple[List[str], Callable[[Union[List[str], Exception]], None]]
+        ] = None
 
     async def connect(
         self,
@@ -254,7 +512,7 @@ class MPDClient(MPDClientBase):
             r, w = await asyncio.open_connection(host, port)
         self.__rfile, self.__wfile = r, w
 
-        self.__command_queue = asyncio.Queue(maxsize=self.COMMAND_QUEUE_LENGTH)
+        self.__command_queue = asyncio.Queue()
         self.__idle_consumers = []
 
         try:
@@ -267,10 +525,53 @@ class MPDClient(MPDClientBase):
 
         self.__run_task = asyncio.Task(self.__run())
 
+        self._binary_limit = None
+        self._binary_limit_supported = True
+        self._binary_limit_ceiling = None
+        if self.binary_limit is not None:
+            await self._negotiate_binary_limit(self.binary_limit)
+
+    async def _negotiate_binary_limit(self, limit: Optional[int]) -> None:  # type: ignore
+        while limit is not None:
+            try:
+                await self.binarylimit(limit)
+            except CommandError as error:
+                limit = self._binary_limit_refused(limit, error)
+            else:
+                self._binary_limit = limit
+                return
+
     @property
     def connected(self) -> bool:
         return self.__run_task is not None
 
+    @property
+    def idle_holdoff(self) -> float:
+        """Seconds that the client currently waits after the last command
+        before it goes back into idle: twice the usual time until the next
+        command, within MIN_IDLE_HOLDOFF and IMMEDIATE_COMMAND_TIMEOUT. That
+        keeps the connection out of idle between the commands of a burst,
+        and shortens the time in which changes go unnoticed when commands are
+        sent only now and then."""
+        return min(
+            self.IMMEDIATE_COMMAND_TIMEOUT,
+            max(self.MIN_IDLE_HOLDOFF, 2 * self.__next_command_estimate),
+        )
+
+    @property
+    def load(self) -> float:
+        """Estimate of how long a command sent now would have to wait: the
+        number of commands waiting for their responses (including the one
+        being received) or held back, plus the binary data that is still to
+        be received (in units of BINARY_LOAD_BYTES)."""
+        if self.__command_queue is None:
+            return 0.0
+        return (
+            self.__waiting()
+            + self.__held_count()
+            + self.__binary_pending / self.BINARY_LOAD_BYTES
+        )
+
     def disconnect(self) -> None:
         if (
             self.__run_task is not None
@@ -281,6 +582,16 @@ class MPDClient(MPDClientBase):
         self.__rfile = self.__wfile = None
         self.__run_task = None
         self.__command_queue = None
+        self.__clear_response_cache()
+        self.__in_flight.clear()
+        self.__bulk_overtaken = 0
+        for lane in self.__lanes:
+            while lane:
+                _, result = lane.popleft()
+                if not result.done():
+                    result._feed_error(
+                        ConnectionError("Disconnected before the command was sent")
+                    )
         if self.__idle_consumers is not None:
             # copying the list as each raising callback will remove itself from __idle_consumers
             for subsystems, callback in list(self.__idle_consumers):
@@ -313,35 +624,21 @@ class MPDClient(MPDClientBase):
 
         try:
             while True:
-                try:
+                if self.__command_queue is None:
+                    raise ConnectionError("Disconnected while waiting for command")
+                if self.__command_queue.empty():
+                    await self.__wait_for_command()
                     if self.__command_queue is None:
                         raise ConnectionError("Disconnected while waiting for command")
-                    result = await asyncio.wait_for(
-                        self.__command_queue.get(),
-                        timeout=self.IMMEDIATE_COMMAND_TIMEOUT,
-                    )
-                except asyncio.TimeoutError:
-                    # The cancellation of the __command_queue.get() that happens
-                    # in this case is intended, and is just what asyncio.Queue
-                    # suggests for "get with timeout".
-
-                    if (
-                        self.__command_queue is not None
-                        and not self.__command_queue.empty()
-                    ):
-                        # A __command_queue.put() has happened after the
-                        # asyncio.wait_for() timeout but before execution of
-                        # this coroutine resumed. Looping around again will
-                        # fetch the new entry from the queue.
-                        continue
+
+                if not self.__command_queue.empty():
+                    result = self.__command_queue.get_nowait()
+                else:
+                    # The hold-off passed without a new command.
 
                     if self.__idle_failed:
-                        # We could try for a more elaborate path where we now
-                        # await the command queue indefinitely, but as we're
-                        # already in an error case, this whole situation only
-                        # persists until the error is processed somewhere else,
-                        # so ticking once per idle timeout is OK to keep things
-                        # simple.
+                        # Set only after the hold-off had started; now wait
+                        # for a command before idle is tried again.
                         continue
 
                     subsystems = self._get_idle_interests()
@@ -349,12 +646,21 @@ class MPDClient(MPDClientBase):
                         # The presumably most quiet subsystem -- in this case,
                         # idle is only used to keep the connection alive.
                         subsystems = set(["database"])
+                    elif subsystems and self.binary_cache is not None:
+                        # needed to keep the cache valid
+                        subsystems.add("database")
+                    if subsystems:
+                        # needed to keep the cached responses valid
+                        for command, _ in self.__response_cache:
+                            subsystems |= self.RESPONSE_CACHE_SUBSYSTEMS[command]
 
                     # Careful: There can't be any await points between the
-                    # except and here, or the sequence between the idle and the
-                    # command processor might be wrong.
-                    result = CommandResult("idle", subsystems, self._parse_list)
+                    # check of the queue and here, or the sequence between the
+                    # idle and the command processor might be wrong.
+                    result = CommandResult("idle", sorted(subsystems), self._parse_list)
                     result.add_done_callback(self.__idle_result)
+                    self.__idle_command = result
+                    self.__idle_subsystems = subsystems
                     self.__in_idle = True
                     self._write_command(result._command, result._args)
 
@@ -362,6 +668,7 @@ class MPDClient(MPDClientBase):
                 # made idle fail is now fixed.
                 self.__idle_failed = False
 
+                self.__current_result = result
                 try:
                     await result._feed_from(self)
                 except CommandError as e:
@@ -369,6 +676,11 @@ class MPDClient(MPDClientBase):
                     # This kind of error we can tolerate without breaking up
                     # the connection; any other would fly out, be reported
                     # through the result and terminate the connection
+                finally:
+                    self.__current_result = None
+                    if result._deadline_timer is not None:
+                        result._deadline_timer.cancel()
+                self.__dispatch()
 
         except Exception as e:
             # Pass exception to any pending task to terminate them. Otherwise they will hang
@@ -402,6 +714,179 @@ class MPDClient(MPDClientBase):
                 raise
                 # Typically this is a bug in mpd.asyncio.
 
+    # lanes
+
+    def __held_count(self) -> int:
+        return sum(len(lane) for lane in self.__lanes)
+
+    def __waiting(self) -> int:
+        """Number of commands that were sent and wait for their responses,
+        including the one whose response is being read, but not idle."""
+        assert self.__command_queue is not None
+        waiting = self.__command_queue.qsize()
+        if (
+            self.__current_result is not None
+            and self.__current_result is not self.__idle_command
+        ):
+            waiting += 1
+        return waiting
+
+    def __hold(
+        self,
+        result: Union[BaseCommandResult, BinaryCommandResult],
+        priority: Priority,
+    ) -> None:
+        """Put a command into the lane of its priority, and send what can be
+        sent. A command goes no earlier than the held commands of the same
+        task, so that a task's commands are still sent in the order it
+        issued them."""
+        task = asyncio.current_task()
+        for lower in reversed(Priority):
+            if lower <= priority:
+                break
+            if any(owner is task for owner, _ in self.__lanes[lower]):
+                priority = lower
+                break
+        self.__lanes[priority].append((task, result))
+        self.__dispatch()
+
+    def __next_held(
+        self,
+    ) -> Optional[Union[BaseCommandResult, BinaryCommandResult]]:
+        """Take the next command to send out of its lane, or return None if
+        none may be sent now."""
+        if self.__command_queue is None:
+            return None
+        waiting = self.__waiting()
+        for priority in Priority:
+            lane = self.__lanes[priority]
+            if not lane:
+                continue
+            if priority is Priority.BULK:
+                depth: Optional[int] = max(1, self.binary_pipeline_depth)
+            else:
+                depth = self.LANE_DEPTHS.get(priority)
+            if depth is not None and waiting >= depth:
+                # lower lanes wait too
+                return None
+            bulk = self.__lanes[Priority.BULK]
+            if priority is Priority.BULK:
+                self.__bulk_overtaken = 0
+            elif priority is Priority.NORMAL and bulk:
+                owner = bulk[0][0]
+                if self.__bulk_overtaken >= self.BULK_SHARE and not any(
+                    task is owner for task, _ in lane
+                ):
+                    # its turn, unless its task issued NORMAL commands before
+                    self.__bulk_overtaken = 0
+                    return bulk.popleft()[1]
+                self.__bulk_overtaken += 1
+            return lane.popleft()[1]
+        return None
+
+    def __dispatch(self) -> None:
+        """Send held commands, as far as the lanes allow."""
+        while True:
+            result = self.__next_held()
+            if result is None:
+                return
+            if result.done() or result._timed_out:
+                # cancelled or timed out before it was sent
+                continue
+            assert self.__command_queue is not None
+            self.__command_queue.put_nowait(result)
+            self.__command_queued()
+            self._end_idle()
+            # Careful: There can't be any await points between the queue
+            # appending and the write
+            try:
+                self._write_command(result._command, result._args)
+            except BaseException as e:
+                self.disconnect()
+                if not result.done():
+                    result.set_exception(e)
+                return
+
+    # deadlines
+
+    def _deadline(self, timeout: Optional[float] = None) -> Optional[float]:
+        """Return the deadline (in loop time) for a command issued now with
+        the given timeout (or the default one)."""
+        if timeout is None:
+            timeout = self.timeout
+        if timeout is None:
+            return None
+        return asyncio.get_running_loop().time() + timeout
+
+    def __arm_deadline(
+        self,
+        result: Union[BaseCommandResult, BinaryCommandResult],
+        deadline: Optional[float],
+    ) -> None:
+        if deadline is None:
+            return
+        result._deadline_timer = asyncio.get_running_loop().call_at(
+            deadline, self.__expire, result
+        )
+
+    def __expire(self, result: Union[BaseCommandResult, BinaryCommandResult]) -> None:
+        if result.done():
+            return
+        result._timed_out = True
+        command = getattr(result, "_command", "binary command")
+        result._feed_error(asyncio.TimeoutError("{} timed out".format(command)))
+        if result is self.__current_result:
+            # There is no telling how much of the response is still to come,
+            # and everything queued after it would wait for that.
+            self.__tear_down(
+                ConnectionError("Connection closed after a response timed out")
+            )
+
+    def __tear_down(self, error: Exception) -> None:
+        """Disconnect, and fail all commands that wait for their responses."""
+        queue = self.__command_queue
+        self.disconnect()
+        while queue is not None and not queue.empty():
+            queue.get_nowait()._feed_error(error)
+
+    async def __wait_for_command(self) -> None:
+        """Wait until a command is queued, or until the hold-off for going
+        into idle has passed. After a failed idle, this waits for a command
+        only, as idle is not retried before."""
+        loop = asyncio.get_running_loop()
+        waiter: "asyncio.Future[None]" = loop.create_future()
+        self.__command_waiter = waiter
+        self.__drained_at = loop.time()
+        timer = None
+        if not self.__idle_failed:
+            timer = loop.call_later(self.idle_holdoff, self.__wake, waiter)
+        try:
+            await waiter
+        finally:
+            self.__command_waiter = None
+            if timer is not None:
+                timer.cancel()
+
+    @staticmethod
+    def __wake(waiter: "asyncio.Future[None]") -> None:
+        if not waiter.done():
+            waiter.set_result(None)
+
+    def __command_queued(self) -> None:
+        """Wake the main task for a command that was just put on the command
+        queue, and learn from how long the queue was empty before."""
+        if self.__drained_at is not None:
+            waited = asyncio.get_running_loop().time() - self.__drained_at
+            self.__drained_at = None
+            if waited >= self.IMMEDIATE_COMMAND_TIMEOUT:
+                waited = 0.0
+            weight = self.IDLE_HOLDOFF_WEIGHT
+            self.__next_command_estimate += weight * (
+                waited - self.__next_command_estimate
+            )
+        if self.__command_waiter is not None:
+            self.__wake(self.__command_waiter)
+
     def __idle_result(self, result: BaseCommandResult) -> None:
         try:
             idle_changes = result.result()
@@ -420,15 +905,171 @@ class MPDClient(MPDClientBase):
             if self.__idle_consumers is not None:
                 for subsystems, _ in self.__idle_consumers:
                     idle_changes = idle_changes.union(subsystems)
+            self.__clear_response_cache()
 
         # make generator accessible multiple times
         idle_changes = list(idle_changes)
+        self._idle_changes(idle_changes)
 
         if self.__idle_consumers is not None:
             for subsystems, callback in self.__idle_consumers:
                 if not subsystems or any(s in subsystems for s in idle_changes):
                     callback(idle_changes)
 
+    def _idle_changes(self, changes: List[str]) -> None:
+        super()._idle_changes(changes)
+        for key in list(self.__response_cache):
+            if self.RESPONSE_CACHE_SUBSYSTEMS[key[0]].intersection(changes):
+                del self.__response_cache[key]
+
+    # response cache
+
+    def __clear_response_cache(self) -> None:
+        self.__response_cache.clear()
+        self.__response_cache_generation += 1
+
+    def __cached_response(
+        self, command: str, args: Tuple[Any, ...]
+    ) -> Optional[CachedCommandResult]:
+        """Return a result for the command from the response cache, if the
+        cache holds one and idle currently ensures that it is valid."""
+        if not self.response_cache or not self.__in_idle:
+            return None
+        if self.__idle_command is None or self.__idle_command.done():
+            return None
+        subsystems = self.RESPONSE_CACHE_SUBSYSTEMS.get(command)
+        if subsystems is None:
+            return None
+        if self.__idle_subsystems and not subsystems <= self.__idle_subsystems:
+            return None
+        try:
+            value = self.__response_cache[(command, args)]
+        except (KeyError, TypeError):
+            return None
+        result = CachedCommandResult()
+        result.set_result(copy.deepcopy(value))
+        return result
+
+    def __cache_response(
+        self, command: str, args: Tuple[Any, ...], result: BaseCommandResult
+    ) -> Union[BaseCommandResult, CachedCommandResult]:
+        """Arrange for the result of a command just sent to be stored in the
+        response cache if it can be, and return what the caller should get
+        for it. Any other command may change what is cached, and clears the
+        cache instead."""
+        if not self.response_cache:
+            return result
+        if command not in self.RESPONSE_CACHE_SUBSYSTEMS:
+            self.__clear_response_cache()
+            return result
+        generation = self.__response_cache_generation
+
+        def store(future: "asyncio.Future[Any]") -> None:
+            if future.cancelled() or future.exception() is not None:
+                return
+            if generation != self.__response_cache_generation:
+                # the cache was cleared while the command was on its way
+                return
+            try:
+                self.__response_cache[(command, args)] = copy.deepcopy(future.result())
+            except TypeError:
+                # unhashable arguments
+                pass
+
+        if isinstance(result, CommandResultIterable):
+            # Only a complete list can be stored
+            collected = CachedCommandResult()
+            collecting = asyncio.ensure_future(self.__collect(result))
+            collecting.add_done_callback(store)
+            collecting.add_done_callback(partial(self.__forward, collected))
+            return collected
+        result.add_done_callback(store)
+        return result
+
+    # coalescing
+
+    def __join_in_flight(
+        self, command: str, args: Tuple[Any, ...], options: Tuple[Any, ...]
+    ) -> Optional["asyncio.Future[Any]"]:
+        """Return a future for the result of the same command, called with
+        the same options, that is already on its way, if there is one it can
+        be shared with."""
+        if not self.coalesce_commands:
+            return None
+        try:
+            callers = self.__in_flight.get((command, args, options))
+        except TypeError:
+            # unhashable arguments
+            return None
+        if callers is None:
+            return None
+        joined: "asyncio.Future[Any]" = asyncio.Future()
+        callers.append(joined)
+        return joined
+
+    def __coalesce(
+        self,
+        command: str,
+        args: Tuple[Any, ...],
+        options: Tuple[Any, ...],
+        result: Any,
+    ) -> Any:
+        """Make the result of a command just sent available to later calls
+        of the same command, and return what the caller should get for it.
+        Any other command ends that for all commands sent before."""
+        if not self.coalesce_commands:
+            return result
+        if command not in self.COALESCED_COMMANDS or not isinstance(
+            result, CommandResult
+        ):
+            self.__in_flight.clear()
+            return result
+        key = (command, args, options)
+        try:
+            hash(key)
+        except TypeError:
+            return result
+        first: "asyncio.Future[Any]" = asyncio.Future()
+        callers = self.__in_flight[key] = [first]
+
+        def fan_out(source: "asyncio.Future[Any]") -> None:
+            # This runs before any of the callers resumes, so none of them
+            # can have modified the result before it is copied.
+            if self.__in_flight.get(key) is callers:
+                del self.__in_flight[key]
+            for caller in callers:
+                if caller.done():
+                    # cancelled by the caller
+                    continue
+                if source.cancelled():
+                    caller.cancel()
+                elif source.exception() is not None:
+                    caller.set_exception(cast(BaseException, source.exception()))
+                elif caller is first:
+                    caller.set_result(source.result())
+                else:
+                    caller.set_result(copy.deepcopy(source.result()))
+
+        # The callers only get their own futures, so that one of them
+        # cancelling does not affect the others.
+        result.add_done_callback(fan_out)
+        return first
+
+    @staticmethod
+    async def __collect(result: CommandResultIterable) -> Any:
+        return await result
+
+    @staticmethod
+    def __forward(target: "asyncio.Future[Any]", source: "asyncio.Future[Any]") -> None:
+        if target.done():
+            return
+        if source.cancelled():
+            target.cancel()
+        elif source.exception() is not None:
+            target.set_exception(cast(BaseException, source.exception()))
+        else:
+            target.set_result(source.result())
+
     # helper methods
 
     async def __readline(self) -> str:
@@ -463,8 +1104,11 @@ class MPDClient(MPDClientBase):
         self.__write(text + "\n")
 
     def _write_command(self, command: str, args: List[Any]) -> None:
-        # FIXME This code should be shareable.
-        SyncMPDClient._write_command(cast(SyncMPDClient, self), command, args)
+        if self.__wfile is None:
+            raise ConnectionError("Can not write to a disconnected client")
+        data = encode_command(command, args)
+        log_command(command, args)
+        self.__wfile.write(data)
 
     async def _read_line(self) -> Optional[str]:
         line = await self.__readline()
@@ -483,8 +1127,10 @@ class MPDClient(MPDClientBase):
         lines: "asyncio.Queue[str]",
         delimiters: List[str] = [],
         lookup_delimiter: bool = False,
+        factory: Optional[Callable[[Dict[str, Any]], Any]] = None,
     ) -> AsyncIterator[Dict[str, str]]:
         obj: Dict[str, Any] = {}
+        pool = self.intern_pool
         while True:
             line = await lines.get()
             if isinstance(line, BaseException):
@@ -492,12 +1138,16 @@ class MPDClient(MPDClientBase):
             if line is None:
                 break
             key, value = self._parse_pair(line, separator=": ")
-            key = key.lower()
+            if pool is None:
+                key = key.lower()
+            else:
+                key = pool.key(key)
+                value = pool.value(key, value)
             if lookup_delimiter and not delimiters:
                 delimiters = [key]
             if obj:
                 if key in delimiters:
-                    yield obj
+                    yield obj if factory is None else factory(obj)
                     obj = {}
                 elif key in obj:
                     if not isinstance(obj[key], list):
@@ -507,65 +1157,235 @@ class MPDClient(MPDClientBase):
                     continue
             obj[key] = value
         if obj:
-            yield obj
+            yield obj if factory is None else factory(obj)
+
+    async def _parse_columns(  # type: ignore
+        self, lines: "asyncio.Queue[str]", delimiters: List[str]
+    ) -> SongColumns:
+        columns = SongColumns(delimiters)
+        pool = self.intern_pool
+        while True:
+            line = await lines.get()
+            if isinstance(line, BaseException):
+                raise line
+            if line is None:
+                return columns
+            key, value = self._parse_pair(line, separator=": ")
+            if pool is None:
+                columns.feed(key.lower(), value)
+            else:
+                key = pool.key(key)
+                columns.feed(key, pool.value(key, value))
+
+    async def _parse_lazy_objects(  # type: ignore
+        self, lines: "asyncio.Queue[str]", delimiters: List[str]
+    ) -> AsyncIterator[LazySong]:
+        prefixes = tuple(delimiter + ": " for delimiter in delimiters)
+        block: List[str] = []
+        while True:
+            line = await lines.get()
+            if isinstance(line, BaseException):
+                raise line
+            if line is None:
+                break
+            if block and line.startswith(prefixes):
+                yield LazySong(block)
+                block = []
+            block.append(line)
+        if block:
+            yield LazySong(block)
 
     async def _execute_binary(
         self, command: str, args: Iterable[Any]
-    ) -> Dict[str, Union[str, bytes]]:
-        # Fun fact: By fetching data in lockstep, this is a bit less efficient
-        # than it could be (which would be "after having received the first
-        # chunk, guess that the other chunks are of equal size and request at
-        # several multiples concurrently, ensuring the TCP connection can stay
-        # full), but at the other hand it leaves the command queue empty so
-        # that more time critical commands can be executed right away
-
-        data = None
+    ) -> Dict[str, Union[str, bytes, bytearray]]:
+        cache = self.binary_cache
+        if cache is None:
+            return await self._fetch_binary(command, args)
+        if cache.stamp is None:
+            cache.invalidate((await self.stats()).get("db_update", ""))
+        uri = list(args)[0]
+        result = cache.get(command, uri)
+        if result is None:
+            try:
+                result = await self._fetch_binary(command, args)
+            except CommandError as error:
+                cache.put_error(command, uri, error)
+                raise
+            cache.put(command, uri, result)
+        return result
+
+    async def _fetch_binary(
+        self, command: str, args: Iterable[Any]
+    ) -> Dict[str, Union[str, bytes, bytearray]]:
+        # By default, data is fetched in lockstep: This is a bit less efficient
+        # than it could be, but leaves the command queue empty so that more
+        # time critical commands can be executed right away. With
+        # binary_pipeline_depth, the chunks after the first are requested
+        # several at a time, guessing that they are all as large as the first
+        # one (see __fetch_pipelined).
+
+        # The stream reader can't read into a buffer, so chunks are copied into
+        # one allocated with the announced size right away; that keeps the
+        # assembly linear in the total size.
+        buffer = None
+        received = 0
         args = list(args)
         assert len(args) == 1
         args.append(0)
         final_metadata = None
         if self.__command_queue is None:
             raise ConnectionError("Can not send command to disconnected client")
-        while True:
-            partial_result = BinaryCommandResult()
-            await self.__command_queue.put(partial_result)
-            self._end_idle()
-            self._write_command(command, args)
-            metadata = await partial_result
-            chunk = metadata.pop("binary", None)
-
-            if final_metadata is None:
-                data = chunk
-                final_metadata = metadata
-                if not data:
+        loop = asyncio.get_running_loop()
+        # binary data announced but not received yet, as counted in load
+        outstanding = 0
+        try:
+            while True:
+                started = loop.time()
+                partial_result = await self.__send_chunk_request(command, args)
+                metadata = await partial_result
+                chunk = metadata.pop("binary", None)
+
+                if final_metadata is None:
+                    final_metadata = metadata
+                    if chunk is None:
+                        break
+                    buffer = bytearray(max(self._announced_size(metadata), len(chunk)))
+                    if not chunk:
+                        break
+                    try:
+                        size = int(final_metadata["size"])
+                    except KeyError:
+                        size = len(chunk)
+                    except ValueError:
+                        raise CommandError("Size data unsuitable for binary transfer")
+                else:
+                    if metadata != final_metadata:
+                        raise CommandError(
+                            "Metadata of binary data changed during transfer"
+                        )
+                    if chunk is None:
+                        raise CommandError(
+                            "Binary field vanished changed during transfer"
+                        )
+                assert buffer is not None
+                if received + len(chunk) > len(buffer):
+                    buffer.extend(bytes(received + len(chunk) - len(buffer)))
+                buffer[received : received + len(chunk)] = chunk
+                received += len(chunk)
+                args[-1] = received
+                if received > size:
+                    raise CommandListError("Binary data announced size exceeded")
+                elif received == size:
                     break
-                try:
-                    size = int(final_metadata["size"])
-                except KeyError:
-                    size = len(chunk)
-                except ValueError:
-                    raise CommandError("Size data unsuitable for binary transfer")
-            else:
-                if metadata != final_metadata:
+                self.__binary_pending += size - received - outstanding
+                outstanding = size - received
+                elapsed = loop.time() - started
+                limit = self._adapted_binary_limit(len(chunk), elapsed)
+                if limit is not None:
+                    await self._negotiate_binary_limit(limit)
+                if self.binary_pipeline_depth > 1 and len(buffer) == size:
+                    chunk_size = max(len(chunk), self._binary_limit or 0)
+                    # from here on, counted down by __fetch_pipelined
+                    outstanding = 0
+                    await self.__fetch_pipelined(
+                        command,
+                        args[:-1],
+                        final_metadata,
+                        buffer,
+                        received,
+                        chunk_size,
+                    )
+                    received = size
+                    break
+        finally:
+            self.__binary_pending -= outstanding
+
+        result: Dict[str, Union[str, bytes, bytearray]] = dict(final_metadata)
+        if buffer is not None:
+            del buffer[received:]
+            result["binary"] = buffer if self.zero_copy_binary else bytes(buffer)
+
+        result.pop("size", None)
+
+        return result
+
+    async def __send_chunk_request(
+        self, command: str, args: List[Any]
+    ) -> BinaryCommandResult:
+        if self.__command_queue is None:
+            raise ConnectionError("Can not send command to disconnected client")
+        result = BinaryCommandResult(command, args)
+        self.__arm_deadline(result, _binary_deadline.get())
+        self.__hold(result, _binary_priority.get())
+        return result
+
+    async def __fetch_pipelined(
+        self,
+        command: str,
+        args: List[Any],
+        metadata: Dict[str, Union[str, bytes]],
+        buffer: bytearray,
+        offset: int,
+        chunk_size: int,
+    ) -> None:
+        """Fill buffer from offset on, keeping up to binary_pipeline_depth
+        requests for chunk_size large chunks in flight.
+
+        Should the server send shorter chunks than expected, the gaps are
+        requested again. The data that is still to come (which the caller
+        counted in __binary_pending) is counted down as chunks arrive. While
+        other commands are waiting in the command queue, no further requests
+        are added until the pending ones are done, so that those commands are
+        not delayed by more than binary_pipeline_depth chunks."""
+        size = len(buffer)
+        todo = deque(
+            (start, min(start + chunk_size, size))
+            for start in range(offset, size, chunk_size)
+        )
+        pending: Deque[Tuple[int, int, BinaryCommandResult]] = deque()
+        expected = size - offset
+        try:
+            while todo or pending:
+                while todo and len(pending) < self.binary_pipeline_depth:
+                    if pending and self.__others_waiting(len(pending)):
+                        break
+                    start, stop = todo.popleft()
+                    result = await self.__send_chunk_request(command, args + [start])
+                    pending.append((start, stop, result))
+
+                start, stop, result = pending.popleft()
+                chunk_metadata = dict(await result)
+                chunk = chunk_metadata.pop("binary", None)
+                if chunk_metadata != metadata:
                     raise CommandError(
                         "Metadata of binary data changed during transfer"
                     )
                 if chunk is None:
                     raise CommandError("Binary field vanished changed during transfer")
-                data += chunk
-            args[-1] = len(data)
-            if len(data) > size:
-                breakpoint()
-                raise CommandListError("Binary data announced size exceeded")
-            elif len(data) == size:
-                break
-
-        if data is not None:
-            final_metadata["binary"] = data
-
-        final_metadata.pop("size", None)
-
-        return final_metadata
+                end = start + len(chunk)
+                if end > size:
+                    raise CommandListError("Binary data announced size exceeded")
+                if not chunk:
+                    raise CommandError("Binary data ended before announced size")
+                buffer[start:end] = chunk
+                self.__binary_pending -= len(chunk)
+                expected -= len(chunk)
+                if end < stop:
+                    todo.appendleft((end, stop))
+        finally:
+            # Responses to requests already sent are still read (and
+            # discarded) by the command processor.
+            for _, _, result in pending:
+                result.cancel()
+            self.__binary_pending -= expected
+
+    def __others_waiting(self, own: int) -> bool:
+        """Whether any commands other than own many of a binary transfer's
+        chunk requests are waiting in the command queue or the lanes."""
+        return (
+            self.__command_queue is not None
+            and self.__command_queue.qsize() + self.__held_count() > own
+        )
 
     # omits _read_chunk checking because the async version already
     # raises; otherwise it's just awaits sprinkled in
@@ -594,13 +1414,59 @@ class MPDClient(MPDClientBase):
             obj[key] = value
         return obj
 
+    async def paginate(
+        self,
+        command: str,
+        *args: Any,
+        page_size: int = 1000,
+        prefetch: bool = False,
+    ) -> AsyncIterator[Dict[str, str]]:
+        """Iterate over the results of a song listing command (find, search,
+        playlistinfo or plchanges), fetching them in windows of page_size
+        songs rather than in a single response.
+
+        With prefetch, the next page is requested while the songs of the
+        current one are handed out."""
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+        method = getattr(self, command)
+        start = 0
+        result = method(*self._window_args(command, args, start, start + page_size))
+        try:
+            while True:
+                page = await result
+                start += page_size
+                more = len(page) >= page_size
+                next_args = self._window_args(command, args, start, start + page_size)
+                result = method(*next_args) if more and prefetch else None
+                for song in page:
+                    yield song
+                if not more:
+                    return
+                if result is None:
+                    result = method(*next_args)
+        finally:
+            if result is not None and not result.done():
+                result.cancel()
+
     # command provider interface
     @classmethod
     def add_command(cls: Any, name: str, callback: CallableWithCommands) -> None:
         if callback.mpd_commands_binary:
 
-            async def async_func(self: Any, *args: Any) -> BaseCommandResult:
-                result = await self._execute_binary(name, args)
+            async def async_func(
+                self: Any,
+                *args: Any,
+                timeout: Optional[float] = None,
+                priority: Priority = Priority.BULK,
+            ) -> BaseCommandResult:
+                token = _binary_deadline.set(self._deadline(timeout))
+                priority_token = _binary_priority.set(Priority(priority))
+                try:
+                    result = await self._execute_binary(name, args)
+                finally:
+                    _binary_priority.reset(priority_token)
+                    _binary_deadline.reset(token)
 
                 # With binary, the callback is applied to the final result
                 # rather than to the iterator over the lines (cf.
@@ -618,20 +1484,29 @@ class MPDClient(MPDClientBase):
                 # Idle and noidle are explicitly implemented, skipping them.
                 return
 
-            def sync_func(self: Any, *args: Any) -> BaseCommandResult:
+            def sync_func(
+                self: Any,
+                *args: Any,
+                timeout: Optional[float] = None,
+                priority: Optional[Priority] = None,
+            ) -> BaseCommandResult:
                 result = command_class(name, args, partial(callback, self))
                 if self.__run_task is None:
                     raise ConnectionError("Can not send command to disconnected client")
 
-                try:
-                    self.__command_queue.put_nowait(result)
-                except asyncio.QueueFull as e:
-                    e.args = (
-                        "Command queue overflowing; this indicates the"
-                        " application sending commands in an uncontrolled"
-                        " fashion without awaiting them, and typically"
-                        " indicates a memory leak.",
-                    )
+                cached = self.__cached_response(name, args)
+                if cached is not None:
+                    return cached
+                # calls with other options do not share the same request
+                options = (timeout, priority)
+                joined = self.__join_in_flight(name, args, options)
+                if joined is not None:
+                    return joined
+
+                if (
+                    self.__command_queue.qsize() + self.__held_count()
+                    >= self.COMMAND_QUEUE_LENGTH
+                ):
                     # While we *could* indicate to the queued result that it has
                     # yet to send its request, that'd practically create a queue of
                     # awaited items in the user application that's growing
@@ -641,17 +1516,25 @@ class MPDClient(MPDClientBase):
                     # of MPD's database". If a use case *does* come up, any change
                     # would need to maintain the property of providing backpressure
                     # information. That would require an API change.
-                    raise
+                    raise asyncio.QueueFull(
+                        "Command queue overflowing; this indicates the"
+                        " application sending commands in an uncontrolled"
+                        " fashion without awaiting them, and typically"
+                        " indicates a memory leak."
+                    )
 
-                self._end_idle()
-                # Careful: There can't be any await points between the queue
-                # appending and the write
-                try:
-                    self._write_command(result._command, result._args)
-                except BaseException as e:
-                    self.disconnect()
-                    result.set_exception(e)
-                return result
+                if priority is None:
+                    if name in self.INTERACTIVE_COMMANDS:
+                        priority = Priority.INTERACTIVE
+                    elif command_class is CommandResultIterable:
+                        priority = Priority.BULK
+                    else:
+                        priority = Priority.NORMAL
+                self.__arm_deadline(result, self._deadline(timeout))
+                self.__hold(result, Priority(priority))
+                return self.__coalesce(
+                    name, args, options, self.__cache_response(name, args, result)
+                )
 
             escaped_name = name.replace(" ", "_")
             sync_func.__name__ = escaped_name
@@ -687,3 +1570,259 @@ class MPDClient(MPDClientBase):
 
     def noidle(self) -> None:
         raise AttributeError("noidle is not supported / required in mpd.asyncio")
+
+    async def watch(
+        self, commands: Iterable[str] = ("status", "currentsong")
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the results of the given commands (by command) initially,
+        and again whenever idle reports a change that affects any of them.
+
+        The commands are fetched once for all current subscribers, and
+        changes that are reported while they are being fetched are combined
+        into a single fetch. Each subscriber gets its own copy of the
+        results. The commands must be ones in RESPONSE_CACHE_SUBSYSTEMS."""
+        commands = list(commands)
+        for command in commands:
+            if command not in self.RESPONSE_CACHE_SUBSYSTEMS:
+                raise ValueError("Command '{}' can not be watched".format(command))
+        if self.__idle_consumers is None:
+            raise ConnectionError("Can not watch a disconnected client")
+
+        if not self.__watch_counts:
+            self.__watch_error = None
+        for command in commands:
+            self.__watch_counts[command] = self.__watch_counts.get(command, 0) + 1
+            if command not in self.__watch_results:
+                self.__watch_stale.add(command)
+        self.__watch_interests_changed()
+        try:
+            seen = None
+            while True:
+                if self.__watch_error is not None:
+                    raise self.__watch_error
+                versions = [self.__watch_versions.get(c) for c in commands]
+                if None not in versions and versions != seen:
+                    seen = versions
+                    yield {
+                        command: copy.deepcopy(self.__watch_results[command])
+                        for command in commands
+                    }
+                    continue
+                assert self.__watch_updated is not None
+                # shared by all the subscribers, one of which may be cancelled
+                await asyncio.shield(self.__watch_updated)
+        finally:
+            for command in commands:
+                self.__watch_counts[command] -= 1
+                if not self.__watch_counts[command]:
+                    del self.__watch_counts[command]
+                    self.__watch_results.pop(command, None)
+                    self.__watch_versions.pop(command, None)
+            self.__watch_interests_changed()
+
+    def __watch_interests_changed(self) -> None:
+        """Update the idle subscription and the fetching task of watch() to
+        the commands that are currently watched."""
+        if self.__watch_entry is not None and self.__idle_consumers is not None:
+            self.__idle_consumers.remove(self.__watch_entry)
+        self.__watch_entry = None
+        if not self.__watch_counts or self.__idle_consumers is None:
+            if self.__watch_task is not None:
+                self.__watch_task.cancel()
+                self.__watch_task = None
+            return
+
+        subsystems: Set[str] = set()
+        for command in self.__watch_counts:
+            subsystems |= self.RESPONSE_CACHE_SUBSYSTEMS[command]
+        self.__watch_entry = (sorted(subsystems), self.__watch_changed)
+        self.__idle_consumers.append(self.__watch_entry)
+        self._end_idle()
+
+        if self.__watch_task is None:
+            self.__watch_wakeup = asyncio.Event()
+            self.__watch_updated = asyncio.Future()
+            self.__watch_task = asyncio.ensure_future(self.__watch_run())
+        if self.__watch_stale:
+            assert self.__watch_wakeup is not None
+            self.__watch_wakeup.set()
+
+    def __watch_changed(self, changes: Union[List[str], Exception]) -> None:
+        if isinstance(changes, Exception):
+            if self.__watch_task is not None:
+                self.__watch_task.cancel()
+                self.__watch_task = None
+            self.__watch_publish(changes)
+            return
+        for command in self.__watch_counts:
+            if self.RESPONSE_CACHE_SUBSYSTEMS[command].intersection(changes):
+                self.__watch_stale.add(command)
+        if self.__watch_stale and self.__watch_wakeup is not None:
+            self.__watch_wakeup.set()
+
+    def __watch_publish(self, error: Optional[Exception] = None) -> None:
+        updated = self.__watch_updated
+        if error is not None:
+            self.__watch_error = error
+        else:
+            self.__watch_updated = asyncio.Future()
+        if updated is not None and not updated.done():
+            if error is not None:
+                updated.set_exception(error)
+                # not every error has a subscriber waiting for it
+                updated.exception()
+            else:
+                updated.set_result(None)
+
+    async def __watch_run(self) -> None:
+        wakeup = self.__watch_wakeup
+        assert wakeup is not None
+        try:
+            while True:
+                await wakeup.wait()
+                # let the other changes of a burst come in
+                await asyncio.sleep(0)
+                wakeup.clear()
+                stale = [c for c in self.__watch_stale if c in self.__watch_counts]
+                self.__watch_stale.clear()
+                if not stale:
+                    continue
+                # sent back to back, and answered in one go
+                results = await asyncio.gather(
+                    *(self.__collect(getattr(self, command)()) for command in stale)
+                )
+                for command, result in zip(stale, results):
+                    if command in self.__watch_counts:
+                        self.__watch_results[command] = result
+                        version = self.__watch_versions.get(command, 0) + 1
+                        self.__watch_versions[command] = version
+                self.__watch_publish()
+        except Exception as e:
+            self.__watch_task = None
+            self.__watch_publish(e)
+
+
+class MPDClientPool:
+    """Several connections to one server, with commands spread among them.
+
+    Each command goes to the connection with the least ``load`` (queued
+    commands and binary data still being transferred), so that a long
+    listing or a large picture does not hold up everything else. With
+    ``reserve_interactive``, one more connection is kept exclusively for the
+    commands in ``INTERACTIVE_COMMANDS`` (which are expected to be quick, and
+    to need a timely response). All ``idle()`` subscriptions are served by a
+    dedicated connection of their own, which also handles the client to
+    client messages (``subscribe``, ``unsubscribe`` and ``readmessages``),
+    so that the ``message`` idle events and the messages they announce are
+    on the same connection.
+
+    Commands in ``BROADCAST_COMMANDS`` change the state of the connection
+    they are sent on, and are sent on all connections (resulting in the
+    result of the first). A ``password`` or ``partition`` sent that way is
+    also used when the pool connects again.
+
+    Commands are called on the pool just like on a client::
+
+        pool = MPDClientPool(size=3, reserve_interactive=True)
+        await pool.connect("localhost", 6600)
+        status = await pool.status()
+        async for changes in pool.idle(["player"]):
+            ...
+    """
+
+    #: Commands sent on the reserved connection if there is one
+    INTERACTIVE_COMMANDS = MPDClient.INTERACTIVE_COMMANDS
+
+    #: Commands sent on all connections
+    BROADCAST_COMMANDS = frozenset(["binarylimit", "partition", "password"])
+
+    #: Commands sent on the connection that serves idle()
+    MESSAGE_COMMANDS = frozenset(["readmessages", "subscribe", "unsubscribe"])
+
+    def __init__(
+        self,
+        size: int = 2,
+        reserve_interactive: bool = False,
+        password: Optional[str] = None,
+        partition: Optional[str] = None,
+        client_class: Callable[[], MPDClient] = MPDClient,
+    ) -> None:
+        if size < 1:
+            raise ValueError("Pool needs at least one connection")
+        # replayed on connect; pool.password() and pool.partition() are the
+        # commands
+        self._password = password
+        self._partition = partition
+        self._clients = [client_class() for _ in range(size)]
+        self._interactive = client_class() if reserve_interactive else None
+        self._idle_client = client_class()
+
+    def _all_clients(self) -> List[MPDClient]:
+        clients = self._clients + [self._idle_client]
+        if self._interactive is not None:
+            clients.append(self._interactive)
+        return clients
+
+    async def connect(self, host: str, port: int = 6600) -> None:
+        async def connect(client: MPDClient) -> None:
+            await client.connect(host, port)
+            if self._password is not None:
+                await client.password(self._password)
+            if self._partition is not None:
+                await client.partition(self._partition)
+
+        try:
+            await asyncio.gather(*(connect(c) for c in self._all_clients()))
+        except BaseException:
+            self.disconnect()
+            raise
+
+    def disconnect(self) -> None:
+        for client in self._all_clients():
+            client.disconnect()
+
+    @property
+    def connected(self) -> bool:
+        return any(client.connected for client in self._clients)
+
+    def _client_for(self, command: str) -> MPDClient:
+        """Pick the connection to send command on."""
+        if command in self.MESSAGE_COMMANDS:
+            if not self._idle_client.connected:
+                raise ConnectionError("Can not send command to disconnected pool")
+            return self._idle_client
+        if (
+            self._interactive is not None
+            and self._interactive.connected
+            and command in self.INTERACTIVE_COMMANDS
+        ):
+            return self._interactive
+        connected = [client for client in self._clients if client.connected]
+        if not connected:
+            raise ConnectionError("Can not send command to disconnected pool")
+        return min(connected, key=lambda client: client.load)
+
+    def idle(
+        self, subsystems: Union[List[str], Tuple[str]] = []
+    ) -> AsyncIterator[Union[List[str], Exception]]:
+        return self._idle_client.idle(subsystems)
+
+    async def _broadcast(self, command: str, *args: Any, **kwargs: Any) -> Any:
+        connected = [client for client in self._all_clients() if client.connected]
+        if not connected:
+            raise ConnectionError("Can not send command to disconnected pool")
+        results = await asyncio.gather(
+            *(getattr(client, command)(*args, **kwargs) for client in connected)
+        )
+        if command == "password":
+            self._password = args[0]
+        elif command == "partition":
+            self._partition = args[0]
+        return results[0]
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_") or not callable(getattr(MPDClient, name, None)):
+            raise AttributeError(name)
+        if name in self.BROADCAST_COMMANDS:
+            return partial(self._broadcast, name)
+        return getattr(self._client_for(name), name)
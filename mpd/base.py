@@ -17,35 +17,68 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with python-mpd2.  If not, see <http://www.gnu.org/licenses/>.
 
+import io
 import logging
 import re
 import socket
 import sys
+import time
 import warnings
+from collections import deque
 from enum import Enum
 from logging import NullHandler
 from typing import (
     IO,
+    TYPE_CHECKING,
     Any,
     Callable,
+    Deque,
     Dict,
     Iterator,
     List,
+    Mapping,
     Optional,
+    Sequence,
     Tuple,
     Iterable,
     Type,
     Union,
+    cast,
 )
 
+from mpd.results import InternPool, LazySong, SongColumns
+
+if TYPE_CHECKING:
+    from mpd.cache import AlbumArtCache
+
 VERSION = (3, 1, 2)
 HELLO_PREFIX = "OK MPD "
 ERROR_PREFIX = "ACK "
 ERROR_PATTERN = re.compile(
-    r"\[(?P<errno>\d+)@(?P<offset>\d+)\]\s+{(?P<command>\w+)}\s+(?P<msg>.*)"
+    r"\[(?P<errno>\d+)@(?P<offset>\d+)\]\s+{(?P<command>\w*)}\s+(?P<msg>.*)"
 )
 SUCCESS = "OK"
 NEXT = "list_OK"
+# Used when reading responses in bulk: the line terminating a response, and
+# the "key: value" pairs of the lines before it
+TERMINATOR_PATTERN = re.compile(rb"^(?:OK|ACK [^\n]*)\n", re.M)
+PAIR_PATTERN = re.compile(rb"^(.*?): (.*)$", re.M)
+
+# Commands that can be paginated, and whether they take their window as a
+# "window START:END" argument pair or as a plain range argument
+PAGINATED_COMMANDS = {
+    "find": "window",
+    "search": "window",
+    "playlistinfo": "range",
+    "plchanges": "range",
+}
+
+# Chunk size of binary responses of servers that were not told otherwise
+DEFAULT_BINARY_LIMIT = 8192
+
+# Size up to which MPD accepts command lists by default
+# (max_command_list_size, 2 MiB); bulk() stays well below that
+BULK_MAX_BYTES = 1024 * 1024
 
 logger = logging.getLogger(__name__)
 logger.addHandler(NullHandler())
@@ -55,6 +88,62 @@ def escape(text: str) -> str:
     return text.replace("\\", "\\\\").replace('"', '\\"')
 
 
+#: Encoded lines of commands without arguments, shared by all clients
+_encoded_commands: Dict[str, bytes] = {}
+
+
+def encode_command(command: str, args: Iterable[Any] = ()) -> bytes:
+    """Return the line sending command with args to MPD.
+
+    Tuples are sent as ranges; anything else is converted to a string,
+    escaped (unless there is nothing to escape) and quoted."""
+    if not args:
+        encoded = _encoded_commands.get(command)
+        if encoded is None:
+            encoded = (command + "\n").encode("utf-8")
+            if len(_encoded_commands) < 1024:
+                _encoded_commands[command] = encoded
+        return encoded
+    # Building the line as str and encoding it once is considerably faster
+    # than encoding and appending each argument
+    line = command
+    for arg in args:
+        kind = type(arg)
+        if kind is str:
+            if '"' in arg or "\\" in arg:
+                arg = escape(arg)
+            line += ' "' + arg + '"'
+        elif kind is int:
+            line += ' "%d"' % arg
+        elif kind is tuple:
+            if len(arg) == 0:
+                line += ' ":"'
+            elif len(arg) == 1:
+                line += ' "%d:"' % int(arg[0])
+            else:
+                line += ' "%d:%d"' % (int(arg[0]), int(arg[1]))
+        else:
+            line += ' "' + escape(str(arg)) + '"'
+    return (line + "\n").encode("utf-8")
+
+
+def encode_command_into(
+    buffer: bytearray, command: str, args: Iterable[Any] = ()
+) -> None:
+    """Append the line sending command with args to MPD to buffer, eg. to
+    send several commands at once."""
+    buffer += encode_command(command, args)
+
+
+def log_command(command: str, args: Iterable[Any]) -> None:
+    # Minimize logging cost if the logging is not activated.
+    if logger.isEnabledFor(logging.DEBUG):
+        if command == "password":
+            logger.debug("Calling MPD password(******)")
+        else:
+            logger.debug("Calling MPD %s%r", command, args)
+
+
 # MPD Protocol errors as found in CommandError exceptions
 # https://github.com/MusicPlayerDaemon/MPD/blob/master/src/protocol/Ack.hxx
 class FailureResponseCode(Enum):
@@ -91,6 +180,9 @@ class CommandError(MPDError):
         self.offset = None
         self.command = None
         self.msg = None
+        # set by MPDClient.bulk
+        self.index: Optional[int] = None
+        self.results: Dict[int, Any] = {}
 
         match = ERROR_PATTERN.match(error)
         if match:
@@ -159,6 +251,56 @@ class MPDClientBase:
     subclasses.
     """
 
+    #: Callable that turns each song dict returned by the song and database
+    # listing commands into the object that is actually returned, eg.
+    # ``mpd.SongRecord`` for compact records. None returns plain dicts.
+    song_factory: Optional[Callable[[Dict[str, Any]], Any]] = None
+
+    #: Return the song and database listings as a single ``mpd.SongColumns``
+    # object that is filled directly while parsing, rather than as songs.
+    columnar = False
+
+    #: ``mpd.InternPool`` through which keys and tag values of all parsed
+    # objects are deduplicated, or None.
+    intern_pool: Optional[InternPool] = None
+
+    #: Return the songs of song and database listings as ``mpd.LazySong``
+    # objects, which only parse their lines when their fields are accessed.
+    lazy_songs = False
+
+    #: Return the data of binary commands (albumart, readpicture) as the
+    # bytearray it was received into, rather than copying it into bytes.
+    zero_copy_binary = False
+
+    #: Binary limit (see the binarylimit command) to request right after
+    # connecting, or None to keep the server's default. Servers that don't
+    # support it are left at their default.
+    binary_limit: Optional[int] = None
+
+    #: Upper bound up to which the binary limit is raised during binary
+    # transfers whose chunks turn out to be quick to fetch, or None to never
+    # adapt it.
+    max_binary_limit: Optional[int] = None
+
+    #: Time a single chunk of a binary transfer should take at most when the
+    # binary limit is adapted; other commands may have to wait for as long.
+    BINARY_CHUNK_DURATION = 0.1
+
+    #: ``mpd.AlbumArtCache`` in which results of the binary commands are
+    # looked up before asking the server, or None. It is invalidated
+    # whenever an idle response says the database changed, and stamped with
+    # the ``db_update`` time from ``stats`` before it is used again.
+    binary_cache: Optional["AlbumArtCache"] = None
+
+    if TYPE_CHECKING:
+        # Commands are added by mpd_command_provider; the ones that the
+        # clients send by themselves are declared for the type checker.
+        binarylimit: Callable[..., Any]
+        partition: Callable[..., Any]
+        password: Callable[..., Any]
+        ping: Callable[..., Any]
+        stats: Callable[..., Any]
+
     def __init__(self, use_unicode: Optional[bool] = None) -> None:
         self.iterate = False
         if use_unicode is not None:
@@ -202,6 +344,81 @@ class MPDClientBase:
     def _reset(self) -> None:
         self.mpd_version: Optional[str] = None
         self._command_list: Optional[list[Any]] = None
+        # binary limit the server was set to, and whether it accepts any
+        self._binary_limit: Optional[int] = None
+        self._binary_limit_supported = True
+        # largest binary limit the server may accept, once it refused one
+        self._binary_limit_ceiling: Optional[int] = None
+
+    def _idle_changes(self, changes: List[str]) -> None:
+        """Update local state according to the subsystems an idle response
+        reported as changed."""
+        if self.binary_cache is not None and "database" in changes:
+            self.binary_cache.invalidate()
+
+    def _adapted_binary_limit(self, chunk_size: int, elapsed: float) -> Optional[int]:
+        """Return the binary limit to switch to after a chunk of chunk_size
+        bytes took elapsed seconds to fetch, or None to keep the current one.
+
+        The limit is chosen so that a chunk takes about BINARY_CHUNK_DURATION
+        at the chunk's throughput; as that includes the round trip latency,
+        this errs on the low side for small chunks, and grows over a few
+        chunks. It is only raised (up to max_binary_limit), and only if that
+        at least doubles it, as setting it costs a round trip."""
+        maximum = self.max_binary_limit
+        if maximum is None or not self._binary_limit_supported:
+            return None
+        if self._binary_limit_ceiling is not None:
+            maximum = min(maximum, self._binary_limit_ceiling)
+        current = self._binary_limit or DEFAULT_BINARY_LIMIT
+        if chunk_size < current:
+            # not limited by the binary limit, eg. the last chunk
+            return None
+        if elapsed > 0:
+            limit = min(int(chunk_size * self.BINARY_CHUNK_DURATION / elapsed), maximum)
+        else:
+            limit = maximum
+        if limit < 2 * current:
+            return None
+        return limit
+
+    def _binary_limit_refused(self, limit: int, error: CommandError) -> Optional[int]:
+        """Take note of the server refusing to set the binary limit, and return
+        a smaller one to try instead, or None."""
+        if error.errno is FailureResponseCode.UNKNOWN:
+            # not supported before MPD 0.22.4
+            self._binary_limit_supported = False
+            return None
+        if error.errno is not FailureResponseCode.ARG:
+            return None
+        # larger than the output buffer of the server allows
+        limit //= 2
+        self._binary_limit_ceiling = limit
+        if limit <= (self._binary_limit or DEFAULT_BINARY_LIMIT):
+            return None
+        return limit
+
+    def _window_args(
+        self, command: str, args: Iterable[Any], start: int, end: int
+    ) -> List[Any]:
+        """Return the arguments for fetching the given window of a paginated
+        command's results."""
+        try:
+            style = PAGINATED_COMMANDS[command]
+        except KeyError:
+            raise ValueError("Command '{}' can not be paginated".format(command))
+        if style == "window":
+            return list(args) + ["window", (start, end)]
+        return list(args) + [(start, end)]
+
+    @staticmethod
+    def _announced_size(metadata: Dict[str, Any]) -> int:
+        """Total size of a binary transfer as announced in its first
+        response, or 0 if unknown."""
+        try:
+            return max(int(metadata["size"]), 0)
+        except (KeyError, ValueError):
+            return 0
 
     def _parse_pair(self, line: str, separator: str = ": ") -> List[str]:
         pair = line.split(separator, 1)
@@ -211,6 +428,15 @@ class MPDClientBase:
 
     def _parse_pairs(
         self, lines: Iterable[str], separator: str = ": "
+    ) -> Iterator[Sequence[str]]:
+        if separator == ": " and isinstance(lines, _ResponseBlock):
+            pairs = lines.pairs()
+            if pairs is not None:
+                return iter(pairs)
+        return self._split_pairs(lines, separator)
+
+    def _split_pairs(
+        self, lines: Iterable[str], separator: str = ": "
     ) -> Iterator[List[str]]:
         for line in lines:
             yield self._parse_pair(line, separator)
@@ -220,23 +446,29 @@ class MPDClientBase:
         lines: Iterable[str],
         delimiters: List[str] = [],
         lookup_delimiter: bool = False,
+        factory: Optional[Callable[[Dict[str, Any]], Any]] = None,
     ) -> Iterator[Dict[str, str]]:
         obj: Dict[str, Any] = {}
+        pool = self.intern_pool
         for key, value in self._parse_pairs(lines):
-            key = key.lower()
+            if pool is None:
+                key = key.lower()
+            else:
+                key = pool.key(key)
+                value = pool.value(key, value)
             if lookup_delimiter and key not in delimiters:
                 delimiters = delimiters + [key]
             if obj:
                 if key in delimiters:
                     if lookup_delimiter:
                         if key in obj:
-                            yield obj
+                            yield obj if factory is None else factory(obj)
                             obj = obj.copy()
                             while delimiters[-1] != key:
                                 obj.pop(delimiters[-1], None)
                                 delimiters.pop()
                     else:
-                        yield obj
+                        yield obj if factory is None else factory(obj)
                         obj = {}
                 elif key in obj:
                     if not isinstance(obj[key], list):
@@ -246,12 +478,36 @@ class MPDClientBase:
                     continue
             obj[key] = value
         if obj:
-            yield obj
+            yield obj if factory is None else factory(obj)
 
     # Use this instead of _parse_objects whenever the result is returned
     # immediately in a command implementation
     _parse_objects_direct = _parse_objects
 
+    def _parse_columns(self, lines: Iterable[str], delimiters: List[str]) -> Any:
+        columns = SongColumns(delimiters)
+        pool = self.intern_pool
+        for key, value in self._parse_pairs(lines):
+            if pool is None:
+                columns.feed(key.lower(), value)
+            else:
+                key = pool.key(key)
+                columns.feed(key, pool.value(key, value))
+        return columns
+
+    def _parse_lazy_objects(
+        self, lines: Iterable[str], delimiters: List[str]
+    ) -> Iterator[LazySong]:
+        prefixes = tuple(delimiter + ": " for delimiter in delimiters)
+        block: List[str] = []
+        for line in lines:
+            if block and line.startswith(prefixes):
+                yield LazySong(block)
+                block = []
+            block.append(line)
+        if block:
+            yield LazySong(block)
+
     def _parse_raw_stickers(self, lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
         for _, sticker in self._parse_pairs(lines):
             value = sticker.split("=", 1)
@@ -266,8 +522,14 @@ class MPDClientBase:
         return self._parse_objects_direct(lines, ["cpos"])
 
     @mpd_commands("listall", "listallinfo", "listfiles", "lsinfo", is_direct=True)
-    def _parse_database(self, lines: List[str]) -> Iterator[Dict[str, str]]:
-        return self._parse_objects_direct(lines, ["file", "directory", "playlist"])
+    def _parse_database(self, lines: List[str]) -> Iterator[Mapping[str, str]]:
+        if self.columnar:
+            return self._parse_columns(lines, ["file", "directory", "playlist"])
+        if self.lazy_songs:
+            return self._parse_lazy_objects(lines, ["file", "directory", "playlist"])
+        return self._parse_objects_direct(
+            lines, ["file", "directory", "playlist"], factory=self.song_factory
+        )
 
     @mpd_commands("idle")
     def _parse_idle(self, lines: List[str]) -> Iterator[str]:
@@ -419,8 +681,12 @@ class MPDClientBase:
         "sticker find",
         is_direct=True,
     )
-    def _parse_songs(self, lines: List[str]) -> Iterator[Dict[str, str]]:
-        return self._parse_objects_direct(lines, ["file"])
+    def _parse_songs(self, lines: List[str]) -> Iterator[Mapping[str, str]]:
+        if self.columnar:
+            return self._parse_columns(lines, ["file"])
+        if self.lazy_songs:
+            return self._parse_lazy_objects(lines, ["file"])
+        return self._parse_objects_direct(lines, ["file"], factory=self.song_factory)
 
     @mpd_commands("sticker get")
     def _parse_sticker(self, lines: List[str]) -> str:
@@ -499,6 +765,122 @@ def _create_command(
     return mpd_command
 
 
+class _ResponseBlock:
+    """The lines of a single response, read off the socket in bulk on first
+    use.
+
+    Iterating over it yields the decoded lines just like
+    ``MPDClient._read_lines``; ``pairs`` additionally splits all lines into
+    key/value pairs at once on the raw bytes, decoding only the values."""
+
+    #: Decoded keys, shared by all responses (there are only so many tags)
+    _keys: Dict[bytes, str] = {}
+
+    def __init__(self, client: "MPDClient") -> None:
+        self._client = client
+        self._data: Optional[bytes] = None
+
+    def _load(self) -> bytes:
+        if self._data is None:
+            self._data = self._client._read_block()
+        return self._data
+
+    def __iter__(self) -> Iterator[str]:
+        data = self._load()
+        return iter(data.decode("utf-8").split("\n")[:-1])
+
+    def pairs(self) -> Optional[List[Tuple[str, str]]]:
+        """Return all key/value pairs of the response, or None if any line
+        is not a pair (which is then left to the line based parser to
+        report)."""
+        data = self._load()
+        matches = PAIR_PATTERN.findall(data)
+        if len(matches) != data.count(b"\n"):
+            return None
+        keys = self._keys
+        pairs = []
+        for raw_key, raw_value in matches:
+            key = keys.get(raw_key)
+            if key is None:
+                key = raw_key.decode("utf-8")
+                if len(keys) < 1024:
+                    keys[raw_key] = key
+            pairs.append((key, raw_value.decode("utf-8")))
+        return pairs
+
+
+class Pipeline:
+    """Commands that are sent to the server back to back, and whose
+    responses are read only afterwards.
+
+    Commands are collected by calling them on the pipeline (which returns the
+    pipeline again), and sent by ``execute()``. Unlike in a command list, the
+    server executes each command on its own: a failing command does not keep
+    the others from running, and its ``CommandError`` is returned in place of
+    its result.
+
+    Obtain one from ``MPDClient.pipeline()``::
+
+        status, song = client.pipeline().status().currentsong().execute()
+    """
+
+    def __init__(self, client: "MPDClient") -> None:
+        self._client = client
+        self._commands: List[Tuple[str, List[Any], Callable[[], Any]]] = []
+
+    def __getattr__(self, name: str) -> Callable[..., "Pipeline"]:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        method = getattr(self._client, name)
+        if name in ("idle", "noidle") or not getattr(method, "mpd_command", False):
+            # idle would hold up the responses to all later commands; other
+            # methods of the client are no commands to send
+            raise CommandListError("'{}' not allowed in pipeline".format(name))
+
+        def add(*args: Any) -> "Pipeline":
+            self._client._pipeline = self
+            try:
+                method(*args)
+            finally:
+                self._client._pipeline = None
+            return self
+
+        return add
+
+    def _add(self, command: str, args: List[Any], retval: Any) -> None:
+        if not callable(retval):
+            raise CommandListError("'{}' not allowed in pipeline".format(command))
+        self._commands.append((command, list(args), retval))
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    def execute(self) -> List[Any]:
+        """Send all collected commands at once, and return their results (or
+        CommandErrors) in order. The pipeline is empty afterwards."""
+        client = self._client
+        if client._iterating or client._command_list is not None:
+            raise IteratingError("Cannot execute pipeline while iterating")
+        commands, self._commands = self._commands, []
+        if not commands:
+            return []
+        buffer = bytearray()
+        for command, args, _ in commands:
+            encode_command_into(buffer, command, args)
+            log_command(command, args)
+        client._write_bytes(buffer)
+        results: List[Any] = []
+        for _, _, retval in commands:
+            try:
+                result = retval()
+                if isinstance(result, Iterator):
+                    result = list(result)
+            except CommandError as error:
+                result = error
+            results.append(result)
+        return results
+
+
 class _NotConnected:
     def __getattr__(self, attr: str) -> Callable:
         return self._dummy
@@ -511,6 +893,10 @@ class _NotConnected:
 class MPDClient(MPDClientBase):
     idletimeout = None
     _timeout = None
+    #: Read responses off the socket in blocks rather than line by line, and
+    # split them into pairs in bulk. Iterating results then only starts once
+    # the complete response has arrived.
+    bulk_read = False
     _wrap_iterator_parsers = [
         MPDClientBase._parse_list,
         MPDClientBase._parse_list_groups,
@@ -540,13 +926,16 @@ class MPDClient(MPDClientBase):
         super()._reset()
         self._iterating = False
         self._sock: Optional[socket.socket] = None
-        self._rbfile: Union[IO[bytes], _NotConnected] = _NotConnected()
-        self._wfile: Union[IO[str], _NotConnected] = _NotConnected()
+        self._rbfile: Union[io.BufferedReader, _NotConnected] = _NotConnected()
+        self._wfile: Union[IO[bytes], _NotConnected] = _NotConnected()
+        self._pipeline: Optional[Pipeline] = None
 
     def _execute(self, command: str, args: List[Any], retval: Any) -> Any:
         if self._iterating:
             raise IteratingError("Cannot execute '{}' while iterating".format(command))
-        if self._command_list is not None:
+        if self._pipeline is not None:
+            self._pipeline._add(command, args, retval)
+        elif self._command_list is not None:
             if not callable(retval):
                 raise CommandListError(
                     "'{}' not allowed in command list".format(command)
@@ -560,10 +949,13 @@ class MPDClient(MPDClientBase):
             return retval
 
     def _write_line(self, line: str) -> None:
+        self._write_bytes("{}\n".format(line).encode("utf-8"))
+
+    def _write_bytes(self, data: Union[bytes, bytearray]) -> None:
         try:
             if self._wfile is _NotConnected:
                 raise ConnectionError("Not connected")
-            self._wfile.write("{}\n".format(line))
+            self._wfile.write(data)
             self._wfile.flush()
         except socket.error:
             error_message = "Connection to server was reset"
@@ -573,25 +965,12 @@ class MPDClient(MPDClientBase):
             raise e.with_traceback(sys.exc_info()[2])
 
     def _write_command(self, command: str, args: List[Any] = []) -> None:
-        parts = [command]
-        for arg in args:
-            if type(arg) is tuple:
-                if len(arg) == 0:
-                    parts.append('":"')
-                elif len(arg) == 1:
-                    parts.append('"{}:"'.format(int(arg[0])))
-                else:
-                    parts.append('"{}:{}"'.format(int(arg[0]), int(arg[1])))
-            else:
-                parts.append('"{}"'.format(escape(str(arg))))
-        # Minimize logging cost if the logging is not activated.
-        if logger.isEnabledFor(logging.DEBUG):
-            if command == "password":
-                logger.debug("Calling MPD password(******)")
-            else:
-                logger.debug("Calling MPD %s%r", command, args)
-        cmd = " ".join(parts)
-        self._write_line(cmd)
+        if self._pipeline is not None:
+            # only reached by methods that don't go through _execute
+            raise CommandListError("'{}' not allowed in pipeline".format(command))
+        data = encode_command(command, args)
+        log_command(command, args)
+        self._write_bytes(data)
 
     def _read_line(self) -> Optional[str]:
         line = self._rbfile.readline().decode("utf-8")
@@ -611,50 +990,105 @@ class MPDClient(MPDClientBase):
             return None
         return line
 
-    def _read_lines(self) -> Iterator[str]:
+    def _read_lines(self) -> Iterable[str]:
+        if self.bulk_read and self._command_list is None:
+            return _ResponseBlock(self)
+        return self._iter_lines()
+
+    def _iter_lines(self) -> Iterator[str]:
         line = self._read_line()
         while line is not None:
             yield line
             line = self._read_line()
 
-    def _read_chunk(self, amount: int) -> bytes:
-        chunk = bytearray()
-        while amount > 0:
-            result = self._rbfile.read(amount)
-            if len(result) == 0:
+    def _read_block(self) -> bytes:
+        """Read a complete response up to its terminating line, and return
+        its lines (including their newlines) without the terminator.
+
+        The buffered data is only peeked at, so that nothing beyond the
+        terminator is consumed."""
+        buf = bytearray()
+        while True:
+            chunk = self._rbfile.peek()
+            if not chunk:
+                self.disconnect()
+                raise ConnectionError("Connection lost while reading line")
+            # the terminator may start in the incomplete last line of buf
+            start = buf.rfind(b"\n") + 1
+            offset = len(buf)
+            buf += chunk
+            match = TERMINATOR_PATTERN.search(buf, start)
+            if match is None:
+                self._rbfile.read(len(chunk))
+                continue
+            self._rbfile.read(match.end() - offset)
+            terminator = buf[match.start() : match.end() - 1].decode("utf-8")
+            if terminator.startswith(ERROR_PREFIX):
+                error = terminator[len(ERROR_PREFIX) :].strip()
+                raise CommandError(error)
+            return bytes(buf[: match.start()])
+
+    def _read_chunk_into(self, view: memoryview) -> int:
+        """Fill view from the stream, returning how much could be read before
+        the connection ended."""
+        received = 0
+        while received < len(view):
+            result = self._rbfile.readinto(view[received:])
+            if not result:
                 break
-            chunk.extend(result)
-            amount -= len(result)
+            received += result
+        return received
+
+    def _read_chunk(self, amount: int) -> bytes:
+        chunk = bytearray(amount)
+        received = self._read_chunk_into(memoryview(chunk))
+        del chunk[received:]
         return bytes(chunk)
 
-    def _read_binary(self) -> Dict[str, Union[str, bytes]]:
+    def _read_binary(
+        self, buffer: Optional[bytearray] = None, offset: int = 0
+    ) -> Dict[str, Union[str, memoryview]]:
         """From the data stream, read Unicode lines until one says "binary:
         <number>\\n"; at that point, read binary data of the given length.
 
+        The binary data is read into buffer at offset; without a buffer, one
+        is created with the announced total size. Data that does not fit into
+        the buffer (as the server sent more than it announced) is read into a
+        buffer of its own, so that the stream stays in sync. The returned
+        "binary" item is a view of the received data (whose .obj is the
+        buffer).
+
         This behaves like _parse_objects (with empty set of delimiters; even
         returning only a single result), but rather than feeding from a lines
         iterable (which would be preprocessed too far), it reads directly off
         the stream."""
 
-        obj = {}
+        obj: Dict[str, Union[str, memoryview]] = {}
 
         while True:
             line = self._read_line()
             if line is None:
                 break
 
-            value: Union[str, bytes]
+            value: Union[str, memoryview]
             key, value = self._parse_pair(line, ": ")
 
             if key == "binary":
                 chunk_size = int(value)
-                value = self._read_chunk(chunk_size)
-
-                if len(value) != chunk_size:
+                if buffer is None:
+                    buffer = bytearray(max(self._announced_size(obj), chunk_size))
+                    offset = 0
+                elif len(buffer) < offset + chunk_size:
+                    # not resized, as views of it may exist
+                    buffer, offset = bytearray(chunk_size), 0
+                value = memoryview(buffer)[offset : offset + chunk_size]
+                received = self._read_chunk_into(value)
+
+                if received != chunk_size:
                     self.disconnect()
                     raise ConnectionError(
                         "Connection lost while reading binary data: "
-                        "expected %d bytes, got %d" % (chunk_size, len(value))
+                        "expected %d bytes, got %d" % (chunk_size, received)
                     )
 
                 if self._rbfile.read(1) != b"\n":
@@ -667,42 +1101,76 @@ class MPDClient(MPDClientBase):
 
     def _execute_binary(
         self, command: str, args: List[Any]
-    ) -> Dict[str, Union[str, bytes]]:
+    ) -> Dict[str, Union[str, bytes, bytearray]]:
+        """Execute a binary command, answering it from binary_cache if
+        possible."""
+        if self._iterating or self._command_list is not None:
+            raise IteratingError(
+                "Cannot execute '{}' with command lists".format(command)
+            )
+        if self._pipeline is not None:
+            raise CommandListError("'{}' not allowed in pipeline".format(command))
+        cache = self.binary_cache
+        if cache is None:
+            return self._fetch_binary(command, args)
+        if cache.stamp is None:
+            cache.invalidate(self.stats().get("db_update", ""))
+        uri = args[0]
+        result = cache.get(command, uri)
+        if result is None:
+            try:
+                result = self._fetch_binary(command, args)
+            except CommandError as error:
+                cache.put_error(command, uri, error)
+                raise
+            cache.put(command, uri, result)
+        return result
+
+    def _fetch_binary(
+        self, command: str, args: List[Any]
+    ) -> Dict[str, Union[str, bytes, bytearray]]:
         """Execute a command repeatedly with an additional offset argument,
-        keeping all the identical returned dictionary items and concatenating
+        keeping all the identical returned dictionary items and collecting
         the binary chunks following the binary item into one of exactly size.
 
+        The chunks are read right into a buffer allocated once with the size
+        announced in the first response. Unless zero_copy_binary is set, that
+        buffer is returned as bytes (at the cost of one final copy).
+
         This differs from _execute in that rather than passing the lines to the
         callback which'd then call on something like _parse_objects, it builds
         a parsed object on its own (as a prerequisite to the chunk driving
         process) and then joins together the chunks into a single big response."""
-        if self._iterating or self._command_list is not None:
-            raise IteratingError(
-                "Cannot execute '{}' with command lists".format(command)
-            )
-        data = None
+        buffer: Optional[bytearray] = None
+        received = 0
         args = list(args)
         assert len(args) == 1
         args.append(0)
         final_metadata = None
         while True:
+            started = time.monotonic()
             self._write_command(command, args)
-            metadata = self._read_binary()
+            metadata = self._read_binary(buffer, received)
             chunk = metadata.pop("binary", None)
+            chunk_size = 0
+            if chunk is not None:
+                assert isinstance(chunk, memoryview)
+                assert isinstance(chunk.obj, bytearray)
+                if buffer is None:
+                    buffer = chunk.obj
+                chunk_size = len(chunk)
+                # the data is in the buffer already, and the buffer can only be
+                # resized once no view of it is left
+                chunk.release()
 
             if final_metadata is None:
-                data = chunk
                 final_metadata = metadata
-                if not data:
+                if chunk is None or not chunk_size:
                     break
                 try:
                     size = int(final_metadata["size"])
                 except KeyError:
-                    if chunk is None:
-                        raise CommandError(
-                            "Binary field vanished changed during transfer"
-                        )
-                    size = len(chunk)
+                    size = chunk_size
                 except ValueError:
                     raise CommandError("Size data unsuitable for binary transfer")
             else:
@@ -712,19 +1180,25 @@ class MPDClient(MPDClientBase):
                     )
                 if chunk is None:
                     raise CommandError("Binary field vanished changed during transfer")
-                data += chunk
-            args[-1] = len(data)
-            if len(data) > size:
+            received += chunk_size
+            args[-1] = received
+            if received > size:
                 raise CommandListError("Binary data announced size exceeded")
-            elif len(data) == size:
+            elif received == size:
                 break
+            limit = self._adapted_binary_limit(chunk_size, time.monotonic() - started)
+            if limit is not None:
+                self._negotiate_binary_limit(limit)
 
-        if data is not None:
-            final_metadata["binary"] = data
+        assert final_metadata is not None
+        result = cast(Dict[str, Union[str, bytes, bytearray]], dict(final_metadata))
+        if buffer is not None:
+            del buffer[received:]
+            result["binary"] = buffer if self.zero_copy_binary else bytes(buffer)
 
-        final_metadata.pop("size", None)
+        result.pop("size", None)
 
-        return final_metadata
+        return result
 
     def _read_command_list(self) -> Iterator[Dict[str, str]]:
         try:
@@ -736,6 +1210,62 @@ class MPDClient(MPDClientBase):
             self._command_list = None
         self._parse_nothing(self._read_lines())
 
+    def paginate(
+        self,
+        command: str,
+        *args: Any,
+        page_size: int = 1000,
+        prefetch: bool = False,
+    ) -> Iterator[Dict[str, str]]:
+        """Iterate over the results of a song listing command (find, search,
+        playlistinfo or plchanges), fetching them in windows of page_size
+        songs rather than in a single response.
+
+        With prefetch, the next page is requested before the songs of the
+        current one are handed out, so that the server can work on it in the
+        meantime. Until the iteration is complete (or closed), no other
+        commands can be sent then."""
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+        # fail early for unknown commands
+        self._window_args(command, args, 0, page_size)
+        if self._iterating or self._command_list is not None:
+            raise IteratingError("Cannot paginate '{}' while iterating".format(command))
+        return self._paginate(command, args, page_size, prefetch)
+
+    def _paginate(
+        self, command: str, args: Iterable[Any], page_size: int, prefetch: bool
+    ) -> Iterator[Dict[str, str]]:
+        start = 0
+        pending = False
+        try:
+            self._write_command(
+                command, self._window_args(command, args, start, start + page_size)
+            )
+            while True:
+                page = list(self._parse_songs(self._read_lines()))
+                pending = self._iterating = False
+                start += page_size
+                more = len(page) >= page_size
+                next_args = self._window_args(command, args, start, start + page_size)
+                if more and prefetch:
+                    self._write_command(command, next_args)
+                    pending = self._iterating = True
+                yield from page
+                if not more:
+                    return
+                if not prefetch:
+                    self._write_command(command, next_args)
+        finally:
+            if pending:
+                # drain the response of the prefetched page
+                self._iterating = False
+                try:
+                    for _ in self._read_lines():
+                        pass
+                except CommandError:
+                    pass
+
     def _iterator_wrapper(
         self, iterator: Iterator[Dict[str, str]]
     ) -> Iterator[Dict[str, str]]:
@@ -748,6 +1278,9 @@ class MPDClient(MPDClientBase):
     def _wrap_iterator(
         self, iterator: Iterator[Dict[str, str]]
     ) -> Iterator[Union[Dict[str, str], List[Dict[str, str]]]]:
+        if not isinstance(iterator, Iterator):
+            # already complete result, eg. from columnar parsing
+            return iterator
         if not self.iterate:
             return list(iterator)
         self._iterating = True
@@ -804,7 +1337,9 @@ class MPDClient(MPDClientBase):
     ) -> Iterator[Union[Dict[str, str], List[Dict[str, str]]]]:
         if self._sock is not None:
             self._sock.settimeout(self.idletimeout)
-        ret = self._wrap_iterator(self._parse_list(lines))
+        changes = list(self._parse_list(lines))
+        self._idle_changes(changes)
+        ret = self._wrap_iterator(iter(changes))
         if self._sock is not None:
             self._sock.settimeout(self._timeout)
         return ret
@@ -843,20 +1378,30 @@ class MPDClient(MPDClientBase):
                 )
             self._sock = self._connect_tcp(host, port)
 
-        # - Force UTF-8 encoding, since this is dependant from the LC_CTYPE
-        #   locale.
-        # - by setting newline explicit, we force to send '\n' also on
-        #   windows
+        # Both directions are binary: commands are encoded by
+        # encode_command, and responses decoded line by line (or in bulk)
         self._rbfile = self._sock.makefile("rb", newline="\n")
-        self._wfile = self._sock.makefile("w", encoding="utf-8", newline="\n")
+        self._wfile = self._sock.makefile("wb")
 
         try:
             helloline = self._rbfile.readline().decode("utf-8")
             self._hello(helloline)
+            if self.binary_limit is not None:
+                self._negotiate_binary_limit(self.binary_limit)
         except Exception:
             self.disconnect()
             raise
 
+    def _negotiate_binary_limit(self, limit: Optional[int]) -> None:
+        while limit is not None:
+            try:
+                self.binarylimit(limit)
+            except CommandError as error:
+                limit = self._binary_limit_refused(limit, error)
+            else:
+                self._binary_limit = limit
+                return
+
     def disconnect(self) -> None:
         logger.info("Calling MPD disconnect()")
         if self._rbfile is not None and not isinstance(self._rbfile, _NotConnected):
@@ -872,6 +1417,112 @@ class MPDClient(MPDClientBase):
             raise ConnectionError("Not connected")
         return self._sock.fileno()
 
+    def pipeline(self) -> Pipeline:
+        """Return a new ``Pipeline`` for sending several commands at once."""
+        return Pipeline(self)
+
+    def bulk(
+        self,
+        commands: Iterable[Union[str, Sequence[Any]]],
+        chunk_size: int = 1000,
+        max_bytes: int = BULK_MAX_BYTES,
+        in_flight: int = 2,
+    ) -> List[Any]:
+        """Execute a large number of commands, given as (command, *args)
+        sequences, and return their results in order.
+
+        The commands are sent in command lists of at most chunk_size commands
+        and max_bytes bytes (which must stay below the server's
+        max_command_list_size). Up to in_flight of those lists are sent
+        before the results of the first are read.
+
+        If a command fails, the remaining commands of its list are not
+        executed, and its CommandError is raised after the lists that were
+        already sent have been processed. Its ``index`` is the position of
+        the failed command, and its ``results`` holds the results of the
+        commands that were executed (by position)."""
+        if self._iterating or self._command_list is not None:
+            raise IteratingError("Cannot execute bulk commands while iterating")
+        chunks = self._bulk_chunks(commands, chunk_size, max_bytes)
+        pending: Deque[List[Callable[[], Any]]] = deque()
+        results: List[Any] = []
+        current: List[Callable[[], Any]] = []
+        start = 0
+        try:
+            for data, retvals in chunks:
+                self._write_bytes(data)
+                pending.append(retvals)
+                if len(pending) >= in_flight:
+                    current, start = pending.popleft(), len(results)
+                    self._read_bulk_chunk(current, results)
+            while pending:
+                current, start = pending.popleft(), len(results)
+                self._read_bulk_chunk(current, results)
+        except CommandError as error:
+            error.index = len(results)
+            error.results = dict(enumerate(results))
+            # the server executes the lists sent so far nevertheless
+            offset = start + len(current)
+            while pending:
+                retvals = pending.popleft()
+                later: List[Any] = []
+                try:
+                    self._read_bulk_chunk(retvals, later)
+                except CommandError:
+                    pass
+                error.results.update(enumerate(later, offset))
+                offset += len(retvals)
+            raise
+        return results
+
+    def _bulk_chunks(
+        self,
+        commands: Iterable[Union[str, Sequence[Any]]],
+        chunk_size: int,
+        max_bytes: int,
+    ) -> List[Tuple[bytearray, List[Callable[[], Any]]]]:
+        """Encode the commands into command lists, returning each with the
+        callbacks that parse the responses of its commands."""
+        # Collecting them all first ensures that nothing is sent if any of
+        # the commands is unknown or can't be used in a command list.
+        pipeline = Pipeline(self)
+        for item in commands:
+            if isinstance(item, str):
+                item = (item,)
+            getattr(pipeline, item[0].replace(" ", "_"))(*item[1:])
+        begin = encode_command("command_list_ok_begin")
+        end = encode_command("command_list_end")
+        chunks = []
+        buffer = bytearray(begin)
+        retvals: List[Callable[[], Any]] = []
+        for command, args, retval in pipeline._commands:
+            line = encode_command(command, args)
+            if retvals and (
+                len(retvals) >= chunk_size
+                or len(buffer) + len(line) + len(end) > max_bytes
+            ):
+                chunks.append((buffer + end, retvals))
+                buffer = bytearray(begin)
+                retvals = []
+            buffer += line
+            retvals.append(retval)
+            log_command(command, args)
+        if retvals:
+            chunks.append((buffer + end, retvals))
+        return chunks
+
+    def _read_bulk_chunk(
+        self, retvals: List[Callable[[], Any]], results: List[Any]
+    ) -> None:
+        """Read the results of a command list into results, which holds the
+        ones before a failed command then."""
+        self._command_list = retvals
+        result: Any
+        for result in self._read_command_list():
+            if isinstance(result, Iterator):
+                result = list(result)
+            results.append(result)
+
     def command_list_ok_begin(self) -> None:
         if self._command_list is not None:
             raise CommandListError("Already in command list")
@@ -897,6 +1548,8 @@ class MPDClient(MPDClientBase):
                 return callback(self, cls._execute_binary(self, name, args))
         else:
             method = _create_command(cls._execute, name, callback, wrap_result)
+        # marks the commands that can be pipelined
+        setattr(method, "mpd_command", True)
         # create new mpd commands as function:
         escaped_name = name.replace(" ", "_")
         setattr(cls, escaped_name, method)
@@ -0,0 +1,229 @@
+# python-mpd2: Python MPD client library
+#
+# python-mpd2 is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-mpd2 is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with python-mpd2.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Cache for the results of the binary commands (albumart, readpicture)."""
+
+import hashlib
+import json
+import os
+import posixpath
+import shutil
+import tempfile
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from mpd.base import CommandError, FailureResponseCode
+
+Key = Tuple[str, str, str]
+
+
+class AlbumArtCache:
+    """Cache for the results of ``albumart`` and ``readpicture``.
+
+    Results are kept in memory, in a least recently used list bounded to
+    ``max_bytes`` of binary data. With a ``directory``, they are additionally
+    stored on disk, where the binary data is stored by its SHA-256 digest (so
+    that the many songs of an album share a single copy of their cover).
+
+    ``albumart`` results are cached per directory of the song (as that is
+    where MPD looks for the cover files), ``readpicture`` results per song.
+    Both also keep that there is no picture, so that asking again does not
+    need the server either.
+
+    The entries are only valid for the ``stamp`` they were stored with, the
+    ``db_update`` time of the database. The clients call ``invalidate()``
+    whenever the database changes, and set the stamp from ``stats`` again
+    before their next binary command; as long as it is None, the cache is
+    not used. On-disk entries are thus reused by later runs until the
+    database is updated, when the ones of other stamps are deleted::
+
+        client.binary_cache = mpd.AlbumArtCache(directory="/var/cache/covers")
+
+    Results from the cache are always returned with their data as ``bytes``.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        directory: Optional[str] = None,
+        stamp: Optional[str] = None,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.stamp: Optional[str] = None
+        self._entries: "OrderedDict[Key, Dict[str, Any]]" = OrderedDict()
+        self._size = 0
+        self.invalidate(stamp)
+
+    @staticmethod
+    def _key_path(command: str, uri: str) -> str:
+        if command == "albumart":
+            return posixpath.dirname(uri)
+        return uri
+
+    def get(self, command: str, uri: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached result of the command for the uri, or
+        None if there is none. Raises the original CommandError if the cached
+        result is that the uri has no picture."""
+        if self.stamp is None:
+            return None
+        key = (command, self._key_path(command, uri), self.stamp)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        elif self.directory is not None:
+            entry = self._load(key)
+            if entry is not None:
+                self._remember(key, entry)
+        if entry is None:
+            return None
+        error = entry.get("error")
+        if error is not None:
+            raise CommandError(error)
+        return dict(entry)
+
+    def put(self, command: str, uri: str, result: Dict[str, Any]) -> None:
+        """Store the result of the command for the uri."""
+        if self.stamp is None:
+            return
+        entry = dict(result)
+        if "binary" in entry:
+            entry["binary"] = bytes(entry["binary"])
+        key = (command, self._key_path(command, uri), self.stamp)
+        self._remember(key, entry)
+        if self.directory is not None:
+            self._store(key, entry)
+
+    def put_error(self, command: str, uri: str, error: CommandError) -> None:
+        """Store that the command failed for the uri, if the error says that
+        there is no picture (and not just that something else went wrong)."""
+        if error.errno is FailureResponseCode.NO_EXIST:
+            self.put(command, uri, {"error": error.args[0]})
+
+    def invalidate(self, stamp: Optional[str] = None) -> None:
+        """Have entries only be valid for the given stamp from now on, or
+        not use the cache until one is set. Entries in memory are forgotten,
+        and the ones on disk deleted, unless they are of that stamp."""
+        if stamp is not None and stamp == self.stamp:
+            return
+        self.stamp = stamp
+        self._entries.clear()
+        self._size = 0
+        if stamp is not None and self.directory is not None:
+            self._prune()
+
+    def _remember(self, key: Key, entry: Dict[str, Any]) -> None:
+        size = len(entry.get("binary", b""))
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous.get("binary", b""))
+        self._entries[key] = entry
+        self._size += size
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted.get("binary", b""))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # on-disk storage: an index file per key (in a directory per stamp) holds
+    # the metadata and the digest of the binary data, which is stored in
+    # objects/
+
+    def _stamp_directory(self) -> str:
+        assert self.directory is not None and self.stamp is not None
+        name = hashlib.sha256(self.stamp.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, "index", name)
+
+    def _index_path(self, key: Key) -> str:
+        name = hashlib.sha256("\0".join(key).encode("utf-8")).hexdigest()
+        return os.path.join(self._stamp_directory(), name[:2], name)
+
+    def _object_path(self, digest: str) -> str:
+        assert self.directory is not None
+        return os.path.join(self.directory, "objects", digest[:2], digest)
+
+    def _load(self, key: Key) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._index_path(key), encoding="utf-8") as index:
+                entry = json.load(index)
+            digest = entry.pop("digest", None)
+            if digest is not None:
+                with open(self._object_path(digest), "rb") as data:
+                    entry["binary"] = data.read()
+                if hashlib.sha256(entry["binary"]).hexdigest() != digest:
+                    return None
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def _store(self, key: Key, entry: Dict[str, Any]) -> None:
+        index = {k: v for k, v in entry.items() if k != "binary"}
+        try:
+            if "binary" in entry:
+                digest = hashlib.sha256(entry["binary"]).hexdigest()
+                index["digest"] = digest
+                path = self._object_path(digest)
+                if not os.path.exists(path):
+                    self._write_file(path, entry["binary"])
+            self._write_file(self._index_path(key), json.dumps(index).encode("utf-8"))
+        except OSError:
+            # The disk tier is only an optimization
+            pass
+
+    def _prune(self) -> None:
+        """Delete the index files of other stamps, along with the binary data
+        that only they referred to."""
+        assert self.directory is not None
+        current = self._stamp_directory()
+        index, own = os.path.split(current)
+        try:
+            stale = [name for name in os.listdir(index) if name != own]
+        except OSError:
+            return
+        if not stale:
+            return
+        for name in stale:
+            shutil.rmtree(os.path.join(index, name), ignore_errors=True)
+        referenced = set()
+        for parent, _, files in os.walk(current):
+            for name in files:
+                try:
+                    with open(os.path.join(parent, name), encoding="utf-8") as file:
+                        referenced.add(json.load(file).get("digest"))
+                except (OSError, ValueError):
+                    pass
+        for parent, _, files in os.walk(os.path.join(self.directory, "objects")):
+            for name in files:
+                if name not in referenced:
+                    try:
+                        os.unlink(os.path.join(parent, name))
+                    except OSError:
+                        pass
+
+    @staticmethod
+    def _write_file(path: str, data: bytes) -> None:
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
@@ -0,0 +1,277 @@
+# python-mpd2: Python MPD client library
+#
+# python-mpd2 is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-mpd2 is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with python-mpd2.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Running commands on many MPD servers at once.
+
+``MPDFleet`` is used from asyncio code; ``BlockingMPDFleet`` offers the same
+on a private event loop for code that otherwise uses the blocking client."""
+
+import asyncio
+from functools import partial
+from typing import (
+    Any,
+    AsyncGenerator,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from mpd.asyncio import MPDClient
+from mpd.base import ConnectionError
+
+Host = Union[str, Tuple[str, int]]
+
+
+class FleetResult(NamedTuple):
+    """Outcome of a command on one server of a fleet: either its result, or
+    the exception it failed with (eg. a ``CommandError``, a
+    ``ConnectionError`` or an ``asyncio.TimeoutError``)."""
+
+    host: str
+    result: Any = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class MPDFleet:
+    """Connections to a number of MPD servers, on which the same command can
+    be run concurrently.
+
+    Hosts are given as ``"host"`` (for the default port or a socket path),
+    ``"host:port"`` or ``(host, port)``; results are reported by the host
+    name in the ``"host:port"`` form (or the socket path). Servers are
+    connected to on first use, and again after they failed::
+
+        fleet = MPDFleet(["kitchen", "livingroom:6601"], timeout=0.5)
+        async for outcome in fleet.execute("status"):
+            if outcome.ok:
+                print(outcome.host, outcome.result["state"])
+
+    Each server gets ``timeout`` seconds to connect and respond; one that
+    doesn't is disconnected and reported with an ``asyncio.TimeoutError``,
+    so a call takes no longer than that in total.
+    """
+
+    def __init__(
+        self,
+        hosts: Iterable[Host],
+        timeout: Optional[float] = 1.0,
+        password: Optional[str] = None,
+        client_class: Callable[[], MPDClient] = MPDClient,
+    ) -> None:
+        self.timeout = timeout
+        self.password = password
+        self.client_class = client_class
+        self._addresses: Dict[str, Tuple[str, int]] = {}
+        self._clients: Dict[str, MPDClient] = {}
+        #: Connections being established, shared by all calls that need them
+        self._connecting: Dict[str, "asyncio.Task[MPDClient]"] = {}
+        for host in hosts:
+            name, address = self._parse_host(host)
+            self._addresses[name] = address
+
+    @staticmethod
+    def _parse_host(host: Host) -> Tuple[str, Tuple[str, int]]:
+        if isinstance(host, tuple):
+            return "%s:%d" % host, host
+        if host.startswith(("/", "@")):
+            return host, (host, 6600)
+        name, colon, port = host.rpartition(":")
+        if colon and port.isdigit() and ":" not in name:
+            return host, (name, int(port))
+        return "%s:%d" % (host, 6600), (host, 6600)
+
+    @property
+    def hosts(self) -> List[str]:
+        return list(self._addresses)
+
+    async def _connect(self, host: str) -> MPDClient:
+        client = self.client_class()
+        try:
+            await client.connect(*self._addresses[host])
+            if self.password is not None:
+                await client.password(self.password)
+        except BaseException:
+            client.disconnect()
+            raise
+        self._clients[host] = client
+        return client
+
+    def _connected(self, host: str, task: "asyncio.Task[MPDClient]") -> None:
+        if self._connecting.get(host) is task:
+            del self._connecting[host]
+        if not task.cancelled():
+            # reported to the callers, if any are still waiting
+            task.exception()
+
+    async def _connected_client(self, host: str) -> MPDClient:
+        client = self._clients.get(host)
+        if client is not None and client.connected:
+            return client
+        task = self._connecting.get(host)
+        if task is None:
+            task = self._connecting[host] = asyncio.ensure_future(self._connect(host))
+            task.add_done_callback(partial(self._connected, host))
+        # a caller that times out leaves the connection to the others
+        return await asyncio.shield(task)
+
+    async def _execute_on(self, host: str, command: str, args: Tuple[Any, ...]) -> Any:
+        client = await self._connected_client(host)
+        return await getattr(client, command.replace(" ", "_"))(*args)
+
+    async def _outcome(
+        self,
+        host: str,
+        command: str,
+        args: Tuple[Any, ...],
+        timeout: Optional[float],
+    ) -> FleetResult:
+        try:
+            result = await asyncio.wait_for(
+                self._execute_on(host, command, args), timeout
+            )
+        except asyncio.TimeoutError as error:
+            # a late response would be in the way of the next command
+            self._disconnect(host)
+            return FleetResult(host, error=error)
+        except Exception as error:
+            if isinstance(error, ConnectionError):
+                self._disconnect(host)
+            return FleetResult(host, error=error)
+        return FleetResult(host, result)
+
+    def _tasks(
+        self,
+        command: str,
+        args: Tuple[Any, ...],
+        timeout: Optional[float],
+        hosts: Optional[Iterable[str]],
+    ) -> List["asyncio.Task[FleetResult]"]:
+        if timeout is None:
+            timeout = self.timeout
+        return [
+            asyncio.ensure_future(self._outcome(host, command, args, timeout))
+            for host in (self._addresses if hosts is None else hosts)
+        ]
+
+    async def execute(
+        self,
+        command: str,
+        *args: Any,
+        timeout: Optional[float] = None,
+        hosts: Optional[Iterable[str]] = None,
+    ) -> AsyncGenerator[FleetResult, None]:
+        """Run the command on all servers (or the given ones) at once, and
+        yield their ``FleetResult`` in the order they complete."""
+        tasks = self._tasks(command, args, timeout, hosts)
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def gather(
+        self,
+        command: str,
+        *args: Any,
+        timeout: Optional[float] = None,
+        hosts: Optional[Iterable[str]] = None,
+    ) -> Dict[str, FleetResult]:
+        """Run the command on all servers (or the given ones) at once, and
+        return all their ``FleetResult`` by host."""
+        return {
+            outcome.host: outcome
+            async for outcome in self.execute(
+                command, *args, timeout=timeout, hosts=hosts
+            )
+        }
+
+    def _disconnect(self, host: str) -> None:
+        client = self._clients.pop(host, None)
+        if client is not None:
+            client.disconnect()
+
+    def disconnect(self) -> None:
+        for task in list(self._connecting.values()):
+            task.cancel()
+        for host in list(self._clients):
+            self._disconnect(host)
+
+
+class BlockingMPDFleet:
+    """Blocking interface to a ``MPDFleet``, which runs on a private event
+    loop while its methods are called::
+
+        fleet = BlockingMPDFleet(["kitchen", "livingroom"])
+        for outcome in fleet.execute("currentsong"):
+            ...
+        fleet.disconnect()
+
+    Takes the same arguments as ``MPDFleet``.
+    """
+
+    def __init__(self, hosts: Iterable[Host], **kwargs: Any) -> None:
+        self._loop = asyncio.new_event_loop()
+        self.fleet = MPDFleet(hosts, **kwargs)
+
+    def execute(
+        self,
+        command: str,
+        *args: Any,
+        timeout: Optional[float] = None,
+        hosts: Optional[Iterable[str]] = None,
+    ) -> Iterator[FleetResult]:
+        """Like ``MPDFleet.execute``; the servers only make progress while
+        the iterator is being advanced."""
+        outcomes = self.fleet.execute(command, *args, timeout=timeout, hosts=hosts)
+        try:
+            while True:
+                try:
+                    yield self._loop.run_until_complete(outcomes.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            self._loop.run_until_complete(outcomes.aclose())
+
+    def gather(
+        self,
+        command: str,
+        *args: Any,
+        timeout: Optional[float] = None,
+        hosts: Optional[Iterable[str]] = None,
+    ) -> Dict[str, FleetResult]:
+        return self._loop.run_until_complete(
+            self.fleet.gather(command, *args, timeout=timeout, hosts=hosts)
+        )
+
+    def disconnect(self) -> None:
+        self.fleet.disconnect()
+        # let the connections' tasks finish their cancellation
+        self._loop.run_until_complete(asyncio.sleep(0))
+
+    def close(self) -> None:
+        """Disconnect from all servers, and release the event loop."""
+        self.disconnect()
+        self._loop.close()
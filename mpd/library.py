@@ -0,0 +1,301 @@
+# python-mpd2: Python MPD client library
+#
+# python-mpd2 is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-mpd2 is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with python-mpd2.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Copy of the MPD database in a local SQLite file."""
+
+import json
+from contextlib import closing, contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+#: Tags that are indexed by default
+DEFAULT_TAGS = (
+    "album",
+    "albumartist",
+    "artist",
+    "composer",
+    "date",
+    "genre",
+    "performer",
+    "title",
+)
+
+#: Number of songs written to the database at a time
+BATCH_SIZE = 1000
+
+SCHEMA_VERSION = "1"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS songs (
+    id INTEGER PRIMARY KEY, file TEXT NOT NULL UNIQUE, data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tags (
+    song INTEGER NOT NULL, tag TEXT NOT NULL, value TEXT NOT NULL
+);
+"""
+
+_TAG_INDEX = "CREATE INDEX IF NOT EXISTS tags_value ON tags (tag, value, song)"
+
+
+@contextmanager
+def _plain_songs(client: Any) -> Iterator[None]:
+    """Have the client parse songs into plain dicts (and stream them, for
+    the blocking client) within the block, whatever modes it is set to."""
+    modes = (client.iterate, client.columnar, client.lazy_songs, client.song_factory)
+    client.iterate = True
+    client.columnar = client.lazy_songs = False
+    client.song_factory = None
+    try:
+        yield
+    finally:
+        client.iterate, client.columnar, client.lazy_songs, client.song_factory = modes
+
+
+@contextmanager
+def _listallinfo(client: Any) -> Iterator[Iterator[Mapping[str, Any]]]:
+    """Stream ``listallinfo`` from the blocking client. If the block is left
+    early, the rest of the response is read, so that the client can be used
+    again."""
+    with _plain_songs(client):
+        entries = client.listallinfo()
+    with closing(entries):
+        try:
+            yield entries
+        finally:
+            # a no-op if the iteration is complete or failed by itself
+            for _ in entries:
+                pass
+
+
+class LibraryMirror:
+    """Copy of the songs in the MPD database, stored in a SQLite file.
+
+    The songs are loaded from ``listallinfo`` (streamed, so that the whole
+    library is never held in memory at once), along with the ``db_update``
+    time from ``stats``. A ``refresh`` does nothing as long as that time is
+    unchanged, so that a service that starts with an existing file is ready
+    at once::
+
+        library = LibraryMirror("/var/cache/mpd-library.sqlite")
+        library.refresh(client)
+        songs = library.find(artist="Nina Simone", album="Pastel Blues")
+
+    The values of the given ``tags`` are indexed for ``find`` and ``values``
+    (including every value of tags that occur multiple times in a song). The
+    mirror can be queried without any connection to the server; ``follow``
+    (or ``follow_async``) keeps it up to date whenever idle reports a change
+    of the database.
+    """
+
+    def __init__(self, path: str, tags: Iterable[str] = DEFAULT_TAGS) -> None:
+        self.path = path
+        self.tags = tuple(sorted(set(tag.lower() for tag in tags)))
+        # imported here, so that the client does not need sqlite3 (which is
+        # missing from some Python builds)
+        import sqlite3
+
+        self._connection = sqlite3.connect(path)
+        # readers in other processes keep seeing the old library while it
+        # is being refreshed
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        with self._connection:
+            self._connection.executescript(_SCHEMA)
+            self._connection.execute(_TAG_INDEX)
+        if self._meta("schema") != SCHEMA_VERSION or self._meta("tags") != ",".join(
+            self.tags
+        ):
+            # needs to be loaded again
+            self._set_meta("db_update", None)
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._connection.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def _set_meta(self, key: str, value: Optional[str]) -> None:
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+            )
+
+    @property
+    def db_update(self) -> Optional[str]:
+        """The ``db_update`` time of the database that the mirror holds, or
+        None if it was not loaded yet."""
+        return self._meta("db_update")
+
+    # loading
+
+    def _begin(self) -> None:
+        cursor = self._connection.cursor()
+        cursor.execute("BEGIN")
+        cursor.execute("DELETE FROM songs")
+        cursor.execute("DELETE FROM tags")
+        # it is faster to build the index once all rows are in
+        cursor.execute("DROP INDEX IF EXISTS tags_value")
+        self._next_id = 1
+
+    def _insert(self, songs: List[Mapping[str, Any]]) -> None:
+        song_rows: List[Tuple[int, str, str]] = []
+        tag_rows: List[Tuple[int, str, str]] = []
+        for song in songs:
+            song = dict(song)
+            song_id = self._next_id
+            self._next_id += 1
+            song_rows.append((song_id, song["file"], json.dumps(song)))
+            for tag in self.tags:
+                value = song.get(tag)
+                if value is None:
+                    continue
+                if isinstance(value, list):
+                    tag_rows.extend((song_id, tag, v) for v in value)
+                else:
+                    tag_rows.append((song_id, tag, value))
+        self._connection.executemany("INSERT INTO songs VALUES (?, ?, ?)", song_rows)
+        self._connection.executemany("INSERT INTO tags VALUES (?, ?, ?)", tag_rows)
+
+    def _commit(self, db_update: Optional[str]) -> None:
+        cursor = self._connection.cursor()
+        cursor.execute(_TAG_INDEX)
+        cursor.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [
+                ("db_update", db_update),
+                ("schema", SCHEMA_VERSION),
+                ("tags", ",".join(self.tags)),
+            ],
+        )
+        self._connection.commit()
+
+    def _rollback(self) -> None:
+        self._connection.rollback()
+
+    def refresh(self, client: Any, force: bool = False) -> bool:
+        """Load the database with the blocking client, unless the mirror
+        already holds the current one. Returns whether it was loaded."""
+        db_update = client.stats().get("db_update")
+        if not force and db_update is not None and db_update == self.db_update:
+            return False
+        self._begin()
+        try:
+            with _listallinfo(client) as entries:
+                batch: List[Mapping[str, Any]] = []
+                for entry in entries:
+                    if "file" not in entry:
+                        # directories and playlists
+                        continue
+                    batch.append(entry)
+                    if len(batch) >= BATCH_SIZE:
+                        self._insert(batch)
+                        batch = []
+                self._insert(batch)
+        except BaseException:
+            self._rollback()
+            raise
+        self._commit(db_update)
+        return True
+
+    async def refresh_async(self, client: Any, force: bool = False) -> bool:
+        """Like ``refresh``, for the asyncio client."""
+        db_update = (await client.stats()).get("db_update")
+        if not force and db_update is not None and db_update == self.db_update:
+            return False
+        with _plain_songs(client):
+            entries = client.listallinfo().__aiter__()
+        self._begin()
+        try:
+            batch: List[Mapping[str, Any]] = []
+            async for entry in entries:
+                if "file" not in entry:
+                    continue
+                batch.append(entry)
+                if len(batch) >= BATCH_SIZE:
+                    self._insert(batch)
+                    batch = []
+            self._insert(batch)
+        except BaseException:
+            self._rollback()
+            raise
+        self._commit(db_update)
+        return True
+
+    def follow(self, client: Any) -> None:
+        """Refresh the mirror with the blocking client, and again whenever
+        the database changes. Does not return."""
+        self.refresh(client)
+        while True:
+            if "database" in client.idle("database"):
+                self.refresh(client)
+
+    async def follow_async(self, client: Any) -> None:
+        """Like ``follow``, for the asyncio client."""
+        await self.refresh_async(client)
+        async for _ in client.idle(["database"]):
+            await self.refresh_async(client)
+
+    # queries
+
+    def find(self, **tags: str) -> List[Dict[str, Any]]:
+        """Return the songs that have all the given tag values (compared
+        exactly), like ``find(artist="...", album="...")``."""
+        if not tags:
+            raise TypeError("find() needs at least one tag")
+        conditions = []
+        parameters: List[str] = []
+        for tag, value in tags.items():
+            tag = tag.lower()
+            if tag not in self.tags:
+                raise ValueError("Tag '{}' is not indexed".format(tag))
+            conditions.append(
+                "id IN (SELECT song FROM tags WHERE tag = ? AND value = ?)"
+            )
+            parameters += [tag, value]
+        rows = self._connection.execute(
+            "SELECT data FROM songs WHERE {} ORDER BY id".format(
+                " AND ".join(conditions)
+            ),
+            parameters,
+        )
+        return [json.loads(data) for (data,) in rows]
+
+    def values(self, tag: str) -> List[str]:
+        """Return the distinct values of an indexed tag, sorted."""
+        tag = tag.lower()
+        if tag not in self.tags:
+            raise ValueError("Tag '{}' is not indexed".format(tag))
+        rows = self._connection.execute(
+            "SELECT DISTINCT value FROM tags WHERE tag = ? ORDER BY value", (tag,)
+        )
+        return [value for (value,) in rows]
+
+    def song(self, file: str) -> Optional[Dict[str, Any]]:
+        """Return the song with the given file name, or None."""
+        row = self._connection.execute(
+            "SELECT data FROM songs WHERE file = ?", (file,)
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM songs").fetchone()[0]
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> "LibraryMirror":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
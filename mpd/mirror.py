@@ -0,0 +1,166 @@
+# python-mpd2: Python MPD client library
+#
+# python-mpd2 is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-mpd2 is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with python-mpd2.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Local copies of server state that are kept up to date incrementally."""
+
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+Song = Mapping[str, Any]
+
+
+class QueueMirror:
+    """Local copy of the queue, updated with the changes since the last
+    refresh rather than by reloading it as a whole.
+
+    Call ``refresh`` (or ``refresh_async`` with the asyncio client) initially
+    and whenever idle reports a change of the ``playlist`` subsystem::
+
+        queue = QueueMirror()
+        queue.refresh(client)
+        while True:
+            if "playlist" in client.idle("playlist"):
+                queue.refresh(client)
+            current = queue.song(client.currentsong().get("id"))
+
+    Only the first refresh loads the whole queue with ``playlistinfo``; later
+    ones fetch the songs whose position changed since the queue version of
+    the last refresh with ``plchanges``, and drop the songs beyond the new
+    queue length. As the version is kept, a mirror that is refreshed again
+    after a reconnect only catches up on the changes it missed. (Use one
+    mirror per server, though: a server that reports a lower version than
+    the one known, eg. as it was restarted, is loaded from scratch.)
+
+    With ``tags=False``, the mirror uses ``plchangesposid`` instead, and only
+    holds the position and id of each song, as ``{"pos": ..., "id": ...}``.
+    That is much cheaper when songs are moved around in large queues.
+    """
+
+    def __init__(self, tags: bool = True) -> None:
+        self.tags = tags
+        #: Queue version that the mirror corresponds to, or None before the
+        # first refresh
+        self.version: Optional[int] = None
+        self._songs: List[Optional[Song]] = []
+        #: Positions of the songs by their id
+        self._positions: Dict[str, int] = {}
+
+    def _plan(self, status: Mapping[str, Any]) -> Optional[Tuple[str, int]]:
+        """Return the command and version to fetch the changes until the
+        version in status, or None if there are none."""
+        version = int(status["playlist"])
+        if self.version is not None and version == self.version:
+            return None
+        if self.version is None or version < self.version:
+            # a full reload
+            return ("playlistinfo", 0) if self.tags else ("plchangesposid", 0)
+        return ("plchanges" if self.tags else "plchangesposid", self.version)
+
+    @staticmethod
+    def _fetch(client: Any, plan: Tuple[str, int]) -> Any:
+        command, version = plan
+        if command == "playlistinfo":
+            return client.playlistinfo()
+        return getattr(client, command)(version)
+
+    def refresh(self, client: Any, status: Optional[Mapping[str, Any]] = None) -> bool:
+        """Bring the mirror up to date using the blocking client; status can
+        be passed if it was just fetched anyway. Returns whether the queue
+        changed."""
+        if status is None:
+            status = client.status()
+        plan = self._plan(status)
+        if plan is None:
+            return False
+        self._apply(status, plan, self._fetch(client, plan))
+        return True
+
+    async def refresh_async(
+        self, client: Any, status: Optional[Mapping[str, Any]] = None
+    ) -> bool:
+        """Like ``refresh``, for the asyncio client."""
+        if status is None:
+            status = await client.status()
+        plan = self._plan(status)
+        if plan is None:
+            return False
+        self._apply(status, plan, await self._fetch(client, plan))
+        return True
+
+    def _apply(
+        self,
+        status: Mapping[str, Any],
+        plan: Tuple[str, int],
+        changes: Iterable[Song],
+    ) -> None:
+        # The status is fetched before the changes: if the queue changed in
+        # between, the changes go beyond its version, and are fetched again
+        # by the next refresh (for which idle reports the change).
+        command, version = plan
+        songs = self._songs
+        positions = self._positions
+        if version == 0:
+            songs.clear()
+            positions.clear()
+
+        for change in changes:
+            if command == "plchangesposid":
+                change = {"pos": change["cpos"], "id": change["id"]}
+            pos = int(change["pos"])
+            if pos >= len(songs):
+                songs.extend([None] * (pos + 1 - len(songs)))
+            old = songs[pos]
+            if old is not None and positions.get(old["id"]) == pos:
+                del positions[old["id"]]
+            songs[pos] = change
+            positions[change["id"]] = pos
+
+        length = int(status.get("playlistlength", 0))
+        for old in songs[length:]:
+            if old is not None and positions.get(old["id"], -1) >= length:
+                del positions[old["id"]]
+        del songs[length:]
+
+        if None in songs:
+            # Changes that are missing positions can only come from the queue
+            # changing between status and the changes; to be safe, the next
+            # refresh starts over.
+            self.version = None
+        else:
+            self.version = int(status["playlist"])
+
+    @property
+    def songs(self) -> List[Song]:
+        """The songs of the queue, in order. Don't modify this list."""
+        return self._songs  # type: ignore
+
+    def position(self, songid: Any) -> Optional[int]:
+        """Return the position of the song with the given id in the queue, or
+        None if it is not in it."""
+        return self._positions.get(str(songid))
+
+    def song(self, songid: Any) -> Optional[Song]:
+        """Return the song with the given id, or None if it is not in the
+        queue."""
+        pos = self.position(songid)
+        return None if pos is None else self._songs[pos]
+
+    def __len__(self) -> int:
+        return len(self._songs)
+
+    def __iter__(self) -> Iterator[Song]:
+        return iter(self.songs)
+
+    def __getitem__(self, pos: int) -> Song:
+        return self.songs[pos]
@@ -0,0 +1,250 @@
+# python-mpd2: Python MPD client library
+#
+# python-mpd2 is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-mpd2 is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with python-mpd2.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Pool of connections for using the blocking client from several threads."""
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Iterator, List, Optional, Tuple
+
+from mpd.base import ConnectionError, MPDClient, MPDError
+
+logger = logging.getLogger(__name__)
+
+
+class MPDClientPool:
+    """Thread-safe pool of connected ``MPDClient`` instances.
+
+    Each thread checks out a client of its own for as long as it needs it,
+    so that threads don't have to wait for each other's commands::
+
+        pool = MPDClientPool("localhost", 6600, max_size=8)
+        with pool.connection() as client:
+            status = client.status()
+
+    At most ``max_size`` clients are connected at a time; when all of them
+    are in use, checking out waits for one to be returned (for up to
+    ``timeout`` seconds, if given). Clients that were not used for
+    ``idle_timeout`` seconds are disconnected, down to ``min_size`` of them;
+    that happens whenever a client is checked out or returned, so a pool
+    that is not used at all keeps its connections until it is used again
+    (or closed).
+
+    Before a client is handed out, it is checked with ``ping``, and replaced
+    if that fails. A client that raised a ``ConnectionError`` within
+    ``connection()`` is discarded rather than returned to the pool. New
+    connections are set up with the ``password`` and ``partition`` given
+    here, so that all clients of the pool act alike.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: Optional[int] = None,
+        min_size: int = 0,
+        max_size: int = 8,
+        timeout: Optional[float] = None,
+        idle_timeout: Optional[float] = 300.0,
+        password: Optional[str] = None,
+        partition: Optional[str] = None,
+        client_timeout: Optional[float] = None,
+        client_class: Callable[[], MPDClient] = MPDClient,
+    ) -> None:
+        if max_size < 1 or min_size > max_size:
+            raise ValueError("Pool size must satisfy 0 <= min_size <= max_size > 0")
+        self.host = host
+        self.port = port
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.password = password
+        self.partition = partition
+        self.client_timeout = client_timeout
+        self.client_class = client_class
+
+        self._condition = threading.Condition()
+        #: Clients ready to be checked out, with the time they were returned
+        self._idle: Deque[Tuple[MPDClient, float]] = deque()
+        #: Number of clients that are connected (or being connected), idle
+        # or not
+        self._size = 0
+        self._closed = False
+
+        try:
+            for _ in range(min_size):
+                self._size += 1
+                client = self._connect_reserved()
+                self._idle.append((client, time.monotonic()))
+        except Exception:
+            self.close()
+            raise
+
+    def _new_client(self) -> MPDClient:
+        client = self.client_class()
+        client.timeout = self.client_timeout
+        client.connect(self.host, self.port)
+        try:
+            if self.password is not None:
+                client.password(self.password)
+            if self.partition is not None:
+                client.partition(self.partition)
+        except Exception:
+            self._disconnect(client)
+            raise
+        return client
+
+    def _connect_reserved(self) -> MPDClient:
+        """Connect a new client that was already counted in the pool's
+        size, and uncount it if that fails."""
+        try:
+            return self._new_client()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    @staticmethod
+    def _disconnect(client: MPDClient) -> None:
+        try:
+            client.disconnect()
+        except (MPDError, OSError):
+            pass
+
+    def _expired(self, now: float) -> List[MPDClient]:
+        """Remove the idle clients that expired from the pool, and return
+        them. Must be called with the lock held."""
+        expired: List[MPDClient] = []
+        if self.idle_timeout is None:
+            return expired
+        # the least recently returned clients are at the left
+        while (
+            self._idle
+            and self._size > self.min_size
+            and now - self._idle[0][1] >= self.idle_timeout
+        ):
+            expired.append(self._idle.popleft()[0])
+            self._size -= 1
+        return expired
+
+    def acquire(self, timeout: Optional[float] = None) -> MPDClient:
+        """Check out a connected client, which must be given back with
+        ``release`` afterwards. Prefer ``connection()``, which does that."""
+        if timeout is None:
+            timeout = self.timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            client = None
+            expired: List[MPDClient] = []
+            try:
+                with self._condition:
+                    while True:
+                        if self._closed:
+                            raise ConnectionError("Pool is closed")
+                        now = time.monotonic()
+                        expired += self._expired(now)
+                        if self._idle:
+                            # most recently used first, so the others expire
+                            client = self._idle.pop()[0]
+                            break
+                        if self._size < self.max_size:
+                            self._size += 1
+                            break
+                        if deadline is not None and now >= deadline:
+                            raise ConnectionError(
+                                "Timed out waiting for a connection from the pool"
+                            )
+                        self._condition.wait(
+                            None if deadline is None else deadline - now
+                        )
+            finally:
+                for old in expired:
+                    self._disconnect(old)
+
+            if client is None:
+                return self._connect_reserved()
+
+            try:
+                client.ping()
+            except (MPDError, OSError) as e:
+                logger.info("Replacing broken pooled connection: %r", e)
+                self.release(client, discard=True)
+                continue
+            return client
+
+    def release(self, client: MPDClient, discard: bool = False) -> None:
+        """Give back a client checked out with ``acquire``. With discard, or
+        if it is not usable anymore, it is disconnected instead of being
+        kept for reuse."""
+        unusable = (
+            client._sock is None
+            or client._iterating
+            or client._command_list is not None
+        )
+        with self._condition:
+            discard = discard or unusable or self._closed
+            now = time.monotonic()
+            expired = self._expired(now)
+            if discard:
+                self._size -= 1
+            else:
+                self._idle.append((client, now))
+            self._condition.notify()
+        if discard:
+            self._disconnect(client)
+        for old in expired:
+            self._disconnect(old)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[MPDClient]:
+        """Context manager checking out a client for the duration of the
+        block."""
+        client = self.acquire(timeout)
+        try:
+            yield client
+        except ConnectionError:
+            self.release(client, discard=True)
+            raise
+        except BaseException:
+            self.release(client)
+            raise
+        else:
+            self.release(client)
+
+    def close(self) -> None:
+        """Disconnect all idle clients; the ones still checked out are
+        disconnected when they are released."""
+        with self._condition:
+            self._closed = True
+            idle = [client for client, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for client in idle:
+            self._disconnect(client)
+
+    def __len__(self) -> int:
+        """Number of connected clients, idle or not."""
+        return self._size
+
+    def __enter__(self) -> "MPDClientPool":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
@@ -0,0 +1,319 @@
+# python-mpd2: Python MPD client library
+#
+# python-mpd2 is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-mpd2 is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with python-mpd2.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Alternative result types for large song listings.
+
+By default, the song and database listing commands return one dict per
+song. The types in here can be used instead where that is too costly."""
+
+from array import array
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, KeysView, List, Optional, Tuple
+
+
+class SongRecord(Mapping):
+    """Compact, read-only replacement for a song dict.
+
+    A record only holds a tuple of its values; the mapping from keys to
+    positions is shared between all records that have the same keys in the
+    same order (which is the case for most songs of a library). Records
+    behave like the dicts they replace for reading, and compare equal to
+    them.
+
+    Use it by setting ``song_factory`` on a client::
+
+        client.song_factory = mpd.SongRecord
+    """
+
+    __slots__ = ("_fields", "_values")
+
+    #: Key to position maps, by key sequence. Bounded so that a server
+    # producing arbitrary keys can't make it grow forever.
+    _layouts: Dict[Tuple[str, ...], Dict[str, int]] = {}
+    MAX_LAYOUTS = 4096
+
+    def __init__(self, obj: Dict[str, Any]) -> None:
+        keys = tuple(obj)
+        fields = self._layouts.get(keys)
+        if fields is None:
+            fields = {key: i for i, key in enumerate(keys)}
+            if len(self._layouts) < self.MAX_LAYOUTS:
+                self._layouts[keys] = fields
+        self._fields = fields
+        self._values = tuple(obj.values())
+
+    def __getitem__(self, key: str) -> Any:
+        return self._values[self._fields[key]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __repr__(self) -> str:
+        return "{}({!r})".format(type(self).__name__, dict(self))
+
+    def __reduce__(self) -> Tuple[type, Tuple[Dict[str, Any]]]:
+        return (type(self), (dict(self),))
+
+
+class SongColumns:
+    """Song listing stored as one column per tag rather than one dict per
+    song.
+
+    ``columns["artist"]`` is a list with the artist of every song in the
+    listing, in order; songs without that tag have ``None`` there. Numeric
+    tags listed in ``NUMERIC`` are stored in ``array.array`` columns instead,
+    with ``nan`` (for floats) or ``-1`` (for integers) marking missing or
+    unparsable values. Tags occurring several times in one song are stored as
+    lists (or, in numeric columns, only with their first value).
+
+    Use it by setting ``columnar`` on a client, which makes the song and
+    database listing commands return a single ``SongColumns`` object::
+
+        client.columnar = True
+        columns = client.listallinfo()
+        total = sum(d for d in columns["duration"] if d == d)
+    """
+
+    #: Typecodes of the tags stored in arrays
+    NUMERIC = {"duration": "d", "time": "d", "id": "l", "pos": "l"}
+    MISSING = {"d": float("nan"), "l": -1}
+
+    def __init__(self, delimiters: Iterable[str] = ("file",)) -> None:
+        self.delimiters = frozenset(delimiters)
+        self._columns: Dict[str, Any] = {}
+        self._length = 0
+        self._row_empty = True
+
+    def feed(self, key: str, value: str) -> None:
+        """Add a (lower case) key/value pair of a response; a delimiter key
+        starts a new row unless the current one is still empty."""
+        if self._row_empty:
+            self._row_empty = False
+            self._length += 1
+        elif key in self.delimiters:
+            self._length += 1
+        row = self._length - 1
+        column = self._columns.get(key)
+        if column is None:
+            column = self._columns[key] = self._new_column(key, 0)
+        typecode = self.NUMERIC.get(key)
+        if len(column) == self._length:
+            # repeated tag in the same song
+            if typecode is None:
+                previous = column[row]
+                if isinstance(previous, list):
+                    previous.append(value)
+                else:
+                    column[row] = [previous, value]
+            return
+        if len(column) < row:
+            column.extend(self._new_column(key, row - len(column)))
+        if typecode is None:
+            column.append(value)
+            return
+        try:
+            column.append(float(value) if typecode == "d" else int(value))
+        except ValueError:
+            column.append(self.MISSING[typecode])
+
+    def _new_column(self, key: str, length: int) -> Any:
+        typecode = self.NUMERIC.get(key)
+        if typecode is None:
+            return [None] * length
+        return array(typecode, [self.MISSING[typecode]]) * length
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._columns
+
+    def keys(self) -> KeysView[str]:
+        return self._columns.keys()
+
+    def __getitem__(self, key: str) -> Any:
+        """Return the column of the given tag, padded to the full length."""
+        column = self._columns.get(key)
+        if column is None:
+            return self._new_column(key, self._length)
+        if len(column) < self._length:
+            column.extend(self._new_column(key, self._length - len(column)))
+        return column
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over the rows as dicts (with numeric values as numbers)."""
+        columns = [(key, self[key], self.NUMERIC.get(key)) for key in self._columns]
+        for row in range(self._length):
+            obj = {}
+            for key, column, typecode in columns:
+                value = column[row]
+                if typecode is None:
+                    if value is not None:
+                        obj[key] = value
+                elif value == value and value != self.MISSING[typecode]:
+                    obj[key] = value
+            yield obj
+
+    def __repr__(self) -> str:
+        return "<{} of {} songs with columns {}>".format(
+            type(self).__name__, self._length, ", ".join(self._columns)
+        )
+
+
+class InternPool:
+    """Pool deduplicating the keys and repeated tag values of parsed objects.
+
+    Keys are lower-cased only once per distinct key, and all objects share the
+    resulting strings. Values of the tags in ``tags`` (which typically repeat
+    across a library, like artist or genre) are shared in the same way. At
+    most ``maxsize`` values are kept; when it is full, the oldest ones are
+    evicted first.
+
+    Use it by setting ``intern_pool`` on a client::
+
+        client.intern_pool = mpd.InternPool()
+    """
+
+    #: Tags whose values are pooled by default
+    TAGS = frozenset(
+        [
+            "album",
+            "albumartist",
+            "albumartistsort",
+            "albumsort",
+            "artist",
+            "artistsort",
+            "composer",
+            "conductor",
+            "date",
+            "disc",
+            "format",
+            "genre",
+            "label",
+            "originaldate",
+            "performer",
+        ]
+    )
+
+    def __init__(
+        self, maxsize: int = 65536, tags: Optional[Iterable[str]] = None
+    ) -> None:
+        self.maxsize = maxsize
+        self.tags = self.TAGS if tags is None else frozenset(tags)
+        self._keys: Dict[str, str] = {}
+        self._values: Dict[str, str] = {}
+
+    def key(self, key: str) -> str:
+        """Return the shared, lower case version of a key."""
+        lowered = self._keys.get(key)
+        if lowered is None:
+            lowered = key.lower()
+            lowered = self._keys.get(lowered, lowered)
+            if len(self._keys) < self.maxsize:
+                self._keys[key] = lowered
+                self._keys[lowered] = lowered
+        return lowered
+
+    def value(self, key: str, value: str) -> str:
+        """Return the shared version of the value of the (lower case) key."""
+        if key not in self.tags:
+            return value
+        values = self._values
+        pooled = values.get(value)
+        if pooled is None:
+            if len(values) >= self.maxsize:
+                del values[next(iter(values))]
+            values[value] = pooled = value
+        return pooled
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def clear(self) -> None:
+        self._keys.clear()
+        self._values.clear()
+
+
+class LazySong(Mapping):
+    """Song that keeps the lines of its response, and only splits them when
+    fields are read.
+
+    Reading a single field scans the lines for it; anything that needs all
+    fields (iterating, ``len``, comparing) parses them all at once. Otherwise
+    it behaves like the dict it replaces.
+
+    Use it by setting ``lazy_songs`` on a client::
+
+        client.lazy_songs = True
+    """
+
+    __slots__ = ("_lines", "_fields")
+
+    def __init__(self, lines: List[str]) -> None:
+        self._lines: Optional[List[str]] = lines
+        self._fields: Optional[Dict[str, Any]] = None
+
+    def __getitem__(self, key: str) -> Any:
+        fields = self._fields
+        if fields is not None and key in fields:
+            return fields[key]
+        if self._lines is None:
+            raise KeyError(key)
+        length = len(key)
+        values = [
+            line[length + 2 :]
+            for line in self._lines
+            if line[length : length + 2] == ": " and line[:length].lower() == key
+        ]
+        if not values:
+            raise KeyError(key)
+        value = values[0] if len(values) == 1 else values
+        if fields is None:
+            fields = self._fields = {}
+        fields[key] = value
+        return value
+
+    def _parse_all(self) -> Dict[str, Any]:
+        if self._lines is not None:
+            from mpd.base import ProtocolError
+
+            fields: Dict[str, Any] = {}
+            for line in self._lines:
+                key, separator, value = line.partition(": ")
+                if not separator:
+                    raise ProtocolError("Could not parse pair: '{}'".format(line))
+                key = key.lower()
+                if key not in fields:
+                    fields[key] = value
+                elif isinstance(fields[key], list):
+                    fields[key].append(value)
+                else:
+                    fields[key] = [fields[key], value]
+            self._fields = fields
+            self._lines = None
+        assert self._fields is not None
+        return self._fields
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._parse_all())
+
+    def __len__(self) -> int:
+        return len(self._parse_all())
+
+    def __repr__(self) -> str:
+        return "{}({!r})".format(type(self).__name__, self._parse_all())
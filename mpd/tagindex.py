@@ -0,0 +1,305 @@
+# python-mpd2: Python MPD client library
+#
+# python-mpd2 is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# python-mpd2 is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with python-mpd2.  If not, see <http://www.gnu.org/licenses/>.
+
+"""In-memory index of the tag values of the library, for type-ahead search."""
+
+import re
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from mpd.library import DEFAULT_TAGS, _listallinfo, _plain_songs
+
+_WORD = re.compile(r"\w+")
+
+
+def _normalize(text: str) -> str:
+    return text.casefold()
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class TagIndex:
+    """Index of the tag values of all songs, answering type-ahead queries
+    locally rather than with a ``search`` on the server for each keystroke::
+
+        index = TagIndex(tags=["artist", "album", "title"])
+        index.refresh(client)
+        index.complete("artist", "sim")   # -> ["Nina Simone", "Simon & ...]
+        files = index.search("pastel b")  # -> ["jazz/pastel-blues/01.flac", ...]
+
+    Matching ignores case. Queries of up to two characters match the start of
+    any word of a value; longer ones match anywhere in it (which is looked up
+    by the trigrams of the values). The results are candidates from the state
+    of the last refresh: when it matters, verify them with ``find`` on the
+    server.
+
+    The songs are identified by small integers, kept in ``array`` postings
+    per value. ``refresh`` compares the listing with the indexed songs by
+    their ``last-modified`` time, and only indexes the ones that were added
+    or changed; removed songs are marked as such, and the postings are
+    rebuilt once they make up half of the songs.
+    """
+
+    def __init__(self, tags: Iterable[str] = DEFAULT_TAGS) -> None:
+        self.tags = tuple(sorted(set(tag.lower() for tag in tags)))
+        self.db_update: Optional[str] = None
+        self._clear()
+
+    def _clear(self) -> None:
+        #: Per song: its file (None once removed), its last-modified time, and
+        # the ids of its values
+        self._files: List[Optional[str]] = []
+        self._modified: List[Optional[str]] = []
+        self._song_values: List[Tuple[int, ...]] = []
+        #: Song numbers by file
+        self._songs: Dict[str, int] = {}
+        self._removed = 0
+
+        #: Per value: its tag, its text, the normalized text, and the songs
+        # it occurs in
+        self._value_tags: List[str] = []
+        self._value_text: List[str] = []
+        self._value_keys: List[str] = []
+        self._postings: List["array[int]"] = []
+        #: Number of songs (that were not removed) a value occurs in
+        self._value_counts: List[int] = []
+        #: Value ids by tag and text
+        self._values: Dict[Tuple[str, str], int] = {}
+
+        #: Per tag, the words of the values along with the value ids (sorted
+        # before the first query after a change), and the value ids by the
+        # trigrams of the values
+        self._words: Dict[str, List[Tuple[str, int]]] = {t: [] for t in self.tags}
+        self._words_sorted = True
+        self._trigram_postings: Dict[str, Dict[str, "array[int]"]] = {
+            t: {} for t in self.tags
+        }
+
+    # building
+
+    def _value_id(self, tag: str, text: str) -> int:
+        value_id = self._values.get((tag, text))
+        if value_id is not None:
+            return value_id
+        value_id = len(self._value_text)
+        key = _normalize(text)
+        self._values[(tag, text)] = value_id
+        self._value_tags.append(tag)
+        self._value_text.append(text)
+        self._value_keys.append(key)
+        self._postings.append(array("l"))
+        self._value_counts.append(0)
+        words = self._words[tag]
+        for word in set(_WORD.findall(key)):
+            words.append((word, value_id))
+        self._words_sorted = False
+        trigram_postings = self._trigram_postings[tag]
+        for trigram in _trigrams(key):
+            postings = trigram_postings.get(trigram)
+            if postings is None:
+                postings = trigram_postings[trigram] = array("l")
+            postings.append(value_id)
+        return value_id
+
+    def _add(self, file: str, modified: Optional[str], values: Iterable[int]) -> None:
+        song = len(self._files)
+        value_ids = tuple(sorted(set(values)))
+        self._files.append(file)
+        self._modified.append(modified)
+        self._song_values.append(value_ids)
+        self._songs[file] = song
+        for value_id in value_ids:
+            self._postings[value_id].append(song)
+            self._value_counts[value_id] += 1
+
+    def add(self, song: Mapping[str, Any]) -> None:
+        """Index a song (as returned by ``listallinfo``), replacing the one
+        of the same file if it was indexed."""
+        file = song["file"]
+        if file in self._songs:
+            self.remove(file)
+        value_ids = []
+        for tag in self.tags:
+            value = song.get(tag)
+            if value is None:
+                continue
+            for text in value if isinstance(value, list) else [value]:
+                value_ids.append(self._value_id(tag, text))
+        self._add(file, song.get("last-modified"), value_ids)
+
+    def remove(self, file: str) -> None:
+        """Remove a song from the index."""
+        song = self._songs.pop(file, None)
+        if song is None:
+            return
+        self._files[song] = None
+        for value_id in self._song_values[song]:
+            self._value_counts[value_id] -= 1
+        self._song_values[song] = ()
+        self._removed += 1
+        if self._removed * 2 > len(self._files):
+            self._compact()
+
+    def _compact(self) -> None:
+        tags, texts = self._value_tags, self._value_text
+        songs = [
+            (file, modified, [(tags[v], texts[v]) for v in values])
+            for file, modified, values in zip(
+                self._files, self._modified, self._song_values
+            )
+            if file is not None
+        ]
+        self._clear()
+        for file, modified, values in songs:
+            self._add(file, modified, [self._value_id(*value) for value in values])
+
+    def update(self, entries: Iterable[Mapping[str, Any]]) -> int:
+        """Bring the index up to date with the complete listing of the
+        database (``listallinfo``), and return the number of songs that were
+        added, changed or removed."""
+        changes = 0
+        seen: Set[str] = set()
+        for entry in entries:
+            changes += self._update_entry(entry, seen)
+        return changes + self._remove_unseen(seen)
+
+    def _update_entry(self, entry: Mapping[str, Any], seen: Set[str]) -> int:
+        file = entry.get("file")
+        if file is None:
+            # directories and playlists
+            return 0
+        seen.add(file)
+        song = self._songs.get(file)
+        modified = entry.get("last-modified")
+        if (
+            song is not None
+            and modified is not None
+            and self._modified[song] == modified
+        ):
+            return 0
+        self.add(entry)
+        return 1
+
+    def _remove_unseen(self, seen: Set[str]) -> int:
+        removed = [file for file in self._songs if file not in seen]
+        for file in removed:
+            self.remove(file)
+        return len(removed)
+
+    def refresh(self, client: Any, force: bool = False) -> int:
+        """Update the index from the database with the blocking client,
+        unless its ``db_update`` time is the one indexed. Returns the number
+        of songs that changed."""
+        db_update = client.stats().get("db_update")
+        if not force and db_update is not None and db_update == self.db_update:
+            return 0
+        with _listallinfo(client) as entries:
+            changes = self.update(entries)
+        self.db_update = db_update
+        return changes
+
+    async def refresh_async(self, client: Any, force: bool = False) -> int:
+        """Like ``refresh``, for the asyncio client."""
+        db_update = (await client.stats()).get("db_update")
+        if not force and db_update is not None and db_update == self.db_update:
+            return 0
+        with _plain_songs(client):
+            entries = client.listallinfo().__aiter__()
+        changes = 0
+        seen: Set[str] = set()
+        async for entry in entries:
+            changes += self._update_entry(entry, seen)
+        changes += self._remove_unseen(seen)
+        self.db_update = db_update
+        return changes
+
+    # queries
+
+    def _matching_values(self, tag: str, key: str) -> Iterable[int]:
+        if len(key) < 3:
+            if not self._words_sorted:
+                for words in self._words.values():
+                    words.sort()
+                self._words_sorted = True
+            words = self._words[tag]
+            matches = []
+            i = bisect_left(words, (key, -1))
+            while i < len(words) and words[i][0].startswith(key):
+                matches.append(words[i][1])
+                i += 1
+            return set(matches)
+        trigram_postings = self._trigram_postings[tag]
+        candidates: Optional[Set[int]] = None
+        # the rarest trigrams first, to keep the candidates few
+        trigrams = sorted(
+            _trigrams(key), key=lambda t: len(trigram_postings.get(t, ()))
+        )
+        for trigram in trigrams:
+            postings = trigram_postings.get(trigram)
+            if postings is None:
+                return ()
+            if candidates is None:
+                candidates = set(postings)
+            else:
+                candidates.intersection_update(postings)
+            if not candidates:
+                return ()
+        return [v for v in candidates or () if key in self._value_keys[v]]
+
+    def _check_tag(self, tag: str) -> str:
+        tag = tag.lower()
+        if tag not in self.tags:
+            raise ValueError("Tag '{}' is not indexed".format(tag))
+        return tag
+
+    def complete(self, tag: str, text: str, limit: Optional[int] = 10) -> List[str]:
+        """Return the values of the tag that match the text, the ones of the
+        most songs first."""
+        tag = self._check_tag(tag)
+        key = _normalize(text.strip())
+        if not key:
+            return []
+        counts = self._value_counts
+        values = [v for v in self._matching_values(tag, key) if counts[v]]
+        values.sort(key=lambda v: (-counts[v], self._value_keys[v]))
+        return [self._value_text[v] for v in values[:limit]]
+
+    def search(
+        self,
+        text: str,
+        tags: Optional[Iterable[str]] = None,
+        limit: Optional[int] = None,
+    ) -> List[str]:
+        """Return the files of the songs with a value of any of the given
+        tags (or of all indexed tags) that matches the text."""
+        key = _normalize(text.strip())
+        if not key:
+            return []
+        songs: Set[int] = set()
+        for tag in self.tags if tags is None else map(self._check_tag, tags):
+            for value_id in self._matching_values(tag, key):
+                songs.update(self._postings[value_id])
+        files = self._files
+        result = [files[song] for song in sorted(songs) if files[song] is not None]
+        return result[:limit]  # type: ignore
+
+    def __len__(self) -> int:
+        return len(self._songs)
+
+    def __contains__(self, file: object) -> bool:
+        return file in self._songs
@@ -5,12 +5,18 @@ from __future__ import absolute_import
 import itertools
 import mpd.base
 import mpd.asyncio
+import mpd.fleet
+import mpd.pool
 import os
 import socket
+import sqlite3
+import subprocess
 import sys
+import tempfile
+import threading
 import types
 import warnings
-from typing import Any, Union, List, Tuple, Optional, Callable
+from typing import Any, Union, List, Tuple, Optional, Callable, Dict
 
 import unittest
 from unittest import mock
@@ -73,7 +79,9 @@ class TestMPDClient(unittest.TestCase):
         )
 
     def assertMPDReceived(self, *lines: str) -> None:
-        self.client._wfile.write.assert_called_with(*lines)
+        self.client._wfile.write.assert_called_with(
+            *(line.encode("utf-8") for line in lines)
+        )
 
     def test_abstract_functions(self) -> None:
         MPDClientBase = mpd.base.MPDClientBase
@@ -202,6 +210,168 @@ class TestMPDClient(unittest.TestCase):
         self.assertEqual("0", e["pos"])
         self.assertEqual("66", e["id"])
 
+    def test_song_factory(self) -> None:
+        self.MPDWillReturn(
+            "file: my-song.ogg\n",
+            "Artist: A\n",
+            "Artist: B\n",
+            "Id: 66\n",
+            "file: other-song.ogg\n",
+            "Artist: C\n",
+            "Artist: D\n",
+            "Id: 67\n",
+            "OK\n",
+        )
+        self.client.song_factory = mpd.SongRecord
+        playlist = self.client.playlistinfo()
+        self.assertMPDReceived("playlistinfo\n")
+        self.assertEqual(
+            playlist,
+            [
+                {"file": "my-song.ogg", "artist": ["A", "B"], "id": "66"},
+                {"file": "other-song.ogg", "artist": ["C", "D"], "id": "67"},
+            ],
+        )
+        first, second = playlist
+        self.assertIsInstance(first, mpd.SongRecord)
+        self.assertEqual(first["artist"], ["A", "B"])
+        self.assertEqual(second.get("title"), None)
+        self.assertIs(first._fields, second._fields)
+        self.assertFalse(hasattr(first, "__dict__"))
+
+        # single objects are unaffected
+        self.MPDWillReturn("file: my-song.ogg\n", "OK\n")
+        self.assertIsInstance(self.client.currentsong(), dict)
+
+    def test_paginate(self) -> None:
+        self.MPDWillReturn(
+            "file: a.ogg\n",
+            "file: b.ogg\n",
+            "OK\n",
+            "file: c.ogg\n",
+            "OK\n",
+        )
+        songs = self.client.paginate("find", "(artist == 'X')", page_size=2)
+        self.assertEqual([song["file"] for song in songs], ["a.ogg", "b.ogg", "c.ogg"])
+        self.assertEqual(
+            self.client._wfile.write.call_args_list,
+            [
+                mock.call(b'find "(artist == \'X\')" "window" "0:2"\n'),
+                mock.call(b'find "(artist == \'X\')" "window" "2:4"\n'),
+            ],
+        )
+        self.assertRaises(ValueError, self.client.paginate, "status")
+        self.assertRaises(ValueError, self.client.paginate, "playlistinfo", page_size=0)
+
+    def test_paginate_prefetch(self) -> None:
+        self.MPDWillReturn(
+            "file: a.ogg\n",
+            "file: b.ogg\n",
+            "OK\n",
+            "file: c.ogg\n",
+            "file: d.ogg\n",
+            "OK\n",
+        )
+        songs = self.client.paginate("playlistinfo", page_size=2, prefetch=True)
+        self.assertEqual(next(songs)["file"], "a.ogg")
+        # the second page was already requested
+        self.assertMPDReceived('playlistinfo "2:4"\n')
+        self.assertRaises(mpd.IteratingError, self.client.status)
+        # closing early drains the prefetched page
+        songs.close()
+        self.MPDWillReturn("volume: 50\n", "OK\n")
+        self.assertEqual(self.client.status(), {"volume": "50"})
+
+    def test_lazy_songs(self) -> None:
+        self.MPDWillReturn(
+            "file: a.ogg\n",
+            "Title: First: Part\n",
+            "Artist: A\n",
+            "Artist: B\n",
+            "Id: 1\n",
+            "file: b.ogg\n",
+            "Id: 2\n",
+            "OK\n",
+        )
+        self.client.lazy_songs = True
+        a, b = self.client.playlistinfo()
+        self.assertIsInstance(a, mpd.LazySong)
+        self.assertEqual(a["title"], "First: Part")
+        self.assertEqual(a["artist"], ["A", "B"])
+        self.assertIsNotNone(a._lines)
+        self.assertNotIn("title", b)
+        self.assertEqual(b.get("id"), "2")
+        self.assertEqual(
+            a,
+            {"file": "a.ogg", "title": "First: Part", "artist": ["A", "B"], "id": "1"},
+        )
+        self.assertEqual(list(b), ["file", "id"])
+
+        self.MPDWillReturn("file: a.ogg\n", "broken\n", "OK\n")
+        (c,) = self.client.playlistinfo()
+        self.assertEqual(c["file"], "a.ogg")
+        self.assertRaises(mpd.ProtocolError, dict, c)
+
+    def test_intern_pool(self) -> None:
+        self.MPDWillReturn(
+            "file: a.ogg\n",
+            "Artist: Some Artist\n",
+            "Title: Same\n",
+            "file: b.ogg\n",
+            "Artist: Some Artist\n",
+            "Title: Same\n",
+            "OK\n",
+        )
+        self.client.intern_pool = mpd.InternPool()
+        a, b = self.client.playlistinfo()
+        self.assertEqual(a, {"file": "a.ogg", "artist": "Some Artist", "title": "Same"})
+        self.assertIs(a["artist"], b["artist"])
+        self.assertIsNot(a["title"], b["title"])
+        (key_a,) = [k for k in a if k == "artist"]
+        (key_b,) = [k for k in b if k == "artist"]
+        self.assertIs(key_a, key_b)
+
+    def test_intern_pool_bounded(self) -> None:
+        pool = mpd.InternPool(maxsize=2)
+        first = pool.value("genre", "".join(["Ro", "ck"]))
+        self.assertIs(pool.value("genre", "".join(["Ro", "ck"])), first)
+        pool.value("genre", "Jazz")
+        pool.value("genre", "Pop")
+        self.assertEqual(len(pool), 2)
+        self.assertIsNot(pool.value("genre", "".join(["Ro", "ck"])), first)
+
+    def test_columnar(self) -> None:
+        self.MPDWillReturn(
+            "file: a.ogg\n",
+            "Genre: Rock\n",
+            "duration: 10.5\n",
+            "Pos: 0\n",
+            "file: b.ogg\n",
+            "Artist: X\n",
+            "Artist: Y\n",
+            "Pos: 1\n",
+            "file: c.ogg\n",
+            "Genre: Jazz\n",
+            "duration: 2.5\n",
+            "Pos: bogus\n",
+            "OK\n",
+        )
+        self.client.columnar = True
+        columns = self.client.playlistinfo()
+        self.assertMPDReceived("playlistinfo\n")
+        self.assertIsInstance(columns, mpd.SongColumns)
+        self.assertEqual(len(columns), 3)
+        self.assertEqual(columns["file"], ["a.ogg", "b.ogg", "c.ogg"])
+        self.assertEqual(columns["genre"], ["Rock", None, "Jazz"])
+        self.assertEqual(columns["artist"], [None, ["X", "Y"], None])
+        self.assertEqual(columns["title"], [None, None, None])
+        self.assertEqual(columns["pos"].typecode, "l")
+        self.assertEqual(list(columns["pos"]), [0, 1, -1])
+        self.assertEqual(sum(d for d in columns["duration"] if d == d), 13.0)
+        self.assertEqual(
+            list(columns)[1], {"file": "b.ogg", "artist": ["X", "Y"], "pos": 1}
+        )
+
     def test_readcomments(self) -> None:
         self.MPDWillReturn(
             "major_brand: M4V\n", "minor_version: 1\n", "lyrics: Lalala\n", "OK\n"
@@ -340,6 +510,390 @@ class TestMPDClient(unittest.TestCase):
         self.client.find("file", 1)
         self.assertMPDReceived('find "file" "1"\n')
 
+    def test_encode_command(self) -> None:
+        encode = mpd.base.encode_command
+        self.assertEqual(encode("play"), b"play\n")
+        self.assertEqual(encode("seek", [3, 1.5]), b'seek "3" "1.5"\n')
+        self.assertEqual(
+            encode("find", ['(title == "a\\b")', "window", (0, 10)]),
+            b'find "(title == \\"a\\\\b\\")" "window" "0:10"\n',
+        )
+        self.assertEqual(encode("add", ["\xe4.ogg"]), b'add "\xc3\xa4.ogg"\n')
+        self.assertEqual(encode("rangeid", [1, (2,)]), b'rangeid "1" "2:"\n')
+        buffer = bytearray()
+        mpd.base.encode_command_into(buffer, "ping")
+        mpd.base.encode_command_into(buffer, "status")
+        self.assertEqual(buffer, b"ping\nstatus\n")
+
+    def test_pipeline(self) -> None:
+        self.MPDWillReturn(
+            "volume: 50\n",
+            "OK\n",
+            "ACK [50@0] {load} No such playlist\n",
+            "file: a.mp3\n",
+            "file: b.mp3\n",
+            "OK\n",
+            "OK\n",
+        )
+        pipeline = self.client.pipeline()
+        pipeline.status().load("missing").playlistinfo()
+        pipeline.play(0)
+        self.assertEqual(len(pipeline), 4)
+        status, error, songs, play = pipeline.execute()
+        self.assertMPDReceived('status\nload "missing"\nplaylistinfo\nplay "0"\n')
+        self.assertEqual(status, {"volume": "50"})
+        self.assertIsInstance(error, mpd.CommandError)
+        self.assertEqual(error.errno, mpd.FailureResponseCode.NO_EXIST)
+        self.assertEqual(songs, [{"file": "a.mp3"}, {"file": "b.mp3"}])
+        self.assertIsNone(play)
+        self.assertEqual(pipeline.execute(), [])
+
+        pipeline = self.client.pipeline()
+        self.assertRaises(mpd.CommandListError, pipeline.close)
+        self.assertRaises(mpd.CommandListError, pipeline.albumart, "a.mp3")
+        self.assertRaises(
+            mpd.CommandListError, lambda: pipeline.command_list_ok_begin()
+        )
+        # idle would hold up the responses, and the other methods of the
+        # client are no commands
+        self.assertRaises(mpd.CommandListError, lambda: pipeline.idle())
+        self.assertRaises(mpd.CommandListError, lambda: pipeline.noidle())
+        self.assertRaises(mpd.CommandListError, lambda: pipeline.disconnect())
+        self.assertRaises(AttributeError, lambda: pipeline._write_command)
+        self.assertEqual(len(pipeline), 0)
+        self.assertIsNotNone(self.client._sock)
+
+    def test_bulk(self) -> None:
+        self.MPDWillReturn(
+            "Id: 1\n",
+            "list_OK\n",
+            "Id: 2\n",
+            "list_OK\n",
+            "OK\n",
+            "Id: 3\n",
+            "list_OK\n",
+            "Id: 4\n",
+            "list_OK\n",
+            "OK\n",
+            "list_OK\n",
+            "OK\n",
+        )
+        results = self.client.bulk(
+            [("addid", "a.mp3"), ("addid", "b.mp3"), ("addid", "c.mp3")]
+            + [("addid", "d.mp3"), "clear"],
+            chunk_size=2,
+            in_flight=2,
+        )
+        self.assertEqual(results, ["1", "2", "3", "4", None])
+        self.assertEqual(
+            [call.args[0] for call in self.client._wfile.write.call_args_list],
+            [
+                b'command_list_ok_begin\naddid "a.mp3"\naddid "b.mp3"\n'
+                b"command_list_end\n",
+                b'command_list_ok_begin\naddid "c.mp3"\naddid "d.mp3"\n'
+                b"command_list_end\n",
+                b"command_list_ok_begin\nclear\ncommand_list_end\n",
+            ],
+        )
+
+    def test_bulk_max_bytes(self) -> None:
+        chunks = self.client._bulk_chunks(
+            [("add", "x" * 10)] * 5, chunk_size=1000, max_bytes=80
+        )
+        self.assertEqual([len(retvals) for _, retvals in chunks], [2, 2, 1])
+        self.assertTrue(all(len(data) <= 80 for data, _ in chunks))
+
+    def test_bulk_error(self) -> None:
+        self.MPDWillReturn(
+            "Id: 1\n",
+            "list_OK\n",
+            "ACK [50@1] {addid} No such song\n",
+            "Id: 3\n",
+            "list_OK\n",
+            "OK\n",
+            "volume: 50\n",
+            "OK\n",
+        )
+        with self.assertRaises(mpd.CommandError) as cm:
+            self.client.bulk(
+                [("addid", "a"), ("addid", "b"), ("addid", "c")],
+                chunk_size=2,
+                in_flight=3,
+            )
+        # the songs that were added before and after the failed one
+        self.assertEqual(cm.exception.index, 1)
+        self.assertEqual(cm.exception.results, {0: "1", 2: "3"})
+        # the following list was read, so the connection is in sync
+        self.assertEqual(self.client.status(), {"volume": "50"})
+        self.assertRaises(
+            mpd.CommandListError, lambda: self.client.bulk([("albumart", "a")])
+        )
+
+    def test_queue_mirror(self) -> None:
+        queue = mpd.QueueMirror()
+        self.MPDWillReturn(
+            "playlist: 5\n",
+            "playlistlength: 3\n",
+            "OK\n",
+            "file: a.mp3\n",
+            "Pos: 0\n",
+            "Id: 10\n",
+            "file: b.mp3\n",
+            "Pos: 1\n",
+            "Id: 11\n",
+            "file: c.mp3\n",
+            "Pos: 2\n",
+            "Id: 12\n",
+            "OK\n",
+        )
+        self.assertTrue(queue.refresh(self.client))
+        self.assertMPDReceived("playlistinfo\n")
+        self.assertEqual([song["file"] for song in queue], ["a.mp3", "b.mp3", "c.mp3"])
+        self.assertEqual(queue.version, 5)
+
+        # c.mp3 was moved to the front, and b.mp3 deleted
+        self.MPDWillReturn(
+            "playlist: 7\n",
+            "playlistlength: 2\n",
+            "OK\n",
+            "file: c.mp3\n",
+            "Pos: 0\n",
+            "Id: 12\n",
+            "file: a.mp3\n",
+            "Pos: 1\n",
+            "Id: 10\n",
+            "OK\n",
+        )
+        self.assertTrue(queue.refresh(self.client))
+        self.assertMPDReceived('plchanges "5"\n')
+        self.assertEqual([song["id"] for song in queue], ["12", "10"])
+        self.assertEqual(queue.position(12), 0)
+        self.assertEqual(queue.song("10"), queue[1])
+        self.assertEqual(queue[1]["file"], "a.mp3")
+        self.assertIsNone(queue.position(11))
+
+        # the last song was deleted
+        self.MPDWillReturn(
+            "playlist: 8\n",
+            "playlistlength: 1\n",
+            "OK\n",
+            "OK\n",
+        )
+        self.assertTrue(queue.refresh(self.client))
+        self.assertEqual(len(queue), 1)
+        self.assertIsNone(queue.position(10))
+
+        # nothing changed
+        self.assertFalse(queue.refresh(self.client, {"playlist": "8"}))
+
+    def test_queue_mirror_posid(self) -> None:
+        queue = mpd.QueueMirror(tags=False)
+        queue.version = 9
+        # the server was restarted
+        self.MPDWillReturn(
+            "cpos: 0\n",
+            "Id: 1\n",
+            "cpos: 1\n",
+            "Id: 2\n",
+            "OK\n",
+        )
+        status = {"playlist": "3", "playlistlength": "2"}
+        self.assertTrue(queue.refresh(self.client, status))
+        self.assertMPDReceived('plchangesposid "0"\n')
+        self.assertEqual(
+            queue.songs, [{"pos": "0", "id": "1"}, {"pos": "1", "id": "2"}]
+        )
+        self.assertEqual(queue.version, 3)
+
+    def test_library_mirror(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "library.sqlite")
+        library = mpd.LibraryMirror(path)
+        self.addCleanup(library.close)
+        self.MPDWillReturn(
+            "db_update: 1700000000\n",
+            "OK\n",
+            "directory: a\n",
+            "file: a/1.mp3\n",
+            "Artist: X\n",
+            "Artist: Y\n",
+            "Album: A\n",
+            "file: a/2.mp3\n",
+            "Artist: Y\n",
+            "Album: B\n",
+            "OK\n",
+        )
+        self.assertTrue(library.refresh(self.client))
+        self.assertMPDReceived("listallinfo\n")
+        self.assertFalse(self.client.iterate)
+
+        self.assertEqual(len(library), 2)
+        self.assertEqual(library.values("artist"), ["X", "Y"])
+        self.assertEqual(
+            [song["file"] for song in library.find(artist="Y")], ["a/1.mp3", "a/2.mp3"]
+        )
+        self.assertEqual(
+            library.find(artist="Y", album="B"),
+            [{"file": "a/2.mp3", "artist": "Y", "album": "B"}],
+        )
+        self.assertEqual(
+            library.song("a/1.mp3"),
+            {"file": "a/1.mp3", "artist": ["X", "Y"], "album": "A"},
+        )
+        self.assertRaises(ValueError, lambda: library.find(track="1"))
+
+        # a new mirror on the same file is ready without loading the songs
+        library.close()
+        library = mpd.LibraryMirror(path)
+        self.addCleanup(library.close)
+        self.MPDWillReturn("db_update: 1700000000\n", "OK\n")
+        self.assertFalse(library.refresh(self.client))
+        self.assertMPDReceived("stats\n")
+        self.assertEqual(len(library.find(album="A")), 1)
+
+        # but one indexing other tags is not
+        other = mpd.LibraryMirror(path, tags=["title"])
+        self.addCleanup(other.close)
+        self.assertIsNone(other.db_update)
+
+    def test_without_sqlite(self) -> None:
+        # only LibraryMirror needs the sqlite3 module
+        code = (
+            "import sys\n"
+            "sys.modules['sqlite3'] = None\n"
+            "import mpd\n"
+            "mpd.MPDClient(), mpd.TagIndex()\n"
+            "try:\n"
+            "    mpd.LibraryMirror(':memory:')\n"
+            "except ImportError:\n"
+            "    sys.exit(0)\n"
+            "sys.exit(1)\n"
+        )
+        process = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        self.assertEqual(process.returncode, 0, process.stderr)
+
+    def test_library_mirror_client_modes(self) -> None:
+        library = mpd.LibraryMirror(":memory:")
+        self.addCleanup(library.close)
+        self.client.columnar = True
+        self.client.lazy_songs = True
+        self.MPDWillReturn(
+            "db_update: 1\n",
+            "OK\n",
+            "file: a.mp3\n",
+            "Title: A\n",
+            "file: b.mp3\n",
+            "OK\n",
+        )
+        self.assertTrue(library.refresh(self.client))
+        self.assertEqual(library.find(title="A"), [{"file": "a.mp3", "title": "A"}])
+        self.assertTrue(self.client.columnar)
+        self.assertTrue(self.client.lazy_songs)
+        self.assertFalse(self.client.iterate)
+
+        # a failed refresh reads the rest of the listing
+        self.MPDWillReturn(
+            "db_update: 2\n",
+            "OK\n",
+            "file: c.mp3\n",
+            "file: d.mp3\n",
+            "OK\n",
+            "volume: 50\n",
+            "OK\n",
+        )
+        with (
+            mock.patch("mpd.library.BATCH_SIZE", 1),
+            mock.patch.object(library, "_insert", side_effect=sqlite3.OperationalError),
+        ):
+            self.assertRaises(
+                sqlite3.OperationalError, library.refresh, self.client, True
+            )
+        self.assertEqual(library.db_update, "1")
+        self.assertEqual(len(library), 2)
+        self.assertEqual(self.client.status(), {"volume": "50"})
+
+    def test_tag_index(self) -> None:
+        index = mpd.TagIndex(tags=["artist", "album"])
+        self.client.lazy_songs = True
+        self.MPDWillReturn(
+            "db_update: 1\n",
+            "OK\n",
+            "file: a.mp3\n",
+            "Last-Modified: 2024-01-01T00:00:00Z\n",
+            "Artist: Nina Simone\n",
+            "Album: Pastel Blues\n",
+            "file: b.mp3\n",
+            "Last-Modified: 2024-01-01T00:00:00Z\n",
+            "Artist: Nina Simone\n",
+            "Artist: Simon\n",
+            "file: c.mp3\n",
+            "Last-Modified: 2024-01-01T00:00:00Z\n",
+            "Artist: Anna\n",
+            "OK\n",
+        )
+        self.assertEqual(index.refresh(self.client), 3)
+        self.assertMPDReceived("listallinfo\n")
+        self.assertTrue(self.client.lazy_songs)
+
+        self.assertEqual(index.complete("artist", "SIM"), ["Nina Simone", "Simon"])
+        self.assertEqual(index.complete("artist", "n"), ["Nina Simone"])
+        self.assertEqual(index.complete("artist", "ann"), ["Anna"])
+        self.assertEqual(index.search("pastel b"), ["a.mp3"])
+        self.assertEqual(index.search("si", tags=["artist"]), ["a.mp3", "b.mp3"])
+        self.assertEqual(index.search("nothing"), [])
+        self.assertRaises(ValueError, lambda: index.complete("title", "x"))
+
+        # only the changed song is indexed again, and the removed one dropped
+        changes = index.update(
+            [
+                {
+                    "file": "a.mp3",
+                    "last-modified": "2024-01-01T00:00:00Z",
+                    "artist": "Nina Simone",
+                },
+                {
+                    "file": "b.mp3",
+                    "last-modified": "2024-02-01T00:00:00Z",
+                    "artist": "Paul Simon",
+                },
+            ]
+        )
+        self.assertEqual(changes, 2)
+        self.assertEqual(len(index), 2)
+        self.assertNotIn("c.mp3", index)
+        self.assertEqual(
+            index.complete("artist", "simon"), ["Nina Simone", "Paul Simon"]
+        )
+        self.assertEqual(index.search("anna"), [])
+        self.assertEqual(index.search("pastel"), ["a.mp3"])
+
+        # once most songs are removed, the index is rebuilt
+        index.remove("a.mp3")
+        self.assertEqual(index._removed, 0)
+        self.assertEqual(index.complete("artist", "simon"), ["Paul Simon"])
+        self.assertEqual(index.search("simon"), ["b.mp3"])
+
+        # a failed refresh reads the rest of the listing
+        self.MPDWillReturn(
+            "db_update: 2\n",
+            "OK\n",
+            "file: c.mp3\n",
+            "file: d.mp3\n",
+            "OK\n",
+            "volume: 50\n",
+            "OK\n",
+        )
+        with mock.patch.object(index, "_update_entry", side_effect=KeyError):
+            self.assertRaises(KeyError, index.refresh, self.client)
+        self.assertEqual(index.db_update, "1")
+        self.assertEqual(self.client.status(), {"volume": "50"})
+
     def test_commands_without_callbacks(self) -> None:
         self.MPDWillReturn("\n")
         self.client.close()
@@ -405,7 +959,7 @@ class TestMPDClient(unittest.TestCase):
         self.assertEqual(
             [
                 mock.call("rb", newline="\n"),
-                mock.call("w", encoding="utf-8", newline="\n"),
+                mock.call("wb"),
             ],
             # We are only interested into the 2 first entries,
             # otherwise we get all the readline() & co...
@@ -730,6 +1284,46 @@ class TestMPDClientSocket(unittest.TestCase):
 
         self.assertEqual(received, byteStr)
 
+    def test_bulk_read_songs(self) -> None:
+        self.client.bulk_read = True
+        self.MPDWillReturnBinary(
+            b"file: a.mp3\nArtist: A\nArtist: B\nTitle: x: y\nPos: 0\n"
+            b"file: b.mp3\nTitle: \xc3\xa4\nPos: 1\nOK\n"
+            b"volume: 50\nOK\n"
+        )
+        self.assertEqual(
+            self.client.playlistinfo(),
+            [
+                {"file": "a.mp3", "artist": ["A", "B"], "title": "x: y", "pos": "0"},
+                {"file": "b.mp3", "title": "\xe4", "pos": "1"},
+            ],
+        )
+        # nothing beyond the first response was consumed
+        self.assertEqual(self.client.status(), {"volume": "50"})
+
+    def test_bulk_read_multiple_blocks(self) -> None:
+        self.client.bulk_read = True
+        response = b"".join(
+            b"file: song%05d.mp3\nTitle: Title %d\n" % (i, i) for i in range(2000)
+        )
+        self.MPDWillReturnBinary(response + b"OK\n")
+        songs = self.client.listallinfo()
+        self.assertEqual(len(songs), 2000)
+        self.assertEqual(songs[1234], {"file": "song01234.mp3", "title": "Title 1234"})
+
+    def test_bulk_read_error(self) -> None:
+        self.client.bulk_read = True
+        self.MPDWillReturnBinary(b"ACK [50@0] {find} No such thing\nOK\n")
+        with self.assertRaises(mpd.CommandError) as cm:
+            self.client.find("file", "x")
+        self.assertEqual(cm.exception.errno, mpd.FailureResponseCode.NO_EXIST)
+        self.assertIsNone(self.client.ping())
+
+    def test_bulk_read_malformed_line(self) -> None:
+        self.client.bulk_read = True
+        self.MPDWillReturnBinary(b"file: a.mp3\nnot a pair\nOK\n")
+        self.assertRaises(mpd.ProtocolError, self.client.playlistinfo)
+
     def test_readbinary_error(self) -> None:
         self.MPDWillReturnBinary(b"ACK [50@0] {albumart} No file exists\n")
 
@@ -867,6 +1461,166 @@ class TestMPDClientSocket(unittest.TestCase):
         )
         self.assertEqual(real_binary, {"binary": expected_binary})
 
+    def test_binary_albumart_zero_copy(self) -> None:
+        self.client.zero_copy_binary = True
+        self.MPDWillReturnBinary(
+            b"size: 6\nbinary: 4\n\x00\x01\x02\x03\nOK\n"
+            b"size: 6\nbinary: 2\n\x04\x05\nOK\n"
+        )
+
+        real_binary = self.client.albumart("a/full/path.mp3")
+        self.assertMPDReceived(
+            b'albumart "a/full/path.mp3" "0"\nalbumart "a/full/path.mp3" "4"\n'
+        )
+        self.assertIsInstance(real_binary["binary"], bytearray)
+        self.assertEqual(real_binary, {"binary": b"\x00\x01\x02\x03\x04\x05"})
+
+    def test_binary_albumart_size_too_small(self) -> None:
+        # a wrong size header must not truncate the data read off the wire
+        self.MPDWillReturnBinary(b"size: 2\nbinary: 4\n\x00\x01\x02\x03\nOK\n")
+
+        self.assertRaises(
+            mpd.CommandListError, lambda: self.client.albumart("a/full/path.mp3")
+        )
+
+    def test_binary_albumart_size_exceeded(self) -> None:
+        self.MPDWillReturnBinary(
+            b"size: 6\nbinary: 4\n\x00\x01\x02\x03\nOK\n"
+            b"size: 6\nbinary: 4\n\x04\x05\x06\x07\nOK\n"
+            b"OK\n"
+        )
+
+        self.assertRaises(
+            mpd.CommandListError, lambda: self.client.albumart("a/full/path.mp3")
+        )
+        # the whole response was read
+        self.assertIsNone(self.client.ping())
+
+    def test_binary_albumart_empty_chunk(self) -> None:
+        self.MPDWillReturnBinary(b"size: 6\nbinary: 0\n\nOK\n")
+
+        real_binary = self.client.albumart("a/full/path.mp3")
+        self.assertMPDReceived(b'albumart "a/full/path.mp3" "0"\n')
+        self.assertEqual(real_binary, {"binary": b""})
+
+    def test_binary_limit_negotiation(self) -> None:
+        self.client.disconnect()
+        self.close_server_socket()
+        client_socket, self.server_socket = socket.socketpair()
+        self.connect_mock.return_value = client_socket
+        self.server_socket_reader = self.server_socket.makefile("rb")
+        self.server_socket_writer = self.server_socket.makefile("wb")
+
+        self.MPDWillReturnBinary(b"OK MPD 0.21.24\nACK [5@0] {} unknown command\n")
+        self.client.binary_limit = 65536
+        self.client.connect(TEST_MPD_UNIXHOST)
+        self.assertFalse(self.client._binary_limit_supported)
+
+        # an unsupported limit is not adapted either
+        self.client.max_binary_limit = 65536
+        self.MPDWillReturnBinary(
+            b"size: 16384\nbinary: 8192\n" + bytes(8192) + b"\nOK\n"
+            b"size: 16384\nbinary: 8192\n" + bytes(8192) + b"\nOK\n"
+        )
+        self.assertEqual(self.client.albumart("a.mp3"), {"binary": bytes(16384)})
+        self.assertMPDReceived(
+            b'binarylimit "65536"\nalbumart "a.mp3" "0"\nalbumart "a.mp3" "8192"\n'
+        )
+
+    def test_binary_limit_adaptive(self) -> None:
+        self.client.max_binary_limit = 65536
+        # anything up to 5s per chunk counts as fast enough to double
+        self.client.BINARY_CHUNK_DURATION = 10.0
+        self.MPDWillReturnBinary(
+            b"size: 16400\nbinary: 8192\n" + bytes(8192) + b"\nOK\nOK\n"
+            b"size: 16400\nbinary: 8208\n" + bytes(8208) + b"\nOK\n"
+        )
+
+        real_binary = self.client.albumart("a.mp3")
+        self.assertEqual(real_binary, {"binary": bytes(16400)})
+        self.assertEqual(self.client._binary_limit, 65536)
+        self.assertMPDReceived(
+            b'albumart "a.mp3" "0"\nbinarylimit "65536"\nalbumart "a.mp3" "8192"\n'
+        )
+
+    def test_binary_limit_too_large(self) -> None:
+        self.client.max_binary_limit = 65536
+        self.client.BINARY_CHUNK_DURATION = 10.0
+        self.MPDWillReturnBinary(
+            b"size: 16400\nbinary: 8192\n" + bytes(8192) + b"\nOK\n"
+            b"ACK [2@0] {binarylimit} Value too large\nOK\n"
+            b"size: 16400\nbinary: 8208\n" + bytes(8208) + b"\nOK\n"
+        )
+
+        real_binary = self.client.albumart("a.mp3")
+        self.assertEqual(real_binary, {"binary": bytes(16400)})
+        # a smaller limit is tried instead, and the larger one not again
+        self.assertTrue(self.client._binary_limit_supported)
+        self.assertEqual(self.client._binary_limit, 32768)
+        self.assertIsNone(self.client._adapted_binary_limit(32768, 0))
+        self.assertMPDReceived(
+            b'albumart "a.mp3" "0"\nbinarylimit "65536"\nbinarylimit "32768"\n'
+            b'albumart "a.mp3" "8192"\n'
+        )
+
+    def test_binary_cache(self) -> None:
+        self.client.binary_cache = mpd.AlbumArtCache(max_bytes=1024)
+        self.MPDWillReturnBinary(
+            b"db_update: 1\nOK\n"
+            b"size: 3\nbinary: 3\n\x01\x02\x03\nOK\n"
+            b"ACK [50@0] {albumart} No file exists\n"
+            b"changed: database\nOK\n"
+            b"db_update: 2\nOK\n"
+            b"size: 3\nbinary: 3\n\x04\x05\x06\nOK\n"
+        )
+
+        # songs of the same directory share their cover
+        self.assertEqual(
+            self.client.albumart("album/1.mp3"), {"binary": b"\x01\x02\x03"}
+        )
+        self.assertEqual(
+            self.client.albumart("album/2.mp3"), {"binary": b"\x01\x02\x03"}
+        )
+        # and missing art is remembered as well
+        for _ in range(2):
+            with self.assertRaises(mpd.CommandError) as cm:
+                self.client.albumart("other/1.mp3")
+            self.assertEqual(cm.exception.errno, mpd.FailureResponseCode.NO_EXIST)
+
+        self.assertEqual(self.client.idle(), ["database"])
+        self.assertEqual(
+            self.client.albumart("album/2.mp3"), {"binary": b"\x04\x05\x06"}
+        )
+        self.assertMPDReceived(
+            b'stats\nalbumart "album/1.mp3" "0"\nalbumart "other/1.mp3" "0"\n'
+            b'idle\nstats\nalbumart "album/2.mp3" "0"\n'
+        )
+
+    def test_binary_cache_directory(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.client.binary_cache = mpd.AlbumArtCache(directory=directory.name)
+        self.MPDWillReturnBinary(
+            b"db_update: 1700000000\nOK\n"
+            b"size: 3\ntype: image/png\nbinary: 3\n\x01\x02\x03\nOK\n"
+        )
+        picture = {"binary": b"\x01\x02\x03", "type": "image/png"}
+        self.assertEqual(self.client.readpicture("a.mp3"), picture)
+        self.assertMPDReceived(b'stats\nreadpicture "a.mp3" "0"\n')
+
+        # a new cache finds the entry on disk, but only with the same stamp
+        cache = mpd.AlbumArtCache(directory=directory.name)
+        self.assertIsNone(cache.get("readpicture", "a.mp3"))
+        cache.invalidate("1700000000")
+        self.assertEqual(cache.get("readpicture", "a.mp3"), picture)
+        self.assertIsNone(cache.get("readpicture", "b.mp3"))
+
+        # and the entries of other stamps are deleted
+        cache = mpd.AlbumArtCache(directory=directory.name, stamp="1800000000")
+        self.assertIsNone(cache.get("readpicture", "a.mp3"))
+        files = [name for _, _, names in os.walk(directory.name) for name in names]
+        self.assertEqual(files, [])
+
     # MPD server can return empty response if a file exists but is empty
     def test_binary_albumart_emptyresponse(self) -> None:
         self.MPDWillReturnBinary(b"size: 0\nbinary: 0\n\nOK\n")
@@ -958,6 +1712,123 @@ class TestMPDClientSocket(unittest.TestCase):
         )
 
 
+class FakePoolClient:
+    """Stand-in for MPDClient recording what the pool does with it"""
+
+    instances: List["FakePoolClient"] = []
+    fail_connect = False
+
+    def __init__(self) -> None:
+        self.calls: List[Tuple[str, Tuple[Any, ...]]] = []
+        self._sock: Optional[object] = None
+        self._iterating = False
+        self._command_list = None
+        self.broken = False
+        self.instances.append(self)
+
+    def connect(self, host: str, port: Optional[int] = None) -> None:
+        if self.fail_connect:
+            raise mpd.ConnectionError("refused")
+        self.calls.append(("connect", (host, port)))
+        self._sock = object()
+
+    def disconnect(self) -> None:
+        self.calls.append(("disconnect", ()))
+        self._sock = None
+
+    def ping(self) -> None:
+        if self.broken:
+            raise mpd.ConnectionError("Connection lost while reading line")
+        self.calls.append(("ping", ()))
+
+    def password(self, password: str) -> None:
+        self.calls.append(("password", (password,)))
+
+    def partition(self, name: str) -> None:
+        self.calls.append(("partition", (name,)))
+
+
+class TestMPDClientPool(unittest.TestCase):
+    def setUp(self) -> None:
+        FakePoolClient.instances = []
+
+    def make_pool(self, **kwargs: Any) -> "mpd.pool.MPDClientPool":
+        pool = mpd.pool.MPDClientPool(
+            TEST_MPD_HOST,
+            TEST_MPD_PORT,
+            client_class=FakePoolClient,  # type: ignore
+            **kwargs,
+        )
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_reuse(self) -> None:
+        pool = self.make_pool(password="secret", partition="kitchen")
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            self.assertIs(second, first)
+        self.assertEqual(len(FakePoolClient.instances), 1)
+        self.assertEqual(
+            first.calls,
+            [
+                ("connect", (TEST_MPD_HOST, TEST_MPD_PORT)),
+                ("password", ("secret",)),
+                ("partition", ("kitchen",)),
+                ("ping", ()),
+            ],
+        )
+
+    def test_max_size(self) -> None:
+        pool = self.make_pool(max_size=2, timeout=0.01)
+        first = pool.acquire()
+        second = pool.acquire()
+        self.assertIsNot(first, second)
+        self.assertRaises(mpd.ConnectionError, pool.acquire)
+
+        def give_back() -> None:
+            pool.release(first)
+
+        threading.Timer(0.05, give_back).start()
+        self.assertIs(pool.acquire(timeout=5), first)
+        self.assertEqual(len(pool), 2)
+
+    def test_replace_broken(self) -> None:
+        pool = self.make_pool()
+        with pool.connection() as client:
+            pass
+        client.broken = True
+        with pool.connection() as replacement:
+            self.assertIsNot(replacement, client)
+        self.assertEqual(client.calls[-1], ("disconnect", ()))
+
+        with self.assertRaises(mpd.ConnectionError):
+            with pool.connection() as client:
+                raise mpd.ConnectionError("Connection to server was reset")
+        self.assertIsNone(client._sock)
+        self.assertEqual(len(pool), 0)
+
+        FakePoolClient.fail_connect = True
+        self.addCleanup(setattr, FakePoolClient, "fail_connect", False)
+        self.assertRaises(mpd.ConnectionError, pool.acquire)
+        self.assertEqual(len(pool), 0)
+
+    def test_idle_expiry(self) -> None:
+        pool = self.make_pool(min_size=1, idle_timeout=0)
+        self.assertEqual(len(pool), 1)
+        first = pool.acquire()
+        second = pool.acquire()
+        pool.release(first)
+        pool.release(second)
+        # the older one expired, the minimum one stays
+        self.assertEqual(len(pool), 1)
+        self.assertIsNone(first._sock)
+        with pool.connection() as client:
+            self.assertIs(client, second)
+        pool.close()
+        self.assertIsNone(second._sock)
+
+
 class MockTransport(object):
     def __init__(self) -> None:
         self.written: List[bytes] = []
@@ -1033,6 +1904,19 @@ class TestMPDProtocol(unittest.TestCase):
         ]:
             self.protocol.lineReceived(line)
 
+    def test_columnar(self) -> None:
+        self.init_protocol(default_idle=False)
+        self.protocol.columnar = True
+
+        def success(result: Any) -> None:
+            self.assertIsInstance(result, mpd.SongColumns)
+            self.assertEqual(result["file"], ["a.mp3", "b.mp3"])
+            self.assertEqual(list(result["id"]), [1, 2])
+
+        self.protocol.playlistinfo().addCallback(success)
+        for line in [b"file: a.mp3", b"Id: 1", b"file: b.mp3", b"Id: 2", b"OK"]:
+            self.protocol.lineReceived(line)
+
     def test_failure(self) -> None:
         self.init_protocol(default_idle=False)
 
@@ -1296,7 +2180,11 @@ class AsyncMockServer:
 
 
 class TestAsyncioMPD(unittest.IsolatedAsyncioTestCase):
-    async def init_client(self, odd_hello: Optional[List[bytes]] = None) -> None:
+    async def init_client(
+        self,
+        odd_hello: Optional[List[bytes]] = None,
+        binary_limit: Optional[int] = None,
+    ) -> None:
         self.loop = asyncio.get_event_loop()
 
         self.mockserver = AsyncMockServer()
@@ -1310,8 +2198,13 @@ class TestAsyncioMPD(unittest.IsolatedAsyncioTestCase):
             hello_lines = odd_hello
 
         self.mockserver.expect_exchange([], hello_lines)
+        if binary_limit is not None:
+            self.mockserver.expect_exchange(
+                [b'binarylimit "%d"\n' % binary_limit], [b"OK\n"]
+            )
 
         self.client = mpd.asyncio.MPDClient()
+        self.client.binary_limit = binary_limit
         await self.client.connect(TEST_MPD_HOST, TEST_MPD_PORT)
 
         asyncio.open_connection.assert_called_with(TEST_MPD_HOST, TEST_MPD_PORT)
@@ -1450,6 +2343,55 @@ class TestAsyncioMPD(unittest.IsolatedAsyncioTestCase):
             self.assertEqual(o, next(expected))
         self.assertRaises(StopIteration, next, expected)
 
+    async def test_columnar(self) -> None:
+        await self.init_client()
+        self.client.columnar = True
+        self.mockserver.expect_exchange(
+            [b"playlistinfo\n"],
+            [
+                b"file: a.mp3\n",
+                b"Time: 3\n",
+                b"file: b.mp3\n",
+                b"Title: B\n",
+                b"OK\n",
+            ],
+        )
+
+        columns = await self.client.playlistinfo()
+        self.assertIsInstance(columns, mpd.SongColumns)
+        self.assertEqual(columns["file"], ["a.mp3", "b.mp3"])
+        self.assertEqual(columns["title"], [None, "B"])
+        self.assertEqual(columns["time"][0], 3.0)
+
+    async def test_paginate(self) -> None:
+        await self.init_client()
+        self.mockserver.expect_exchange(
+            [b'playlistinfo "0:2"\n'], [b"file: a.mp3\n", b"file: b.mp3\n", b"OK\n"]
+        )
+        self.mockserver.expect_exchange(
+            [b'playlistinfo "2:4"\n'], [b"file: c.mp3\n", b"OK\n"]
+        )
+
+        songs = self.client.paginate("playlistinfo", page_size=2, prefetch=True)
+        self.assertEqual(
+            [song["file"] async for song in songs], ["a.mp3", "b.mp3", "c.mp3"]
+        )
+        with self.assertRaises(ValueError):
+            async for _ in self.client.paginate("playlistinfo", page_size=0):
+                pass
+
+    async def test_lazy_songs(self) -> None:
+        await self.init_client()
+        self.client.lazy_songs = True
+        self.mockserver.expect_exchange(
+            [b'find "(artist == \\"X\\")"\n'],
+            [b"file: a.mp3\n", b"Artist: X\n", b"file: b.mp3\n", b"OK\n"],
+        )
+
+        songs = [song async for song in self.client.find('(artist == "X")')]
+        self.assertEqual([song["file"] for song in songs], ["a.mp3", "b.mp3"])
+        self.assertEqual(songs[0], {"file": "a.mp3", "artist": "X"})
+
     async def test_albumart(self) -> None:
         await self.init_client()
         self.mockserver.expect_exchange(
@@ -1479,6 +2421,387 @@ class TestAsyncioMPD(unittest.IsolatedAsyncioTestCase):
 
         self.assertEqual(albumart, expected)
 
+    async def test_albumart_zero_copy(self) -> None:
+        await self.init_client()
+        self.client.zero_copy_binary = True
+        self.mockserver.expect_exchange(
+            [b'albumart "x.mp3" "0"\n'],
+            [b"size: 20\n", b"binary: 16\n", bytes(range(16)), b"\n", b"OK\n"],
+        )
+        self.mockserver.expect_exchange(
+            [b'albumart "x.mp3" "16"\n'],
+            [b"size: 20\n", b"binary: 4\n", bytes(range(4)), b"\n", b"OK\n"],
+        )
+
+        albumart = await self.client.albumart("x.mp3")
+
+        self.assertIsInstance(albumart["binary"], bytearray)
+        self.assertEqual(albumart, {"binary": bytes(range(16)) + bytes(range(4))})
+
+    async def test_albumart_pipelined(self) -> None:
+        await self.init_client()
+        self.client.binary_pipeline_depth = 3
+        self.mockserver.expect_exchange(
+            [b'albumart "x.mp3" "0"\n'],
+            [b"size: 40\n", b"binary: 16\n", bytes(range(16)), b"\n", b"OK\n"],
+        )
+        # The remaining chunks are requested together; the server sending a
+        # short one makes the client ask for the gap.
+        self.mockserver.expect_exchange(
+            [b'albumart "x.mp3" "16"\n', b'albumart "x.mp3" "32"\n'],
+            [
+                b"size: 40\n",
+                b"binary: 10\n",
+                bytes(range(16, 26)),
+                b"\n",
+                b"OK\n",
+                b"size: 40\n",
+                b"binary: 8\n",
+                bytes(range(32, 40)),
+                b"\n",
+                b"OK\n",
+            ],
+        )
+        self.mockserver.expect_exchange([b'albumart "x.mp3" "26"\n'], [])
+
+        albumart = asyncio.ensure_future(self.client.albumart("x.mp3"))
+        # only the data of the gap is still expected (next to its request,
+        # if that is still queued)
+        gap_load = 6 / self.client.BINARY_LOAD_BYTES
+
+        async def gap_requested() -> None:
+            while self.client.load % 1 != gap_load:
+                await asyncio.sleep(0.001)
+
+        await asyncio.wait_for(gap_requested(), 1)
+        self.mockserver.expect_exchange(
+            [], [b"size: 40\n", b"binary: 6\n", bytes(range(26, 32)), b"\n", b"OK\n"]
+        )
+
+        self.assertEqual(await albumart, {"binary": bytes(range(40))})
+        self.assertEqual(self.client.load, 0)
+
+    async def test_albumart_binary_limit(self) -> None:
+        await self.init_client(binary_limit=16)
+        self.client.max_binary_limit = 64
+        self.client.BINARY_CHUNK_DURATION = 10.0
+        self.mockserver.expect_exchange(
+            [b'albumart "x.mp3" "0"\n'],
+            [b"size: 48\n", b"binary: 16\n", bytes(range(16)), b"\n", b"OK\n"],
+        )
+        self.mockserver.expect_exchange([b'binarylimit "64"\n'], [b"OK\n"])
+        self.mockserver.expect_exchange(
+            [b'albumart "x.mp3" "16"\n'],
+            [b"size: 48\n", b"binary: 32\n", bytes(range(16, 48)), b"\n", b"OK\n"],
+        )
+
+        albumart = await self.client.albumart("x.mp3")
+
+        self.assertEqual(albumart, {"binary": bytes(range(48))})
+
+    async def test_albumart_cache(self) -> None:
+        await self.init_client()
+        self.client.binary_cache = mpd.AlbumArtCache()
+        self.mockserver.expect_exchange([b"stats\n"], [b"db_update: 1\n", b"OK\n"])
+        self.mockserver.expect_exchange(
+            [b'albumart "x/1.mp3" "0"\n'],
+            [b"size: 4\n", b"binary: 4\n", bytes(range(4)), b"\n", b"OK\n"],
+        )
+
+        first = await self.client.albumart("x/1.mp3")
+        second = await self.client.albumart("x/2.mp3")
+
+        self.assertEqual(first, {"binary": bytes(range(4))})
+        self.assertEqual(second, first)
+        self.assertEqual(self.client.binary_cache.stamp, "1")
+
+    async def test_response_cache(self) -> None:
+        await self.init_client()
+        self.client.response_cache = True
+        self.mockserver.expect_exchange([b"stats\n"], [b"uptime: 1\n", b"OK\n"])
+        self.mockserver.expect_exchange(
+            [b'idle "database"\n'], [b"changed: database\n", b"OK\n"]
+        )
+        self.mockserver.expect_exchange([b'idle "database"\n'], [])
+
+        self.assertEqual(await self.client.stats(), {"uptime": "1"})
+        await asyncio.sleep(0.3)
+
+        # invalidated by the database change
+        self.mockserver.expect_exchange(
+            [b"noidle\n", b"stats\n"], [b"OK\n", b"uptime: 2\n", b"OK\n"]
+        )
+        self.mockserver.expect_exchange([b'idle "database"\n'], [])
+        stats = await self.client.stats()
+        self.assertEqual(stats, {"uptime": "2"})
+        stats["uptime"] = "changed by the caller"
+        await asyncio.sleep(0.3)
+
+        # served from the cache while idle waits for changes
+        self.assertEqual(await self.client.stats(), {"uptime": "2"})
+
+        # cleared by any other command
+        self.mockserver.expect_exchange([b"noidle\n", b"play\n"], [b"OK\n", b"OK\n"])
+        self.mockserver.expect_exchange([b"stats\n"], [b"uptime: 3\n", b"OK\n"])
+        await self.client.play()
+        self.assertEqual(await self.client.stats(), {"uptime": "3"})
+
+    async def test_response_cache_iterable(self) -> None:
+        await self.init_client()
+        self.client.response_cache = True
+        self.mockserver.expect_exchange(
+            [b"outputs\n"],
+            [b"outputid: 0\n", b"outputname: default detected output\n", b"OK\n"],
+        )
+        self.mockserver.expect_exchange([b'idle "database" "output"\n'], [])
+
+        outputs = [output async for output in self.client.outputs()]
+        await asyncio.sleep(0.3)
+        cached = [output async for output in self.client.outputs()]
+
+        self.assertEqual(
+            outputs, [{"outputid": "0", "outputname": "default detected output"}]
+        )
+        self.assertEqual(cached, outputs)
+        self.assertEqual(await self.client.outputs(), outputs)
+
+    async def test_coalesce_commands(self) -> None:
+        await self.init_client()
+        self.client.coalesce_commands = True
+        self.mockserver.expect_exchange(
+            [b"status\n"], [b"volume: 70\n", b"state: play\n", b"OK\n"]
+        )
+
+        first, second, third = await asyncio.gather(
+            self.client.status(), self.client.status(), self.client.status()
+        )
+
+        self.assertEqual(first, {"volume": "70", "state": "play"})
+        self.assertEqual(second, first)
+        self.assertEqual(third, first)
+        self.assertIsNot(second, first)
+
+        # not shared with a status sent before the own command
+        self.mockserver.expect_exchange(
+            [b"status\n", b"pause\n", b"status\n"],
+            [
+                b"state: play\n",
+                b"OK\n",
+                b"OK\n",
+                b"state: pause\n",
+                b"OK\n",
+            ],
+        )
+        before, _, after = await asyncio.gather(
+            self.client.status(), self.client.pause(), self.client.status()
+        )
+        self.assertEqual(before, {"state": "play"})
+        self.assertEqual(after, {"state": "pause"})
+
+        # nor with a call with other options
+        self.mockserver.expect_exchange(
+            [b"status\n", b"status\n"],
+            [b"state: play\n", b"OK\n", b"state: stop\n", b"OK\n"],
+        )
+        default, own = await asyncio.gather(
+            self.client.status(), self.client.status(timeout=5)
+        )
+        self.assertEqual(default, {"state": "play"})
+        self.assertEqual(own, {"state": "stop"})
+
+    async def test_watch(self) -> None:
+        await self.init_client()
+        self.mockserver.expect_exchange([b"currentsong\n"], [b"file: a\n", b"OK\n"])
+        self.mockserver.expect_exchange(
+            [b'idle "player" "playlist"\n'], [b"changed: player\n", b"OK\n"]
+        )
+        self.mockserver.expect_exchange(
+            [b"noidle\n", b"currentsong\n"], [b"file: b\n", b"OK\n"]
+        )
+        self.mockserver.expect_exchange([b'idle "player" "playlist"\n'], [])
+
+        first = self.client.watch(["currentsong"])
+        second = self.client.watch(["currentsong"])
+        # both subscribers share each fetch
+        self.assertEqual(
+            await asyncio.gather(first.__anext__(), second.__anext__()),
+            [{"currentsong": {"file": "a"}}] * 2,
+        )
+        self.assertEqual(
+            await asyncio.gather(first.__anext__(), second.__anext__()),
+            [{"currentsong": {"file": "b"}}] * 2,
+        )
+
+        self.mockserver.expect_exchange([b"noidle\n"], [b"OK\n"])
+        self.mockserver.expect_exchange([b'idle "database"\n'], [])
+        await first.aclose()
+        await second.aclose()
+        await asyncio.sleep(0.3)
+
+        with self.assertRaises(ValueError):
+            await self.client.watch(["playlistid"]).__anext__()
+
+    async def test_watch_cancelled_subscriber(self) -> None:
+        await self.init_client()
+        self.mockserver.expect_exchange([b"currentsong\n"], [b"file: a\n", b"OK\n"])
+        self.mockserver.expect_exchange([b'idle "player" "playlist"\n'], [])
+
+        first = self.client.watch(["currentsong"])
+        second = self.client.watch(["currentsong"])
+        await asyncio.gather(first.__anext__(), second.__anext__())
+
+        # cancelling one subscriber leaves the other one waiting
+        cancelled = asyncio.ensure_future(first.__anext__())
+        waiting = asyncio.ensure_future(second.__anext__())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await cancelled
+        # the response to the idle, once it was sent
+        await asyncio.sleep(0.3)
+        self.mockserver.expect_exchange([], [b"changed: player\n", b"OK\n"])
+        self.mockserver.expect_exchange(
+            [b"noidle\n", b"currentsong\n"], [b"file: b\n", b"OK\n"]
+        )
+        self.assertEqual(await waiting, {"currentsong": {"file": "b"}})
+
+        self.mockserver.expect_exchange([b'idle "database"\n'], [])
+        await second.aclose()
+        await asyncio.sleep(0.3)
+
+    async def test_timeout_queued(self) -> None:
+        await self.init_client()
+        self.mockserver.expect_exchange([b"update\n", b"status\n"], [])
+
+        update = asyncio.ensure_future(self.client.update())
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.client.status(timeout=0.05)
+
+        # the response of the command that timed out is skipped
+        self.mockserver.expect_exchange(
+            [], [b"updating_db: 1\n", b"OK\n", b"volume: 70\n", b"OK\n"]
+        )
+        self.assertEqual(await update, "1")
+        self.mockserver.expect_exchange([b"ping\n"], [b"OK\n"])
+        await self.client.ping()
+        self.assertTrue(self.client.connected)
+
+    async def test_timeout_response(self) -> None:
+        await self.init_client()
+        self.client.timeout = 0.05
+        self.mockserver.expect_exchange([b"status\n", b"ping\n"], [b"volume: 70\n"])
+
+        status = asyncio.ensure_future(self.client.status())
+        ping = asyncio.ensure_future(self.client.ping(timeout=10))
+
+        # the rest of the response is not waited for
+        with self.assertRaises(asyncio.TimeoutError):
+            await status
+        with self.assertRaises(mpd.ConnectionError):
+            await ping
+        self.assertFalse(self.client.connected)
+
+    async def test_priority_lanes(self) -> None:
+        await self.init_client()
+        self.mockserver.expect_exchange(
+            [b"update\n", b'setvol "50"\n'], [b"updating_db: 1\n", b"OK\n", b"OK\n"]
+        )
+        self.mockserver.expect_exchange([b"listallinfo\n"], [b"file: a.mp3\n", b"OK\n"])
+
+        async def listing() -> List[Dict[str, str]]:
+            return await self.client.listallinfo()
+
+        update = self.client.update()
+        files = asyncio.ensure_future(listing())
+        await asyncio.sleep(0)
+        # held back while update is pending, and overtaken by setvol
+        self.assertEqual(self.client.load, 2)
+        await self.client.setvol(50)
+        self.assertEqual(await update, "1")
+        self.assertEqual(await files, [{"file": "a.mp3"}])
+
+    async def test_priority_lanes_task_order(self) -> None:
+        await self.init_client()
+        self.mockserver.expect_exchange([b"update\n"], [b"updating_db: 1\n", b"OK\n"])
+        self.mockserver.expect_exchange([b"listallinfo\n"], [b"OK\n"])
+        self.mockserver.expect_exchange([b'setvol "50"\n'], [b"OK\n"])
+
+        update = self.client.update()
+        # held back, but a task's own commands keep their order
+        files = self.client.listallinfo()
+        volume = self.client.setvol(50, priority=mpd.asyncio.Priority.INTERACTIVE)
+        await update
+        self.assertEqual(await files, [])
+        await volume
+
+    async def test_priority_lanes_bulk_share(self) -> None:
+        await self.init_client()
+        share = self.client.BULK_SHARE
+        # NORMAL commands keep coming, but the held listing gets its turn
+        self.mockserver.expect_exchange(
+            [b"stats\n"] * (share + 1) + [b"listallinfo\n", b"stats\n"],
+            [b"OK\n"] * (share + 1) + [b"file: a.mp3\n", b"OK\n", b"OK\n"],
+        )
+
+        async def listing() -> List[Dict[str, str]]:
+            return await self.client.listallinfo()
+
+        stats = [self.client.stats()]
+        files = asyncio.ensure_future(listing())
+        await asyncio.sleep(0)
+        stats.extend(self.client.stats() for _ in range(share + 1))
+        self.assertEqual(await asyncio.gather(*stats), [{}] * (share + 2))
+        self.assertEqual(await files, [{"file": "a.mp3"}])
+
+    async def test_queue_mirror(self) -> None:
+        await self.init_client()
+        self.mockserver.expect_exchange(
+            [b"status\n"], [b"playlist: 4\n", b"playlistlength: 1\n", b"OK\n"]
+        )
+        self.mockserver.expect_exchange(
+            [b"playlistinfo\n"],
+            [b"file: a.mp3\n", b"Pos: 0\n", b"Id: 3\n", b"OK\n"],
+        )
+        queue = mpd.QueueMirror()
+
+        self.assertTrue(await queue.refresh_async(self.client))
+
+        self.assertEqual(queue.songs, [{"file": "a.mp3", "pos": "0", "id": "3"}])
+        self.assertEqual(queue.position("3"), 0)
+
+    async def test_library_mirror(self) -> None:
+        await self.init_client()
+        self.mockserver.expect_exchange(
+            [b"stats\n"], [b"db_update: 1700000000\n", b"OK\n"]
+        )
+        self.mockserver.expect_exchange(
+            [b"listallinfo\n"],
+            [b"directory: a\n", b"file: a/1.mp3\n", b"Title: T\n", b"OK\n"],
+        )
+        library = mpd.LibraryMirror(":memory:")
+        self.addCleanup(library.close)
+        self.client.columnar = True
+
+        self.assertTrue(await library.refresh_async(self.client))
+
+        self.assertEqual(library.db_update, "1700000000")
+        self.assertEqual(library.find(title="T"), [{"file": "a/1.mp3", "title": "T"}])
+        self.assertTrue(self.client.columnar)
+
+    async def test_tag_index(self) -> None:
+        await self.init_client()
+        self.mockserver.expect_exchange([b"stats\n"], [b"db_update: 1\n", b"OK\n"])
+        self.mockserver.expect_exchange(
+            [b"listallinfo\n"], [b"file: a.mp3\n", b"Artist: Anna\n", b"OK\n"]
+        )
+        index = mpd.TagIndex(tags=["artist"])
+        self.client.lazy_songs = True
+
+        self.assertEqual(await index.refresh_async(self.client), 1)
+
+        self.assertEqual(index.complete("artist", "an"), ["Anna"])
+        self.assertTrue(self.client.lazy_songs)
+
     async def test_readpicture(self) -> None:
         await self.init_client()
         self.mockserver.expect_exchange(
@@ -1608,11 +2931,241 @@ class TestAsyncioMPD(unittest.IsolatedAsyncioTestCase):
         self.mockserver.expect_exchange([b"currentsong\n"], [b"OK\n"])
         self.mockserver.expect_exchange([b"currentsong\n"], [b"OK\n"])
         await self.client.currentsong()
-        # pausing for exactly this duration triggers a special case in mpd.asyncio.MPDClient.__run
-        await asyncio.sleep(self.client.IMMEDIATE_COMMAND_TIMEOUT)
+        # a command that comes within the hold-off is sent without going
+        # through idle in between
+        await asyncio.sleep(self.client.idle_holdoff / 2)
         await self.client.currentsong()
         self.client.disconnect()
 
+    async def test_idle_holdoff(self) -> None:
+        await self.init_client()
+        self.assertEqual(
+            self.client.idle_holdoff, self.client.IMMEDIATE_COMMAND_TIMEOUT
+        )
+        self.mockserver.expect_exchange([b'idle "database"\n'], [])
+        await asyncio.sleep(0.3)
+
+        # a command only long after the last one shortens the hold-off
+        self.mockserver.expect_exchange([b"noidle\n", b"ping\n"], [b"OK\n", b"OK\n"])
+        await self.client.ping()
+        holdoff = self.client.idle_holdoff
+        self.assertLess(holdoff, self.client.IMMEDIATE_COMMAND_TIMEOUT)
+
+        # commands in quick succession keep it longer than the gaps between
+        # them, so they are sent without going through idle
+        for _ in range(3):
+            self.mockserver.expect_exchange([b"ping\n"], [b"OK\n"])
+            await self.client.ping()
+            await asyncio.sleep(holdoff / 4)
+        self.assertGreater(self.client.idle_holdoff, holdoff / 4)
+
+        self.client.disconnect()
+
+
+class FakeAsyncClient:
+    """Stand-in for mpd.asyncio.MPDClient in pool tests"""
+
+    load = 0.0
+
+    def __init__(self) -> None:
+        self.connected = False
+        self.commands: List[Tuple[str, Tuple[Any, ...]]] = []
+
+    async def connect(self, host: str, port: int = 6600) -> None:
+        self.connected = True
+
+    def disconnect(self) -> None:
+        self.connected = False
+
+    def __getattr__(self, name: str) -> Callable[..., Any]:
+        async def command(*args: Any) -> Any:
+            self.commands.append((name, args))
+            return name
+
+        return command
+
+    async def idle(self, subsystems: List[str] = []) -> Any:
+        yield ["player"]
+
+
+class TestAsyncioMPDClientPool(unittest.IsolatedAsyncioTestCase):
+    async def test_routing(self) -> None:
+        pool = mpd.asyncio.MPDClientPool(
+            size=2,
+            reserve_interactive=True,
+            password="secret",
+            client_class=FakeAsyncClient,  # type: ignore
+        )
+        await pool.connect(TEST_MPD_HOST, TEST_MPD_PORT)
+        first, second = pool._clients
+        interactive = pool._interactive
+
+        with mock.patch.object(
+            type(first), "load", new_callable=mock.PropertyMock, side_effect=[3.5, 0]
+        ):
+            self.assertEqual(await pool.listallinfo(), "listallinfo")
+        self.assertEqual(second.commands[-1], ("listallinfo", ()))
+        self.assertEqual(await pool.status(), "status")
+        self.assertEqual(interactive.commands[-1], ("status", ()))
+        for client in pool._all_clients():
+            self.assertEqual(client.commands[0], ("password", ("secret",)))
+
+        # connection state is changed on all connections
+        self.assertEqual(await pool.partition("kitchen"), "partition")
+        for client in pool._all_clients():
+            self.assertEqual(client.commands[-1], ("partition", ("kitchen",)))
+        self.assertEqual(pool._partition, "kitchen")
+        await pool.subscribe("chat")
+        self.assertEqual(pool._idle_client.commands[-1], ("subscribe", ("chat",)))
+
+        async for changes in pool.idle(["player"]):
+            self.assertEqual(changes, ["player"])
+            break
+        self.assertRaises(AttributeError, lambda: pool.binary_pipeline_depth)
+
+        pool.disconnect()
+        self.assertFalse(pool.connected)
+        with self.assertRaises(mpd.ConnectionError):
+            pool.find("any", "x")
+
+    async def test_routing_while_streaming(self) -> None:
+        servers = [AsyncMockServer() for _ in range(3)]
+        streams = iter(servers)
+        asyncio.open_connection = mock.MagicMock(
+            side_effect=lambda *args, **kwargs: next(streams).get_streams()
+        )
+        for server in servers:
+            server.expect_exchange([], [b"OK MPD mocker\n"])
+        pool = mpd.asyncio.MPDClientPool(size=2)
+        await pool.connect(TEST_MPD_HOST, TEST_MPD_PORT)
+        first, second = pool._clients
+        # the rest of the listing is still to come
+        servers[0].expect_exchange([b"listallinfo\n"], [b"file: a.mp3\n"])
+        servers[1].expect_exchange([b"stats\n"], [b"songs: 1\n", b"OK\n"])
+
+        listing = asyncio.ensure_future(pool.listallinfo())
+        for _ in range(100):
+            # until the first song was received
+            if not servers[0]._expectations and servers[0]._output.empty():
+                break
+            await asyncio.sleep(0)
+        self.assertEqual(first.load, 1)
+        self.assertIs(pool._client_for("stats"), second)
+        self.assertEqual(await pool.stats(), {"songs": "1"})
+
+        servers[0].expect_exchange([], [b"OK\n"])
+        self.assertEqual(await listing, [{"file": "a.mp3"}])
+        pool.disconnect()
+
+    async def test_load(self) -> None:
+        self.mockserver = AsyncMockServer()
+        asyncio.open_connection = mock.MagicMock(
+            return_value=self.mockserver.get_streams()
+        )
+        self.mockserver.expect_exchange([], [b"OK MPD mocker\n"])
+        client = mpd.asyncio.MPDClient()
+        await client.connect(TEST_MPD_HOST, TEST_MPD_PORT)
+        self.mockserver.expect_exchange(
+            [b'albumart "x.mp3" "0"\n'],
+            [b"size: 131072\n", b"binary: 4\n", bytes(4), b"\n", b"OK\n"],
+        )
+        # the response to the second chunk request is never sent
+        self.mockserver.expect_exchange([b'albumart "x.mp3" "4"\n'], [])
+        self.assertEqual(client.load, 0)
+        task = asyncio.ensure_future(client.albumart("x.mp3"))
+        # the second chunk request, and the data still to come
+        expected = 1 + (131072 - 4) / client.BINARY_LOAD_BYTES
+        for _ in range(100):
+            if client.load == expected:
+                break
+            await asyncio.sleep(0)
+        self.assertEqual(client.load, expected)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        # the response to the chunk request that was sent is still due
+        self.assertEqual(client.load, 1)
+        client.disconnect()
+
+
+class FakeFleetClient(FakeAsyncClient):
+    """Fake client whose behavior depends on the host it connects to"""
+
+    async def connect(self, host: str, port: int = 6600) -> None:
+        if host == "down":
+            raise mpd.ConnectionError("Connection refused")
+        if host == "lagging":
+            await asyncio.sleep(0.01)
+        self.host = host
+        self.connected = True
+
+    async def status(self) -> Dict[str, str]:
+        if self.host == "slow":
+            await asyncio.sleep(10)
+        if self.host == "broken":
+            raise mpd.CommandError("[5@0] {status} unknown command")
+        return {"host": self.host}
+
+
+class TestMPDFleet(unittest.IsolatedAsyncioTestCase):
+    def make_fleet(self, fleet_class: Any) -> Any:
+        return fleet_class(
+            ["fast", ("fast2", 6601), "slow:6602", "down", "broken"],
+            timeout=0.05,
+            client_class=FakeFleetClient,
+        )
+
+    async def test_execute(self) -> None:
+        fleet = self.make_fleet(mpd.fleet.MPDFleet)
+        self.assertEqual(
+            fleet.hosts,
+            ["fast:6600", "fast2:6601", "slow:6602", "down:6600", "broken:6600"],
+        )
+        outcomes = [outcome async for outcome in fleet.execute("status")]
+        # the slow server is the last to time out
+        self.assertEqual(outcomes[-1].host, "slow:6602")
+        self.assertIsInstance(outcomes[-1].error, asyncio.TimeoutError)
+        by_host = {outcome.host: outcome for outcome in outcomes}
+        self.assertEqual(by_host["fast:6600"].result, {"host": "fast"})
+        self.assertTrue(by_host["fast2:6601"].ok)
+        self.assertIsInstance(by_host["down:6600"].error, mpd.ConnectionError)
+        self.assertIsInstance(by_host["broken:6600"].error, mpd.CommandError)
+
+        # connections are kept, but not to the failing servers
+        self.assertEqual(
+            set(fleet._clients), {"fast:6600", "fast2:6601", "broken:6600"}
+        )
+        results = await fleet.gather("status", hosts=["fast:6600"])
+        self.assertEqual(list(results), ["fast:6600"])
+        fleet.disconnect()
+        self.assertEqual(fleet._clients, {})
+
+    async def test_concurrent_connect(self) -> None:
+        created = []
+
+        def client_class() -> FakeFleetClient:
+            created.append(FakeFleetClient())
+            return created[-1]
+
+        fleet = mpd.fleet.MPDFleet(
+            ["lagging"],
+            client_class=client_class,  # type: ignore
+        )
+        first, second = await asyncio.gather(fleet.gather("ping"), fleet.gather("ping"))
+        # both calls share the one connection
+        self.assertEqual(len(created), 1)
+        self.assertEqual(first["lagging:6600"].result, "ping")
+        self.assertEqual(second["lagging:6600"].result, "ping")
+        fleet.disconnect()
+
+    def test_blocking(self) -> None:
+        fleet = self.make_fleet(mpd.fleet.BlockingMPDFleet)
+        self.addCleanup(fleet.close)
+        outcomes = list(fleet.execute("status"))
+        self.assertEqual(len(outcomes), 5)
+        self.assertEqual(sum(outcome.ok for outcome in outcomes), 2)
+        self.assertEqual(fleet.gather("ping")["fast2:6601"].result, "ping")
+
 
 if __name__ == "__main__":
     unittest.main()
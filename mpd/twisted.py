@@ -39,7 +39,7 @@ from mpd.base import (
     CommandError,
     CommandListError,
     MPDClientBase,
-    escape,
+    encode_command,
     logger,
     mpd_command_provider,
     mpd_commands,
@@ -176,24 +176,10 @@ class MPDProtocol(basic.LineReceiver, MPDClientBase):
         return deferred
 
     def _create_command(self, command: str, args: List[str] = []) -> bytes:
-        # XXX: this function should be generalized in future. There exists
-        #      almost identical code in ``MPDClient._write_command``, with the
-        #      difference that it's using ``encode_str`` for text arguments.
-        parts = [command]
-        for arg in args:
-            if type(arg) is tuple:
-                if len(arg) == 0:
-                    parts.append('":"')
-                elif len(arg) == 1:
-                    parts.append('"{}:"'.format(int(arg[0])))
-                else:
-                    parts.append('"{}:{}"'.format(int(arg[0]), int(arg[1])))
-            else:
-                parts.append('"{}"'.format(escape(arg)))
-        return " ".join(parts).encode("utf-8")
+        return encode_command(command, args)[:-1]
 
     def _write_command(self, command: str, args: List[str] = []) -> None:
-        self.sendLine(self._create_command(command, args))
+        self.transport.write(encode_command(command, args))
 
     def _parse_command_list_item(self, result: Any) -> Any:
         if isinstance(result, types.GeneratorType):